@@ -18,6 +18,18 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 5005
     
+    # 启动配置（run.py；DEBUG=true 时单进程启动并在代码变化时自动重载）
+    workers: int = 1  # worker 进程数
+    reuse_port: bool = True  # 每个 worker 用 SO_REUSEPORT 各自监听同一端口（由内核分配连接），否则主进程监听后共享给 worker
+    server_loop: str = "auto"  # 事件循环：auto（安装了 uvloop 时使用）、uvloop、asyncio
+    server_http: str = "auto"  # HTTP 解析器：auto（安装了 httptools 时使用）、httptools、h11
+    server_backlog: int = 2048  # 监听队列长度
+    worker_max_requests: int = 0  # worker 处理该数量的请求后退出并由新 worker 替换，0 表示不限
+    worker_max_requests_jitter: int = 0  # 每个 worker 的请求上限再随机增加 0~该值，避免所有 worker 同时重启
+    worker_start_timeout_seconds: float = 60.0  # 重载（SIGHUP）时等待新 worker 开始监听的最长时间（秒）
+    graceful_timeout_seconds: float = 30.0  # worker 退出时等待进行中请求完成的最长时间（秒）
+    synthesis_drain_seconds: float = 30.0  # 之后再等待后台合成（异步任务、预取、无人等待的短文本）写入缓存的最长时间（秒）
+    
     # 域名配置
     domain: str = "ttsedge.egg404.com"
     base_url: Optional[str] = None  # 如果未设置，将自动从 domain 生成
@@ -30,6 +42,48 @@ class Settings(BaseSettings):
     cache_dir: str = "./cache"  # 缓存目录
     max_file_size_mb: int = 50
     enable_cache: bool = True  # 是否启用缓存
+    cache_fsync: bool = False  # 写入缓存时先 fsync 临时文件再原子替换（在线程中执行，不阻塞事件循环，但会增加写入缓存的耗时）
+    
+    # 缓存完整性校验配置（后台逐帧检查缓存音频，损坏的条目移到 cache_dir/.quarantine）
+    cache_verify_enabled: bool = True
+    cache_verify_interval_seconds: int = 86400  # 全量校验间隔（秒），0 表示只在启动时校验上次校验后写入的条目
+    cache_verify_workers: int = 4  # 校验线程数
+    
+    # 输出目录清理配置（未缓存的音频、合成失败留下的临时文件）
+    reaper_enabled: bool = True
+    reaper_interval_seconds: int = 300  # 清理间隔（秒）
+    output_max_age_seconds: int = 86400  # 输出文件最长保留时间（秒），0 表示不限
+    output_max_size_mb: int = 1024  # 输出目录总大小上限（MB），0 表示不限
+    reaper_min_age_seconds: int = 60  # 按大小清理时不删除比该时间更新的文件（秒）
+    reaper_in_use_grace_seconds: int = 3600  # 使用标记的有效期（秒），防止异常中断的响应永久占用文件
+    
+    # 共享内存热缓存配置（多 worker 部署时共享同一份热音频）
+    shared_cache_enabled: bool = False
+    shared_cache_path: str = "/dev/shm/edge-tts-hot-cache"
+    shared_cache_size_mb: int = 256  # 数据区大小（MB）
+    shared_cache_index_slots: int = 65536  # 索引槽数量
+    shared_cache_max_entry_kb: int = 512  # 单个音频超过该大小不进入热缓存
+    
+    # 词表音频归档（build_vocab_archive.py 生成，启动时只读映射，未命中时回退到缓存目录）
+    vocab_archive_path: Optional[str] = None
+    
+    # nginx 直接发送缓存音频（X-Accel-Redirect），未设置时由应用读取文件发送
+    accel_redirect_prefix: Optional[str] = None  # nginx 中 alias 到 cache_dir 的 internal location，例如 "/_tts_cache/"
+    
+    # 缓存同步配置（节点间导出 / 导入缓存，未设置令牌时同步接口不可用）
+    cache_sync_token: Optional[str] = None  # 请求头 X-Cache-Sync-Token 必须与之一致
+    
+    # 节点间缓存配置（一致性哈希环，本地未命中时先向归属节点请求）
+    peer_nodes: list[str] = []  # 所有节点地址（含本节点），例如 ["http://10.0.0.1:5005", "http://10.0.0.2:5005"]
+    peer_self_url: Optional[str] = None  # 本节点在 peer_nodes 中的地址
+    peer_timeout_seconds: float = 0.3  # 向其他节点请求时连接和等待响应头的超时时间（秒），超时的节点标记为不可用
+    peer_body_timeout_seconds: float = 3.0  # 接收 / 推送音频数据的最长时间（秒），数据传输慢不标记节点不可用
+    peer_virtual_nodes: int = 64  # 每个节点在哈希环上的虚拟节点数
+    peer_retry_after_seconds: float = 30.0  # 请求失败的节点在该时间内不再访问（秒）
+    
+    # 跨进程合成租约配置（多 worker 同时未命中同一文本时只合成一次）
+    synthesis_lease_timeout: float = 60.0  # 等待其他 worker 合成的最长时间（秒）
+    synthesis_lease_poll_interval: float = 0.05  # 等待期间检查缓存文件的间隔（秒）
     
     # TTS 配置
     default_voice: str = "zh-CN-XiaoxiaoNeural"
@@ -41,6 +95,77 @@ class Settings(BaseSettings):
     russian_sentence_rate: str = "-30%"  # 俄语句子默认降低语速
     russian_long_sentence_threshold: int = 50  # 俄语长句子阈值（字符数）
     
+    # 中俄混合文本配置（按文字切分为汉字段和西里尔字母段，分别用对应语音合成后拼接）
+    mixed_language_enabled: bool = True
+    mixed_voice_zh: str = "zh-CN-XiaoxiaoNeural"  # 汉字段使用的语音（请求指定中文语音时以请求为准）
+    mixed_voice_ru: str = "ru-RU-SvetlanaNeural"  # 西里尔字母段使用的语音（请求指定俄语语音时以请求为准）
+    mixed_segment_concurrency: int = 2  # 单个混合文本请求同时合成的段数（每段各自占用上游槽位和配额）
+    
+    # 音频拼接配置（/tts/concat 按帧拼接已缓存的音频）
+    concat_max_items: int = 100  # 单次最多拼接的条目数
+    
+    # 静音裁剪配置（合成结果写入缓存时按帧裁掉首尾静音，不重新编码）
+    # 各优先级类别的裁剪方式：both / head / tail / none；batch（长文本分段）保留段间停顿
+    silence_trim_modes: dict[str, str] = {"interactive": "both", "prefetch": "both", "batch": "none"}
+    silence_trim_max_bits: int = 0  # 静音帧判定：每个 granule 的主数据不超过该位数且没有 big_values 区
+    silence_trim_guard_frames: int = 1  # 首尾各保留的静音帧数
+    
+    # 上游调度配置（最短作业优先 + 优先级类别 + 老化）
+    upstream_concurrency: int = 8  # 同时进行的上游合成数量
+    scheduler_cost_base: float = 0.5  # 每次合成的基础成本（秒）
+    scheduler_cost_per_char: dict[str, float] = {"zh": 0.25, "ru": 0.08}  # 每字符预估音频时长（秒）
+    scheduler_class_offsets: dict[str, float] = {"interactive": 0.0, "prefetch": 10.0, "batch": 30.0}
+    scheduler_aging_rate: float = 1.0  # 每等待 1 秒抵消的预估成本（秒）
+    synthesis_cancel_on_disconnect: bool = True  # 等待同一合成的请求都断开后取消上游合成
+    synthesis_finish_max_chars: int = 30  # 不超过该长度的文本即使无人等待也合成完写入缓存
+    
+    # 客户端配额配置（按 API Key 或 nginx 转发的客户端 IP 区分，只对缓存未命中的上游合成计量）
+    # 令牌桶和公平排队状态在每个 worker 进程中独立，实际上限为配置值乘以 worker 数
+    quota_enabled: bool = False
+    quota_rate_per_second: float = 2.0  # 每个客户端每秒补充的合成次数
+    quota_burst: float = 30.0  # 每个客户端可连续合成的次数
+    quota_max_wait_seconds: float = 10.0  # 配额不足时最长等待时间（秒），超过返回 429；batch 类别不受限
+    quota_max_clients: int = 10000  # 保留令牌桶的客户端数量
+    client_api_key_header: str = "X-API-Key"  # 标识客户端的 API Key 请求头（为空则不使用）
+    client_api_keys: list[str] = []  # 受信任的 API Key，只有这些 Key 按 Key 区分客户端，其他请求按 IP 区分
+    client_ip_header: str = "X-Real-IP"  # nginx 转发的客户端 IP 请求头（为空则使用连接地址）
+    client_trusted_proxies: list[str] = ["127.0.0.1", "::1"]  # 只有来自这些地址或网段（如 "10.0.0.0/8"）的连接才采用转发的客户端 IP
+    client_weights: dict[str, float] = {}  # 客户端权重（如 {"ip:10.0.0.5": 4}），同时放大配额和公平排队份额
+    
+    # 异步任务配置（长文本）
+    job_chunk_max_chars: int = 500  # 分段合成时每段最大字符数
+    job_first_chunk_max_chars: int = 150  # 第一段最大字符数（第一段先合成完，HLS 播放可以更早开始）
+    job_chunk_concurrency: int = 2  # 单个任务同时合成的段数
+    job_ttl_seconds: int = 3600  # 已结束任务的保留时间（秒）
+    job_max_wait_seconds: float = 30.0  # 长轮询最长等待时间（秒）
+    job_poll_interval_seconds: float = 0.2  # 长轮询其他 worker 执行的任务时重新读取任务记录的间隔（秒）
+    hls_target_duration_seconds: int = 30  # HLS 播放列表的 EXT-X-TARGETDURATION 下限（秒）
+    
+    # 启动预热配置（预热完成前 /ready 返回 503）
+    warmup_enabled: bool = True
+    warmup_preload_top_n: int = 500  # 预加载最近访问的缓存音频数量
+    warmup_step_timeout_seconds: float = 15.0  # 单个预热步骤的超时时间（秒）
+    voice_catalog_ttl_seconds: int = 86400  # 语音目录缓存时间（秒）
+    
+    # 预测性回热配置（按计数草图估计的访问频率，闲时重新合成被删除的热门音频、刷新即将被热缓存覆盖的条目）
+    rewarm_enabled: bool = True
+    rewarm_interval_seconds: int = 600  # 检查间隔（秒）
+    rewarm_track_keys: int = 2000  # 跟踪的热门缓存键数量
+    rewarm_sketch_width: int = 16384  # 计数草图每行计数器数量
+    rewarm_min_count: int = 3  # 估计访问次数不低于该值的键才回热
+    rewarm_max_chars: int = 200  # 只跟踪不超过该长度的文本
+    rewarm_off_peak_hours: list[int] = [2, 3, 4, 5]  # 允许重新合成的本地时段（小时），空列表表示不限
+    rewarm_budget_seconds: float = 120.0  # 每次检查最多使用的上游预估时间（秒）
+    rewarm_max_utilization: float = 0.5  # 上游槽位占用达到该比例时停止重新合成
+    rewarm_hot_refresh_fraction: float = 0.2  # 共享热缓存条目位于最旧的该比例数据区内时重新写入
+    
+    # 请求追踪配置（Server-Timing 响应头 + 采样导出 OTLP/JSON）
+    server_timing_enabled: bool = True  # 在响应头中返回各阶段耗时
+    tracing_sample_rate: float = 0.0  # 导出采样率（0~1），带 traceparent 的请求沿用其采样标记
+    tracing_export_path: Optional[str] = None  # 导出到本地 JSON Lines 文件
+    tracing_collector_url: Optional[str] = None  # 导出到 OTLP/HTTP 收集器，例如 http://127.0.0.1:4318/v1/traces
+    tracing_batch_size: int = 50  # 攒够多少条追踪后导出一次
+    
     # 安全配置
     max_text_length: int = 5000
     allowed_audio_formats: list[str] = [".mp3", ".wav", ".webm"]
@@ -2,6 +2,7 @@
 控制器模块
 """
 from app.controllers.tts_controller import router as tts_router
+from app.controllers.job_controller import router as job_router
+from app.controllers.cache_controller import router as cache_router
 
-__all__ = ["tts_router"]
-
+__all__ = ["tts_router", "job_router", "cache_router"]
@@ -0,0 +1,169 @@
+"""
+缓存同步控制器
+节点之间导出 / 导入缓存音频：清单接口返回本节点的缓存键，导出接口以 tar 流返回指定条目，
+导入接口接收 tar 流写入本节点缓存目录，条目接口接收其他节点推送的单条音频。
+所有接口都需要 X-Cache-Sync-Token 请求头。
+"""
+import asyncio
+import hmac
+import tempfile
+from pathlib import Path
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from app.models import BaseResponse, CacheExportRequest
+from app.utils import app_logger, ensure_cache_dir
+from app.utils.cache_transfer import CACHE_ENTRY_PATTERN, iter_export, import_archive, list_cache_entries, write_entry
+from app.utils.mp3_utils import check_integrity
+from app.utils.json_utils import FastJSONResponse
+from app.config import settings
+
+
+def verify_sync_token(x_cache_sync_token: Optional[str] = Header(None)) -> None:
+    """校验同步令牌（未配置令牌时同步接口不可用）"""
+    if not settings.cache_sync_token:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="缓存同步未启用（未设置 CACHE_SYNC_TOKEN）"
+        )
+    if not x_cache_sync_token or not hmac.compare_digest(x_cache_sync_token, settings.cache_sync_token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="缓存同步令牌无效"
+        )
+
+
+# 创建路由器
+router = APIRouter(prefix="/tts/cache", tags=["缓存同步"], dependencies=[Depends(verify_sync_token)])
+
+# 导入时请求体超过该大小后写入临时文件
+IMPORT_SPOOL_MAX_BYTES = 32 * 1024 * 1024
+
+
+def _require_cache() -> Path:
+    if not settings.enable_cache:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="未启用缓存"
+        )
+    return ensure_cache_dir()
+
+
+def _export_response(cache_dir: Path, keys: Optional[list[str]]) -> StreamingResponse:
+    return StreamingResponse(
+        iter_export(cache_dir, keys),
+        media_type="application/x-tar",
+        headers={"Content-Disposition": 'attachment; filename="tts-cache.tar"'}
+    )
+
+
+@router.get("/manifest", response_model=BaseResponse)
+async def get_manifest():
+    """
+    获取本节点的缓存清单
+
+    Returns:
+        缓存键列表和总大小
+    """
+    cache_dir = _require_cache()
+    entries = await asyncio.to_thread(list_cache_entries, cache_dir)
+    return FastJSONResponse(content={
+        "code": 200,
+        "message": "获取缓存清单成功",
+        "data": {
+            "count": len(entries),
+            "bytes": sum(size for size, _ in entries.values()),
+            "keys": sorted(entries)
+        }
+    })
+
+
+@router.get("/export")
+async def export_all():
+    """
+    导出全部缓存（tar 流）
+
+    Returns:
+        tar 流（第一个成员为 manifest.json）
+    """
+    return _export_response(_require_cache(), None)
+
+
+@router.post("/export")
+async def export_keys(request: CacheExportRequest):
+    """
+    导出指定的缓存条目（tar 流），用于增量同步
+
+    Args:
+        request: 要导出的缓存键列表
+
+    Returns:
+        tar 流（不存在的键忽略）
+    """
+    return _export_response(_require_cache(), request.keys)
+
+
+@router.post("/import", response_model=BaseResponse)
+async def import_cache(request: Request, overwrite: bool = False):
+    """
+    导入缓存（请求体为导出接口生成的 tar 流）
+
+    Args:
+        overwrite: 是否覆盖已存在的条目
+
+    Returns:
+        导入结果（导入数、跳过数、无效数、字节数）
+    """
+    cache_dir = _require_cache()
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_MAX_BYTES) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        try:
+            result = await asyncio.to_thread(import_archive, spool, cache_dir, overwrite)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+
+    app_logger.info(
+        f"缓存导入完成 - 导入: {result['imported']}, 跳过: {result['skipped']}, "
+        f"无效: {result['invalid']}, 不完整: {result['corrupt']}, 大小: {result['bytes'] / (1024 * 1024):.2f}MB"
+    )
+    return BaseResponse(
+        code=200,
+        message="缓存导入成功",
+        data=result
+    )
+
+
+@router.put("/entry/{cache_key}", response_model=BaseResponse)
+async def put_entry(cache_key: str, request: Request):
+    """
+    写入单条缓存（其他节点把归属本节点的音频推送过来）
+
+    Args:
+        cache_key: 缓存键
+
+    Returns:
+        是否写入（已存在时不覆盖）
+    """
+    cache_dir = _require_cache()
+    if CACHE_ENTRY_PATTERN.match(f"{cache_key}.mp3") is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的缓存键"
+        )
+    data = await request.body()
+    if len(data) > settings.max_file_size_mb * 1024 * 1024 or check_integrity(data) is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的音频数据"
+        )
+    written = await asyncio.to_thread(write_entry, cache_dir, cache_key, data)
+    return BaseResponse(
+        code=200,
+        message="缓存已写入" if written else "缓存已存在",
+        data={"written": written}
+    )
@@ -0,0 +1,276 @@
+"""
+异步合成任务控制器
+长文本提交后立即返回 202 和任务 ID，客户端通过长轮询查询进度，完成后获取音频
+"""
+import asyncio
+import math
+import time
+from typing import Optional
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import FileResponse, Response
+from app.services import JobService, UnknownVoiceError
+from app.services.job_service import SynthesisJob, JOB_DONE, JOB_FAILED
+from app.services.scheduler import PRIORITY_BATCH
+from app.models import TTSRequest, BaseResponse, JobInfo
+from app.utils import app_logger, read_audio_file
+from app.utils.hls import id3_timestamp_tag, render_playlist
+from app.config import settings
+from app.controllers.tts_controller import tts_service, unknown_voice_exception, accel_redirect_response
+
+
+# 创建路由器
+router = APIRouter(prefix="/tts/jobs", tags=["异步任务"])
+
+# 创建服务实例（与同步接口共用 TTSService，分段缓存和合成去重互通）
+job_service = JobService(tts_service)
+
+
+def _job_info(job: SynthesisJob) -> JobInfo:
+    """构建任务信息"""
+    job_url = f"{settings.base_url}{settings.api_prefix}/tts/jobs/{job.job_id}"
+    audio_url = None
+    if job.status == JOB_DONE and settings.enable_cache:
+        audio_url = f"{settings.base_url}{settings.api_prefix}/tts/download/{job.filename}"
+    end = job.finished_at or time.time()
+    return JobInfo(
+        job_id=job.job_id,
+        cache_key=job.cache_key,
+        status=job.status,
+        chunks_done=job.chunks_done,
+        chunks_total=job.chunks_total,
+        status_url=job_url,
+        result_url=f"{job_url}/result",
+        playlist_url=f"{job_url}/playlist.m3u8",
+        audio_url=audio_url,
+        error=job.error,
+        elapsed=round(end - job.created_at, 3)
+    )
+
+
+async def _get_job_or_404(job_id: str) -> SynthesisJob:
+    job = await job_service.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="任务不存在或已过期"
+        )
+    return job
+
+
+@router.post("", response_model=BaseResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_job(request: TTSRequest):
+    """
+    提交异步合成任务（适合接近长度上限的长文本）
+
+    Args:
+        request: TTS 请求参数
+
+    Returns:
+        任务信息（任务 ID、最终缓存键、状态 URL、结果 URL）
+    """
+    try:
+        app_logger.info(f"收到异步 TTS 任务 - 文本长度: {len(request.text)}")
+
+        # 验证文本长度
+        if len(request.text) > settings.max_text_length:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"文本长度超过限制 ({settings.max_text_length} 字符)"
+            )
+
+        job, created = await job_service.submit(
+            text=request.text,
+            voice=request.voice,
+            rate=request.rate,
+            volume=request.volume,
+            pitch=request.pitch,
+            priority=request.priority or PRIORITY_BATCH
+        )
+
+        return BaseResponse(
+            code=202,
+            message="任务已创建" if created else "已存在相同内容的任务",
+            data=_job_info(job)
+        )
+
+    except HTTPException:
+        raise
+    except UnknownVoiceError as e:
+        raise unknown_voice_exception(e)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        app_logger.error(f"创建合成任务失败: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"创建合成任务失败: {str(e)}"
+        )
+
+
+@router.get("/{job_id}", response_model=BaseResponse)
+async def get_job(job_id: str, wait: float = 0, since: Optional[int] = None):
+    """
+    查询任务状态（支持长轮询）
+
+    Args:
+        job_id: 任务 ID
+        wait: 任务未结束时最多等待状态变化的秒数（0 表示立即返回）
+        since: 客户端已知的完成段数，与当前进度不同时立即返回
+
+    Returns:
+        任务信息（含进度 chunks_done / chunks_total）
+    """
+    job = await _get_job_or_404(job_id)
+
+    wait = min(max(wait, 0.0), settings.job_max_wait_seconds)
+    if wait > 0:
+        job = await job_service.wait_for_change(job, since, wait)
+
+    return BaseResponse(
+        code=200,
+        message="获取任务状态成功",
+        data=_job_info(job)
+    )
+
+
+@router.get("/{job_id}/result")
+async def get_job_result(job_id: str):
+    """
+    获取任务音频结果
+
+    Args:
+        job_id: 任务 ID
+
+    Returns:
+        音频文件（任务未完成时返回 409）
+    """
+    job = await _get_job_or_404(job_id)
+
+    if job.status != JOB_DONE:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"任务尚未完成（状态: {job.status}，进度: {job.chunks_done}/{job.chunks_total}）"
+        )
+
+    if job.file_path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="音频文件不存在"
+        )
+
+    accel = accel_redirect_response(
+        job.filename,
+        {"Content-Disposition": f'attachment; filename="{job.filename}"'}
+    )
+    if accel is not None:
+        return accel
+
+    if not job.file_path.exists():
+        # 词表归档中的条目没有对应文件
+        try:
+            audio = read_audio_file(job.file_path)
+        except FileNotFoundError:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="音频文件不存在"
+            )
+        return Response(
+            content=audio,
+            media_type="audio/mpeg",
+            headers={"Content-Disposition": f'attachment; filename="{job.filename}"'}
+        )
+
+    return FileResponse(
+        path=str(job.file_path),
+        media_type="audio/mpeg",
+        filename=job.filename
+    )
+
+
+def _target_duration(job: SynthesisJob) -> int:
+    """
+    播放列表的 EXT-X-TARGETDURATION：按最长分段的预估时长（留 25% 余量）确定，
+    播放列表增长过程中保持不变
+    """
+    per_char = settings.scheduler_cost_per_char.get(job.voice.split("-", 1)[0], 0.1)
+    longest = max((len(chunk) for chunk in job.chunks), default=0)
+    return max(settings.hls_target_duration_seconds, math.ceil(per_char * longest * 1.25))
+
+
+@router.get("/{job_id}/playlist.m3u8")
+async def get_job_playlist(job_id: str):
+    """
+    获取任务的 HLS 播放列表（EVENT 类型，随合成进度增长，任务完成后带 EXT-X-ENDLIST）
+
+    第一段尚未完成时最多等待 job_max_wait_seconds 秒，播放器拿到的列表至少包含一个分段。
+
+    Args:
+        job_id: 任务 ID
+
+    Returns:
+        m3u8 播放列表（分段为相对 URL）
+    """
+    job = await _get_job_or_404(job_id)
+
+    deadline = time.monotonic() + settings.job_max_wait_seconds
+    segments = await job_service.ready_segments(job)
+    while not segments and not job.finished and time.monotonic() < deadline:
+        job = await job_service.wait_for_change(job, job.chunks_done, deadline - time.monotonic())
+        segments = await job_service.ready_segments(job)
+
+    if job.status == JOB_FAILED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"任务失败: {job.error}"
+        )
+
+    ended = job.status == JOB_DONE and len(segments) == max(len(job.segments), 1)
+    playlist = render_playlist(
+        [(f"segments/{index}.mp3", duration) for index, (_, duration) in enumerate(segments)],
+        ended,
+        _target_duration(job)
+    )
+    return Response(
+        content=playlist,
+        media_type="application/vnd.apple.mpegurl",
+        headers={"Cache-Control": "max-age=3600" if ended else "no-cache"}
+    )
+
+
+@router.get("/{job_id}/segments/{index}.mp3")
+async def get_job_segment(job_id: str, index: int):
+    """
+    获取任务的单个 HLS 分段（分段音频来自缓存，开头加上 ID3 时间戳标签）
+
+    Args:
+        job_id: 任务 ID
+        index: 分段序号（从 0 开始）
+
+    Returns:
+        分段音频
+    """
+    job = await _get_job_or_404(job_id)
+    segments = await job_service.ready_segments(job)
+    if index < 0 or index >= len(segments):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="分段不存在或尚未完成"
+        )
+
+    file_path, _ = segments[index]
+    try:
+        audio = await asyncio.to_thread(read_audio_file, file_path)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="音频文件不存在"
+        )
+    start = sum(duration for _, duration in segments[:index])
+    return Response(
+        content=id3_timestamp_tag(start) + audio,
+        media_type="audio/mpeg",
+        headers={"Cache-Control": f"max-age={settings.job_ttl_seconds}"}
+    )
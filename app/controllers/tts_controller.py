@@ -2,19 +2,50 @@
 文本转语音控制器
 处理 TTS 相关的 API 请求
 """
-from fastapi import APIRouter, HTTPException, status
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from typing import Optional
+from urllib.parse import quote, urlencode
+import asyncio
+import re
+import math
 import base64
 import aiofiles
-from app.services import TTSService
+from app.services import (
+    TTSService,
+    UnknownVoiceError,
+    QuotaExceededError,
+    client_quotas,
+    output_reaper,
+    peer_cache,
+    rewarmer,
+    cache_verifier
+)
+from app.services.peer_cache import PEER_REQUEST_HEADER
+from app.services.scheduler import PRIORITY_INTERACTIVE
 from app.models import (
     TTSRequest,
+    ConcatRequest,
     BaseResponse,
     TTSResponse,
     VoiceListResponse
 )
-from app.utils import app_logger, get_file_path, get_cache_path, delete_file
+from app.utils import (
+    app_logger,
+    get_file_path,
+    get_cache_path,
+    delete_file,
+    get_hot_cache,
+    get_vocab_archive,
+    fill_hot_cache,
+    acquire_file,
+    release_file,
+    file_in_use,
+    get_trim_stats,
+    span
+)
+from app.utils.json_utils import FastJSONResponse, dumps
 from app.config import settings
 
 
@@ -24,14 +55,161 @@ router = APIRouter(prefix="/tts", tags=["文本转语音"])
 # 创建服务实例
 tts_service = TTSService()
 
+# 缓存文件名：32 位 MD5 + .mp3
+CACHE_FILENAME_PATTERN = re.compile(r"^[0-9a-f]{32}\.mp3$")
+
+# 预渲染的语音列表响应：(locale, gender) -> JSON 字节，语音目录刷新后整体失效
+VOICES_JSON_CACHE_MAX_ENTRIES = 256
+_voices_json_version = -1
+_voices_json_cache: dict[tuple[Optional[str], Optional[str]], bytes] = {}
+
+
+def _is_cache_filename(filename: str) -> bool:
+    """判断文件名是否为缓存文件名（32 位 MD5 + .mp3）"""
+    return settings.enable_cache and CACHE_FILENAME_PATTERN.match(filename) is not None
+
+
+def _read_memory_audio(filename: str) -> Optional[bytes]:
+    """
+    从内存层（共享热缓存、词表归档）读取缓存音频数据
+    
+    热缓存未命中时在线程中读取缓存文件回填（只回填不超过单条目上限的文件），本次请求照常走文件发送。
+    
+    Returns:
+        音频数据；未启用内存层、不是缓存文件或未命中时返回 None（调用方走文件读取）
+    """
+    if not _is_cache_filename(filename):
+        return None
+    cache_key = filename[:-4]
+    hot_cache = get_hot_cache()
+    if hot_cache is not None:
+        with span("read"):
+            audio = hot_cache.get(cache_key)
+        if audio is not None:
+            return audio
+    archive = get_vocab_archive()
+    if archive is not None:
+        with span("read"):
+            audio = archive.get(cache_key)
+        if audio is not None:
+            return audio
+    if hot_cache is not None:
+        _schedule_hot_fill(cache_key)
+    return None
+
+
+# 正在回填热缓存的缓存键和后台任务（持有引用，防止任务在运行中被垃圾回收）
+_hot_fill_keys: set[str] = set()
+_hot_fill_tasks: set[asyncio.Task] = set()
+
+
+def _schedule_hot_fill(cache_key: str) -> None:
+    """在后台线程中把缓存文件回填到共享热缓存（同一个键同时只回填一次）"""
+    if cache_key in _hot_fill_keys:
+        return
+    _hot_fill_keys.add(cache_key)
+    task = asyncio.get_running_loop().create_task(asyncio.to_thread(fill_hot_cache, cache_key, ".mp3"))
+    _hot_fill_tasks.add(task)
+
+    def done(finished: asyncio.Task) -> None:
+        _hot_fill_tasks.discard(finished)
+        _hot_fill_keys.discard(cache_key)
+        if not finished.cancelled() and finished.exception() is not None:
+            app_logger.warning(f"回填热缓存失败 - cache_key: {cache_key}: {finished.exception()}")
+
+    task.add_done_callback(done)
+
+
+def accel_redirect_response(filename: str, headers: dict) -> Optional[Response]:
+    """
+    把缓存目录中的音频交给 nginx 发送（X-Accel-Redirect，音频数据不经过 Python）
+    
+    Args:
+        filename: 音频文件名
+        headers: 随响应返回的其他响应头
+        
+    Returns:
+        只带 X-Accel-Redirect 头的空响应；未启用、不是缓存文件或文件不在缓存目录（如只在词表归档中）时返回 None
+    """
+    prefix = settings.accel_redirect_prefix
+    if not prefix or not _is_cache_filename(filename):
+        return None
+    if not get_cache_path(filename[:-4], ".mp3").is_file():
+        return None
+    return Response(
+        media_type="audio/mpeg",
+        headers={**headers, "X-Accel-Redirect": f"{prefix.rstrip('/')}/{filename}"}
+    )
+
+
+# 客户端在响应前断开连接（nginx 约定的状态码）
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def _cancel_on_disconnect(request: Request, awaitable):
+    """
+    等待 awaitable 完成，期间客户端断开连接时取消它
+    （合成任务没有其他请求等待时随之取消，不再占用上游槽位）
+    
+    Args:
+        request: 当前请求
+        awaitable: 要等待的协程
+        
+    Returns:
+        awaitable 的结果
+        
+    Raises:
+        HTTPException: 客户端已断开（499）
+    """
+    work = asyncio.ensure_future(awaitable)
+    
+    async def wait_disconnect():
+        while (await request.receive())["type"] != "http.disconnect":
+            pass
+        work.cancel()
+    
+    watcher = asyncio.ensure_future(wait_disconnect())
+    try:
+        return await work
+    except asyncio.CancelledError:
+        if not watcher.done() or watcher.cancelled():
+            # 请求本身被取消（如服务关闭），不是客户端断开
+            raise
+        app_logger.info("客户端已断开连接，取消请求")
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="客户端已断开连接")
+    finally:
+        watcher.cancel()
+
+
+def unknown_voice_exception(e: UnknownVoiceError) -> HTTPException:
+    """未知语音的 422 响应（附带相近的语音名称）"""
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail={
+            "message": str(e),
+            "voice": e.voice,
+            "suggestions": e.suggestions
+        }
+    )
+
+
+def quota_exceeded_exception(e: QuotaExceededError) -> HTTPException:
+    """合成配额用完的 429 响应"""
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=str(e),
+        headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+    )
+
 
 @router.post("/generate-stream")
-async def generate_speech_stream(request: TTSRequest):
+async def generate_speech_stream(request: TTSRequest, http_request: Request):
     """
     流式生成语音文件（直接返回音频流，适合快速播放）
     
     Args:
         request: TTS 请求参数
+        http_request: 原始请求（用于检测客户端断开）
         
     Returns:
         音频文件流
@@ -47,35 +225,56 @@ async def generate_speech_stream(request: TTSRequest):
             )
         
         # 调用服务生成语音
-        filename, file_path, actual_rate = await tts_service.text_to_speech(
-            text=request.text,
-            voice=request.voice,
-            rate=request.rate,
-            volume=request.volume,
-            pitch=request.pitch
+        filename, file_path, actual_rate, is_cached = await _cancel_on_disconnect(
+            http_request,
+            tts_service.text_to_speech(
+                text=request.text,
+                voice=request.voice,
+                rate=request.rate,
+                volume=request.volume,
+                pitch=request.pitch,
+                priority=request.priority or PRIORITY_INTERACTIVE
+            )
         )
         
-        # 流式返回音频文件
+        headers = {
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Audio-Filename": filename,
+            "X-Actual-Rate": actual_rate
+        }
+        
+        # 缓存文件交给 nginx 发送
+        accel = accel_redirect_response(filename, headers)
+        if accel is not None:
+            return accel
+        
+        # 共享热缓存或词表归档命中时直接返回内存数据
+        audio = _read_memory_audio(filename)
+        if audio is not None:
+            return Response(content=audio, media_type="audio/mpeg", headers=headers)
+        
+        # 流式返回音频文件（返回期间标记文件正在使用，清理任务不会删除）
         async def generate():
-            async with aiofiles.open(file_path, 'rb') as f:
-                while True:
-                    chunk = await f.read(8192)  # 8KB 块
-                    if not chunk:
-                        break
-                    yield chunk
+            with file_in_use(file_path):
+                async with aiofiles.open(file_path, 'rb') as f:
+                    while True:
+                        chunk = await f.read(8192)  # 8KB 块
+                        if not chunk:
+                            break
+                        yield chunk
         
         return StreamingResponse(
             generate(),
             media_type="audio/mpeg",
-            headers={
-                "Content-Disposition": f'attachment; filename="{filename}"',
-                "X-Audio-Filename": filename,
-                "X-Actual-Rate": actual_rate
-            }
+            headers=headers
         )
         
     except HTTPException:
         raise
+    except UnknownVoiceError as e:
+        raise unknown_voice_exception(e)
+    except QuotaExceededError as e:
+        raise quota_exceeded_exception(e)
     except Exception as e:
         app_logger.error(f"流式生成语音失败: {str(e)}")
         raise HTTPException(
@@ -85,12 +284,13 @@ async def generate_speech_stream(request: TTSRequest):
 
 
 @router.post("/generate", response_model=BaseResponse)
-async def generate_speech(request: TTSRequest):
+async def generate_speech(request: TTSRequest, http_request: Request):
     """
     生成语音文件
     
     Args:
         request: TTS 请求参数
+        http_request: 原始请求（用于检测客户端断开）
         
     Returns:
         包含音频文件 URL 的响应
@@ -106,12 +306,16 @@ async def generate_speech(request: TTSRequest):
             )
         
         # 调用服务生成语音
-        filename, file_path, actual_rate = await tts_service.text_to_speech(
-            text=request.text,
-            voice=request.voice,
-            rate=request.rate,
-            volume=request.volume,
-            pitch=request.pitch
+        filename, file_path, actual_rate, is_cached = await _cancel_on_disconnect(
+            http_request,
+            tts_service.text_to_speech(
+                text=request.text,
+                voice=request.voice,
+                rate=request.rate,
+                volume=request.volume,
+                pitch=request.pitch,
+                priority=request.priority or PRIORITY_INTERACTIVE
+            )
         )
         
         # 获取音频时长
@@ -125,12 +329,15 @@ async def generate_speech(request: TTSRequest):
         if request.return_audio:
             try:
                 # 检查文件大小，只对小文件返回 base64（避免响应过大）
-                file_size_mb = file_path.stat().st_size / (1024 * 1024)
+                audio_bytes = _read_memory_audio(filename)
+                file_size = len(audio_bytes) if audio_bytes is not None else file_path.stat().st_size
+                file_size_mb = file_size / (1024 * 1024)
                 if file_size_mb <= settings.max_base64_audio_size_mb:  # 只对小于限制的文件返回 base64
-                    with open(file_path, "rb") as f:
-                        audio_bytes = f.read()
-                        audio_data = base64.b64encode(audio_bytes).decode('utf-8')
-                        app_logger.info(f"返回音频数据（base64），大小: {file_size_mb:.2f}MB")
+                    if audio_bytes is None:
+                        with span("read"), open(file_path, "rb") as f:
+                            audio_bytes = f.read()
+                    audio_data = base64.b64encode(audio_bytes).decode('utf-8')
+                    app_logger.info(f"返回音频数据（base64），大小: {file_size_mb:.2f}MB")
                 else:
                     app_logger.warning(f"文件过大（{file_size_mb:.2f}MB），不返回 base64 数据")
             except Exception as e:
@@ -145,14 +352,19 @@ async def generate_speech(request: TTSRequest):
             audio_data=audio_data
         )
         
-        return BaseResponse(
-            code=200,
-            message="语音生成成功",
-            data=response_data
-        )
+        # 直接序列化（跳过 response_model 的二次校验）
+        return FastJSONResponse(content={
+            "code": 200,
+            "message": "语音生成成功",
+            "data": response_data.model_dump()
+        })
         
     except HTTPException:
         raise
+    except UnknownVoiceError as e:
+        raise unknown_voice_exception(e)
+    except QuotaExceededError as e:
+        raise quota_exceeded_exception(e)
     except Exception as e:
         app_logger.error(f"生成语音失败: {str(e)}")
         raise HTTPException(
@@ -161,8 +373,211 @@ async def generate_speech(request: TTSRequest):
         )
 
 
+@router.post("/concat")
+async def concat_speech(request: ConcatRequest, http_request: Request):
+    """
+    按顺序拼接多条音频为一个文件（条目为文本或已缓存的缓存键，只合成未缓存的文本）
+    
+    Args:
+        request: 拼接请求参数
+        http_request: 原始请求（用于检测客户端断开）
+        
+    Returns:
+        拼接后的音频（拼接结果按自己的缓存键缓存）
+    """
+    try:
+        app_logger.info(f"收到拼接请求 - 条目数: {len(request.items)}")
+        
+        if len(request.items) > settings.concat_max_items:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"条目数超过限制 ({settings.concat_max_items})"
+            )
+        if any(item.text is not None and len(item.text) > settings.max_text_length for item in request.items):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"文本长度超过限制 ({settings.max_text_length} 字符)"
+            )
+        
+        filename, file_path, is_cached = await _cancel_on_disconnect(
+            http_request,
+            tts_service.concat_to_speech(
+                items=[(item.text, item.key) for item in request.items],
+                gaps_ms=[request.gap_ms if item.gap_ms is None else item.gap_ms for item in request.items],
+                voice=request.voice,
+                rate=request.rate,
+                volume=request.volume,
+                pitch=request.pitch,
+                priority=request.priority or PRIORITY_INTERACTIVE
+            )
+        )
+        
+        headers = {
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Audio-Filename": filename,
+            "X-Cache": "HIT" if is_cached else "MISS"
+        }
+        
+        # 缓存文件交给 nginx 发送
+        accel = accel_redirect_response(filename, headers)
+        if accel is not None:
+            return accel
+        
+        # 共享热缓存或词表归档命中时直接返回内存数据
+        audio = _read_memory_audio(filename)
+        if audio is not None:
+            return Response(content=audio, media_type="audio/mpeg", headers=headers)
+        
+        # 发送期间标记文件正在使用（FileResponse 按文件大小设置 Content-Length）
+        acquire_file(file_path)
+        return FileResponse(
+            path=str(file_path),
+            media_type="audio/mpeg",
+            headers=headers,
+            background=BackgroundTask(release_file, file_path)
+        )
+        
+    except HTTPException:
+        raise
+    except FileNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except UnknownVoiceError as e:
+        raise unknown_voice_exception(e)
+    except QuotaExceededError as e:
+        raise quota_exceeded_exception(e)
+    except Exception as e:
+        app_logger.error(f"拼接音频失败: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"拼接音频失败: {str(e)}"
+        )
+
+
+# /tts/speak 的规范查询参数顺序
+SPEAK_PARAMS = ("text", "voice", "rate", "volume", "pitch")
+# 相同参数的音频内容不变，允许浏览器、nginx 和 CDN 长期缓存
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.get("/speak")
+async def speak(
+    request: Request,
+    text: str,
+    voice: Optional[str] = None,
+    rate: Optional[str] = None,
+    volume: Optional[str] = None,
+    pitch: Optional[str] = None
+):
+    """
+    GET 方式生成语音（直接返回音频，可被 nginx / CDN 按 URL 缓存）
+    
+    查询参数不是规范形式（参数顺序、多余参数、首尾空白、省略语音）时 301 重定向到规范 URL，
+    同一内容在边缘缓存中只对应一个 URL。
+    
+    Args:
+        text: 要转换的文本
+        voice: 语音名称（省略时重定向到带默认语音的 URL）
+        rate: 语速
+        volume: 音量
+        pitch: 音调
+        
+    Returns:
+        音频数据（带 immutable 缓存头和 ETag）
+    """
+    values = {
+        "text": text.strip(),
+        "voice": (voice or tts_service.default_voice).strip(),
+        "rate": rate.strip() if rate else None,
+        "volume": volume.strip() if volume else None,
+        "pitch": pitch.strip() if pitch else None,
+    }
+    # 先校验文本：空白文本的规范 URL 没有 text 参数，重定向后只会得到 422
+    if not values["text"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="文本内容不能为空"
+        )
+    if len(values["text"]) > settings.max_text_length:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"文本长度超过限制 ({settings.max_text_length} 字符)"
+        )
+    
+    canonical_query = urlencode(
+        [(name, values[name]) for name in SPEAK_PARAMS if values[name]],
+        quote_via=quote
+    )
+    if request.url.query != canonical_query:
+        return RedirectResponse(
+            url=f"{request.url.path}?{canonical_query}",
+            status_code=status.HTTP_301_MOVED_PERMANENTLY,
+            headers={"Cache-Control": "public, max-age=86400"}
+        )
+    
+    try:
+        if settings.enable_cache and "if-none-match" in request.headers:
+            # ETag 即缓存键，由参数决定：条件请求不需要先合成（音频不在本地缓存中也可以返回 304）
+            etag = f'"{tts_service.request_cache_key(**values)}"'
+            if request.headers["if-none-match"] == etag:
+                return Response(
+                    status_code=status.HTTP_304_NOT_MODIFIED,
+                    headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL, "ETag": etag}
+                )
+        
+        filename, file_path, actual_rate, is_cached = await _cancel_on_disconnect(
+            request,
+            tts_service.text_to_speech(
+                text=values["text"],
+                voice=values["voice"],
+                rate=values["rate"],
+                volume=values["volume"],
+                pitch=values["pitch"]
+            )
+        )
+    except HTTPException:
+        raise
+    except UnknownVoiceError as e:
+        raise unknown_voice_exception(e)
+    except QuotaExceededError as e:
+        raise quota_exceeded_exception(e)
+    except Exception as e:
+        app_logger.error(f"GET 生成语音失败: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"生成语音失败: {str(e)}"
+        )
+    
+    headers = {"X-Actual-Rate": actual_rate}
+    if _is_cache_filename(filename):
+        etag = f'"{filename[:-4]}"'
+        headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        headers["ETag"] = etag
+    else:
+        # 未启用缓存时输出文件会被清理，不允许长期缓存
+        headers["Cache-Control"] = "no-store"
+    
+    accel = accel_redirect_response(filename, headers)
+    if accel is not None:
+        return accel
+    
+    audio = _read_memory_audio(filename)
+    if audio is not None:
+        return Response(content=audio, media_type="audio/mpeg", headers=headers)
+    
+    acquire_file(file_path)
+    return FileResponse(
+        path=str(file_path),
+        media_type="audio/mpeg",
+        headers=headers,
+        background=BackgroundTask(release_file, file_path)
+    )
+
+
 @router.get("/download/{filename}")
-async def download_audio(filename: str):
+async def download_audio(filename: str, request: Request):
     """
     下载音频文件（支持缓存文件和普通文件）
     
@@ -177,6 +592,24 @@ async def download_audio(filename: str):
         if settings.enable_cache:
             # 如果文件名是 32 位十六进制字符串（MD5），则从缓存目录查找
             if len(filename) == 36 and filename.endswith(".mp3"):  # 32位哈希 + .mp3 = 36字符
+                # 其他节点的请求直接访问应用端口（不经过 nginx），不能返回 X-Accel-Redirect
+                accel = None
+                if PEER_REQUEST_HEADER not in request.headers:
+                    accel = accel_redirect_response(
+                        filename,
+                        {"Content-Disposition": f'attachment; filename="{filename}"'}
+                    )
+                if accel is not None:
+                    return accel
+                
+                audio = _read_memory_audio(filename)
+                if audio is not None:
+                    return Response(
+                        content=audio,
+                        media_type="audio/mpeg",
+                        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+                    )
+                
                 cache_key = filename.replace(".mp3", "")
                 cache_path = get_cache_path(cache_key, ".mp3")
                 if cache_path.exists():
@@ -195,10 +628,13 @@ async def download_audio(filename: str):
                 detail="文件不存在"
             )
         
+        # 发送期间标记文件正在使用，发送完成后取消标记
+        acquire_file(file_path)
         return FileResponse(
             path=str(file_path),
             media_type="audio/mpeg",
-            filename=filename
+            filename=filename,
+            background=BackgroundTask(release_file, file_path)
         )
         
     except HTTPException:
@@ -229,18 +665,32 @@ async def get_voices(
     try:
         app_logger.info(f"获取语音列表请求 - locale: {locale}, gender: {gender}")
         
-        voices = await tts_service.get_voices(locale=locale, gender=gender)
+        global _voices_json_version
         
-        response_data = VoiceListResponse(
-            total=len(voices),
-            voices=voices
-        )
+        # 语音目录过期时在这里刷新，版本变化后丢弃旧的预渲染结果
+        await tts_service.get_voice_catalog()
+        if _voices_json_version != tts_service.voice_catalog_version:
+            _voices_json_cache.clear()
+            _voices_json_version = tts_service.voice_catalog_version
         
-        return BaseResponse(
-            code=200,
-            message="获取语音列表成功",
-            data=response_data
-        )
+        body = _voices_json_cache.get((locale, gender))
+        if body is None:
+            voices = await tts_service.get_voices(locale=locale, gender=gender)
+            
+            response_data = VoiceListResponse(
+                total=len(voices),
+                voices=voices
+            )
+            body = dumps({
+                "code": 200,
+                "message": "获取语音列表成功",
+                "data": response_data.model_dump()
+            })
+            if len(_voices_json_cache) >= VOICES_JSON_CACHE_MAX_ENTRIES:
+                _voices_json_cache.clear()
+            _voices_json_cache[(locale, gender)] = body
+        
+        return FastJSONResponse(content=body)
         
     except Exception as e:
         app_logger.error(f"获取语音列表失败: {str(e)}")
@@ -285,3 +735,30 @@ async def delete_audio_file(filename: str):
             detail=f"删除文件失败: {str(e)}"
         )
 
+
+
+@router.get("/stats", response_model=BaseResponse)
+async def get_stats():
+    """
+    获取运行统计（上游调度队列深度和等待时间等）
+    
+    Returns:
+        统计信息
+    """
+    archive = get_vocab_archive()
+    return BaseResponse(
+        code=200,
+        message="获取统计信息成功",
+        data={
+            "scheduler": tts_service.scheduler.stats(),
+            "reaper": output_reaper.stats(),
+            "vocab_archive": archive.stats() if archive is not None else None,
+            "peers": peer_cache.stats(),
+            "quotas": client_quotas.stats(),
+            "silence_trim": get_trim_stats(),
+            "cancellation": tts_service.cancel_stats(),
+            "rewarm": rewarmer.stats(),
+            "cache_verify": cache_verifier.stats(),
+            "inflight_syntheses": len(tts_service._inflight)
+        }
+    )
@@ -6,8 +6,12 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from app.config import settings
-from app.controllers import tts_router
-from app.utils import app_logger, ensure_output_dir, ensure_cache_dir
+from app.controllers import tts_router, job_router, cache_router
+from app.controllers.tts_controller import tts_service
+from app.services import output_reaper, warmup, peer_cache, rewarmer, cache_verifier
+from app.utils import app_logger, ensure_output_dir, ensure_cache_dir, get_vocab_archive
+from app.utils.tracing import TracingMiddleware, span_exporter
+from app.utils.client_identity import ClientIdentityMiddleware
 
 
 def create_app() -> FastAPI:
@@ -32,10 +36,19 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["GET", "POST", "DELETE", "OPTIONS"],
         allow_headers=["*"],
+        expose_headers=["Server-Timing", "X-Request-ID", "Retry-After"],
     )
     
+    # 请求追踪（Server-Timing、X-Request-ID、采样导出）
+    app.add_middleware(TracingMiddleware)
+    
+    # 客户端标识（上游合成配额和公平排队按客户端区分）
+    app.add_middleware(ClientIdentityMiddleware)
+    
     # 注册路由
     app.include_router(tts_router, prefix=settings.api_prefix)
+    app.include_router(job_router, prefix=settings.api_prefix)
+    app.include_router(cache_router, prefix=settings.api_prefix)
     
     # 全局异常处理
     @app.exception_handler(Exception)
@@ -65,6 +78,21 @@ def create_app() -> FastAPI:
         if settings.enable_cache:
             ensure_cache_dir()
             app_logger.info(f"缓存目录已准备: {settings.cache_dir}")
+            
+            # 映射词表归档（每个 worker 各自映射，共享页缓存）
+            get_vocab_archive()
+            
+            # 后台校验缓存完整性（不阻塞就绪）
+            cache_verifier.start()
+        
+        # 启动输出目录清理任务
+        output_reaper.start()
+        
+        # 后台预热（完成后 /ready 返回 200）
+        warmup.start(tts_service)
+        
+        # 预测性回热任务
+        rewarmer.start(tts_service)
         
         app_logger.info("应用启动完成")
     
@@ -73,6 +101,14 @@ def create_app() -> FastAPI:
     async def shutdown_event():
         """应用关闭时的清理操作"""
         app_logger.info("应用正在关闭...")
+        await warmup.stop()
+        await rewarmer.stop()
+        # 进行中的请求已由 uvicorn 等待完成，这里等待没有请求等待的后台合成写入缓存
+        await tts_service.drain(settings.synthesis_drain_seconds)
+        await cache_verifier.stop()
+        await output_reaper.stop()
+        await peer_cache.close()
+        await span_exporter.flush()
     
     # 健康检查端点
     @app.get("/health")
@@ -84,6 +120,22 @@ def create_app() -> FastAPI:
             "version": settings.app_version
         }
     
+    # 就绪检查端点
+    @app.get("/ready")
+    async def readiness_check():
+        """就绪检查接口（启动预热完成前返回 503）"""
+        if not warmup.ready:
+            return JSONResponse(
+                status_code=503,
+                content={"status": "warming_up", "app_name": settings.app_name}
+            )
+        return {
+            "status": "ready",
+            "app_name": settings.app_name,
+            "version": settings.app_version,
+            "warmup": warmup.result
+        }
+    
     # 根路径
     @app.get("/")
     async def root():
@@ -101,11 +153,6 @@ def create_app() -> FastAPI:
 app = create_app()
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(
-        "app.main:app",
-        host=settings.host,
-        port=settings.port,
-        reload=settings.debug
-    )
+    from run import main
+    main()
 
@@ -1,20 +1,25 @@
 """
 数据模型模块
 """
-from app.models.request_models import TTSRequest, VoiceListRequest
+from app.models.request_models import TTSRequest, ConcatRequest, ConcatItem, VoiceListRequest, CacheExportRequest
 from app.models.response_models import (
     BaseResponse,
     TTSResponse,
     VoiceInfo,
-    VoiceListResponse
+    VoiceListResponse,
+    JobInfo
 )
 
 __all__ = [
     "TTSRequest",
+    "ConcatRequest",
+    "ConcatItem",
     "VoiceListRequest",
+    "CacheExportRequest",
     "BaseResponse",
     "TTSResponse",
     "VoiceInfo",
-    "VoiceListResponse"
+    "VoiceListResponse",
+    "JobInfo"
 ]
 
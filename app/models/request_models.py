@@ -2,8 +2,12 @@
 请求数据模型
 定义 API 请求的数据结构
 """
+import re
 from typing import Optional
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+
+CACHE_KEY_PATTERN = re.compile(r"^[0-9a-f]{32}$")
 
 
 class TTSRequest(BaseModel):
@@ -41,6 +45,11 @@ class TTSRequest(BaseModel):
         description="是否直接在响应中返回音频数据（base64编码），适用于小文件快速播放"
     )
     
+    priority: Optional[str] = Field(
+        None,
+        description="上游合成优先级：interactive（默认，交互查询）、prefetch（预取）、batch（批量）"
+    )
+    
     @field_validator("text")
     @classmethod
     def validate_text(cls, v: str) -> str:
@@ -48,6 +57,111 @@ class TTSRequest(BaseModel):
         if not v or not v.strip():
             raise ValueError("文本内容不能为空")
         return v.strip()
+    
+    @field_validator("priority")
+    @classmethod
+    def validate_priority(cls, v: Optional[str]) -> Optional[str]:
+        """验证优先级类别"""
+        if v is not None and v not in ("interactive", "prefetch", "batch"):
+            raise ValueError("priority 只能是 interactive、prefetch 或 batch")
+        return v
+
+
+class ConcatItem(BaseModel):
+    """拼接条目：文本或已缓存音频的缓存键（二选一）"""
+    
+    text: Optional[str] = Field(
+        None,
+        description="要转换的文本内容（未缓存时合成）"
+    )
+    
+    key: Optional[str] = Field(
+        None,
+        description="已缓存音频的缓存键（32 位十六进制，可带 .mp3 后缀）"
+    )
+    
+    gap_ms: Optional[int] = Field(
+        None,
+        ge=0,
+        le=10000,
+        description="该条之后插入的静音时长（毫秒），未指定时使用请求的 gap_ms"
+    )
+    
+    @field_validator("text")
+    @classmethod
+    def validate_text(cls, v: Optional[str]) -> Optional[str]:
+        """验证文本内容"""
+        if v is not None and not v.strip():
+            raise ValueError("文本内容不能为空")
+        return v.strip() if v is not None else None
+    
+    @field_validator("key")
+    @classmethod
+    def validate_key(cls, v: Optional[str]) -> Optional[str]:
+        """验证缓存键"""
+        if v is None:
+            return None
+        v = v.removesuffix(".mp3")
+        if not CACHE_KEY_PATTERN.match(v):
+            raise ValueError("缓存键必须是 32 位十六进制字符串")
+        return v
+    
+    @model_validator(mode="after")
+    def validate_source(self) -> "ConcatItem":
+        """text 和 key 必须且只能指定一个"""
+        if (self.text is None) == (self.key is None):
+            raise ValueError("text 和 key 必须且只能指定一个")
+        return self
+
+
+class ConcatRequest(BaseModel):
+    """音频拼接请求模型"""
+    
+    items: list[ConcatItem] = Field(
+        ...,
+        min_length=1,
+        description="按顺序拼接的条目"
+    )
+    
+    gap_ms: int = Field(
+        0,
+        ge=0,
+        le=10000,
+        description="条目之间默认插入的静音时长（毫秒）"
+    )
+    
+    voice: Optional[str] = Field(
+        None,
+        description="文本条目使用的语音名称"
+    )
+    
+    rate: Optional[str] = Field(
+        None,
+        description="文本条目使用的语速"
+    )
+    
+    volume: Optional[str] = Field(
+        None,
+        description="文本条目使用的音量"
+    )
+    
+    pitch: Optional[str] = Field(
+        None,
+        description="文本条目使用的音调"
+    )
+    
+    priority: Optional[str] = Field(
+        None,
+        description="上游合成优先级：interactive（默认）、prefetch、batch"
+    )
+    
+    @field_validator("priority")
+    @classmethod
+    def validate_priority(cls, v: Optional[str]) -> Optional[str]:
+        """验证优先级类别"""
+        if v is not None and v not in ("interactive", "prefetch", "batch"):
+            raise ValueError("priority 只能是 interactive、prefetch 或 batch")
+        return v
 
 
 class VoiceListRequest(BaseModel):
@@ -63,3 +177,11 @@ class VoiceListRequest(BaseModel):
         description="性别过滤：Male 或 Female"
     )
 
+
+class CacheExportRequest(BaseModel):
+    """缓存导出请求模型（增量同步时只导出对方缺少的条目）"""
+    
+    keys: list[str] = Field(
+        ...,
+        description="要导出的缓存键列表（32 位十六进制 MD5）"
+    )
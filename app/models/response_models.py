@@ -40,3 +40,19 @@ class VoiceListResponse(BaseModel):
     total: int = Field(..., description="语音总数")
     voices: list[VoiceInfo] = Field(..., description="语音列表")
 
+
+
+class JobInfo(BaseModel):
+    """异步合成任务信息模型"""
+    
+    job_id: str = Field(..., description="任务 ID")
+    cache_key: str = Field(..., description="最终音频的缓存键")
+    status: str = Field(..., description="任务状态：pending、running、done、failed")
+    chunks_done: int = Field(..., description="已完成的分段数")
+    chunks_total: int = Field(..., description="分段总数")
+    status_url: str = Field(..., description="任务状态 URL（支持 wait 参数长轮询）")
+    result_url: str = Field(..., description="音频结果 URL（任务完成后可用）")
+    playlist_url: str = Field(..., description="HLS 播放列表 URL（第一段完成后即可播放，随合成进度增长）")
+    audio_url: Optional[str] = Field(None, description="缓存音频下载 URL（任务完成后返回）")
+    error: Optional[str] = Field(None, description="失败原因")
+    elapsed: Optional[float] = Field(None, description="任务已运行时间（秒）")
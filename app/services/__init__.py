@@ -1,7 +1,30 @@
 """
 服务模块
 """
-from app.services.tts_service import TTSService
-
-__all__ = ["TTSService"]
+from app.services.tts_service import TTSService, UnknownVoiceError
+from app.services.job_service import JobService
+from app.services.reaper import OutputReaper, output_reaper
+from app.services.warmup import Warmup, warmup
+from app.services.peer_cache import PeerCache, peer_cache
+from app.services.quota import ClientQuotas, QuotaExceededError, client_quotas
+from app.services.rewarmer import Rewarmer, rewarmer
+from app.services.cache_verifier import CacheVerifier, cache_verifier
 
+__all__ = [
+    "TTSService",
+    "UnknownVoiceError",
+    "JobService",
+    "OutputReaper",
+    "output_reaper",
+    "Warmup",
+    "warmup",
+    "PeerCache",
+    "peer_cache",
+    "ClientQuotas",
+    "QuotaExceededError",
+    "client_quotas",
+    "Rewarmer",
+    "rewarmer",
+    "CacheVerifier",
+    "cache_verifier"
+]
@@ -0,0 +1,208 @@
+"""
+缓存完整性校验
+缓存文件先写入临时文件再原子替换，但进程崩溃、断电、磁盘写满或从其他节点导入的数据
+仍可能留下不完整的条目，而读取路径只检查文件是否存在，损坏的条目会一直被返回。
+校验任务在后台用线程池逐帧检查缓存音频（mp3_utils.check_integrity），把损坏的条目移到隔离目录，
+之后的请求按未命中重新合成：
+- 启动时只检查上次校验之后写入或被替换的条目（按 ctime / mtime，检查点保存在缓存目录中），不阻塞就绪
+- 之后每隔 cache_verify_interval_seconds 检查全部条目
+多 worker 部署时通过文件锁只由一个 worker 执行。
+"""
+import asyncio
+import fcntl
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+from app.config import settings
+from app.utils import app_logger, ensure_cache_dir, get_hot_cache
+from app.utils.cache_transfer import CACHE_ENTRY_PATTERN
+from app.utils.mp3_utils import check_integrity
+
+
+CHECKPOINT_NAME = ".verify-checkpoint"
+LOCK_NAME = ".verify.lock"
+QUARANTINE_DIR = ".quarantine"
+# 检查点比本次校验开始时间提前的秒数（覆盖时间戳精度和校验期间写入的文件）
+CHECKPOINT_MARGIN_SECONDS = 60
+# 结果中保留的损坏条目数
+MAX_REPORTED_PROBLEMS = 20
+
+
+class CacheVerifier:
+    """缓存完整性校验任务"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.passes = 0
+        self.files_checked = 0
+        self.files_quarantined = 0
+        self.last_pass: Optional[dict] = None
+
+    def start(self) -> None:
+        """启动后台校验（先校验启动前新写入的条目，之后定期全量校验）"""
+        if self._task is None and settings.enable_cache and settings.cache_verify_enabled:
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        """停止后台校验"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run_forever(self) -> None:
+        full = False
+        while True:
+            try:
+                await self.verify_once(full=full)
+            except Exception as e:
+                app_logger.error(f"缓存完整性校验失败: {str(e)}")
+            if settings.cache_verify_interval_seconds <= 0:
+                return
+            await asyncio.sleep(settings.cache_verify_interval_seconds)
+            full = True
+
+    async def verify_once(self, full: bool = True) -> Optional[dict]:
+        """
+        执行一次校验
+
+        Args:
+            full: 校验全部条目（否则只校验检查点之后写入的条目）
+
+        Returns:
+            本次校验结果（扫描数、校验数、隔离数、损坏条目、耗时）；其他 worker 正在校验时返回 None
+        """
+        started = time.perf_counter()
+        result = await asyncio.to_thread(self._verify, ensure_cache_dir(), full)
+        if result is None:
+            return None
+        result["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+
+        self.passes += 1
+        self.files_checked += result["checked"]
+        self.files_quarantined += result["quarantined"]
+        self.last_pass = result
+        message = (
+            f"缓存完整性校验完成 - {'全量' if full else '增量'}, 扫描 {result['scanned']} 个, "
+            f"校验 {result['checked']} 个, 隔离 {result['quarantined']} 个, 耗时 {result['duration_ms']:.1f}ms"
+        )
+        if result["quarantined"]:
+            app_logger.warning(message)
+        else:
+            app_logger.info(message)
+        return result
+
+    def _verify(self, cache_dir: Path, full: bool) -> Optional[dict]:
+        """在线程中扫描、校验并隔离损坏的条目"""
+        lock_fd = os.open(cache_dir / LOCK_NAME, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+
+            pass_started = time.time()
+            since = 0.0 if full else self._read_checkpoint(cache_dir)
+            scanned = 0
+            candidates: list[str] = []
+            with os.scandir(cache_dir) as it:
+                for entry in it:
+                    if CACHE_ENTRY_PATTERN.match(entry.name) is None:
+                        continue
+                    scanned += 1
+                    try:
+                        stat = entry.stat(follow_symlinks=False)
+                    except FileNotFoundError:
+                        continue
+                    # 原子替换和导入时设置的 mtime 都会更新 ctime
+                    if max(stat.st_mtime, stat.st_ctime) >= since:
+                        candidates.append(entry.path)
+
+            with ThreadPoolExecutor(max_workers=max(1, settings.cache_verify_workers)) as pool:
+                reasons = list(pool.map(self._check_file, candidates))
+
+            problems = []
+            quarantined = 0
+            for path, reason in zip(candidates, reasons):
+                if reason is None:
+                    continue
+                if self._quarantine(cache_dir, Path(path), reason):
+                    quarantined += 1
+                    if len(problems) < MAX_REPORTED_PROBLEMS:
+                        problems.append({"key": Path(path).stem, "reason": reason})
+
+            self._write_checkpoint(cache_dir, pass_started - CHECKPOINT_MARGIN_SECONDS)
+            return {
+                "full": full,
+                "scanned": scanned,
+                "checked": len(candidates),
+                "quarantined": quarantined,
+                "problems": problems,
+            }
+        finally:
+            os.close(lock_fd)
+
+    @staticmethod
+    def _check_file(path: str) -> Optional[str]:
+        """校验单个缓存文件，返回问题描述（完整或已不存在时返回 None）"""
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        return check_integrity(data)
+
+    def _quarantine(self, cache_dir: Path, path: Path, reason: str) -> bool:
+        """把损坏的条目移到隔离目录（移动前重新校验，期间已被重新写入的条目不移动）"""
+        if self._check_file(str(path)) is None:
+            return False
+        quarantine_dir = cache_dir / QUARANTINE_DIR
+        quarantine_dir.mkdir(exist_ok=True)
+        try:
+            os.replace(path, quarantine_dir / path.name)
+        except FileNotFoundError:
+            return False
+
+        hot_cache = get_hot_cache()
+        if hot_cache is not None:
+            hot_cache.discard(path.stem)
+        app_logger.warning(f"缓存条目已隔离 - {path.name}: {reason}")
+        return True
+
+    @staticmethod
+    def _read_checkpoint(cache_dir: Path) -> float:
+        try:
+            return float((cache_dir / CHECKPOINT_NAME).read_text().strip())
+        except (FileNotFoundError, ValueError):
+            return 0.0
+
+    @staticmethod
+    def _write_checkpoint(cache_dir: Path, value: float) -> None:
+        temp_path = cache_dir / f"{CHECKPOINT_NAME}.{os.getpid()}.tmp"
+        temp_path.write_text(f"{value:.3f}\n")
+        os.replace(temp_path, cache_dir / CHECKPOINT_NAME)
+
+    def stats(self) -> dict:
+        """校验统计"""
+        quarantine_dir = Path(settings.cache_dir) / QUARANTINE_DIR
+        try:
+            quarantine_files = sum(1 for _ in os.scandir(quarantine_dir))
+        except FileNotFoundError:
+            quarantine_files = 0
+        return {
+            "enabled": settings.enable_cache and settings.cache_verify_enabled,
+            "passes": self.passes,
+            "files_checked": self.files_checked,
+            "files_quarantined": self.files_quarantined,
+            "quarantine_files": quarantine_files,
+            "last_pass": self.last_pass,
+        }
+
+
+# 全局缓存校验任务实例
+cache_verifier = CacheVerifier()
@@ -0,0 +1,580 @@
+"""
+异步合成任务服务
+长文本按句切分后逐段合成（每段独立缓存），最后按帧拼接为完整音频写入缓存。
+已完成的连续分段可以作为 HLS 分段边合成边播放（第一段较短，尽快可播）。
+任务在后台运行，与发起请求的 HTTP 连接无关，客户端断开后任务继续执行；
+相同缓存键的任务只会创建一个。
+
+多 worker 部署时状态查询、长轮询、HLS 播放列表和分段请求可能到达任何一个 worker，
+任务状态因此保存在 cache_dir/.jobs 下（每个任务一个 JSON 记录，另有缓存键到任务 ID 的索引）：
+- 创建任务的 worker 执行合成，期间持有 <job_id>.lock 上的 fcntl 锁，每完成一段更新记录；
+- 其他 worker 按记录重建任务，长轮询时定期重新读取记录；
+- 执行任务的 worker 退出或崩溃后锁自动释放，下一个读取该任务的 worker 接手继续合成（已缓存的段直接命中）；
+- 未启用缓存时各段和拼接结果是输出目录中的临时文件，任务把它们链接到 .jobs/<job_id>/ 下保留到任务过期。
+"""
+import asyncio
+import fcntl
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+from app.config import settings
+from app.services.scheduler import PRIORITY_BATCH
+from app.utils import (
+    app_logger,
+    check_cache_exists,
+    get_cache_filename,
+    read_audio_file,
+    split_text_progressive,
+    is_mixed_script
+)
+from app.utils.mp3_utils import audio_duration
+
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+JOB_DIR_NAME = ".jobs"
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+# 每个 worker 清理过期任务记录的最小间隔（秒）
+JOB_PURGE_INTERVAL_SECONDS = 60.0
+
+
+@dataclass
+class SynthesisJob:
+    """异步合成任务"""
+
+    job_id: str
+    cache_key: str
+    text: str
+    voice: str
+    rate: str
+    volume: str
+    pitch: str
+    priority: str
+    chunks: list[str]
+    status: str = JOB_PENDING
+    chunks_done: int = 0
+    # 各段的 (音频路径, 时长秒)，未完成的段为 None
+    segments: list[Optional[tuple[Path, float]]] = field(default_factory=list)
+    error: Optional[str] = None
+    filename: Optional[str] = None
+    file_path: Optional[Path] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+    # 执行任务的 worker 持有的任务锁（其他 worker 按记录重建的任务为 -1）
+    _lock_fd: int = field(default=-1, repr=False)
+    # 按顺序写入任务记录（后写入的记录总是更新的状态）
+    _save_lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+    @property
+    def chunks_total(self) -> int:
+        return len(self.chunks)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JOB_DONE, JOB_FAILED)
+
+    def notify(self) -> None:
+        """唤醒所有等待状态变化的长轮询请求"""
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait_for_change(self, since: Optional[int], timeout: float) -> None:
+        """
+        等待任务状态变化（长轮询）
+
+        Args:
+            since: 客户端已知的完成段数；与当前值不同时立即返回
+            timeout: 最长等待时间（秒）
+        """
+        if self.finished or (since is not None and since != self.chunks_done):
+            return
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def to_record(self) -> dict:
+        """任务记录（保存到 cache_dir/.jobs/<job_id>.json）"""
+        return {
+            "job_id": self.job_id,
+            "cache_key": self.cache_key,
+            "text": self.text,
+            "voice": self.voice,
+            "rate": self.rate,
+            "volume": self.volume,
+            "pitch": self.pitch,
+            "priority": self.priority,
+            "chunks": self.chunks,
+            "status": self.status,
+            "chunks_done": self.chunks_done,
+            "segments": [
+                None if segment is None else [str(segment[0]), segment[1]]
+                for segment in self.segments
+            ],
+            "error": self.error,
+            "filename": self.filename,
+            "file_path": None if self.file_path is None else str(self.file_path),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+    @classmethod
+    def from_record(cls, record: dict) -> "SynthesisJob":
+        """按任务记录重建任务"""
+        return cls(
+            job_id=record["job_id"],
+            cache_key=record["cache_key"],
+            text=record["text"],
+            voice=record["voice"],
+            rate=record["rate"],
+            volume=record["volume"],
+            pitch=record["pitch"],
+            priority=record["priority"],
+            chunks=record["chunks"],
+            status=record["status"],
+            chunks_done=record["chunks_done"],
+            segments=[
+                None if segment is None else (Path(segment[0]), segment[1])
+                for segment in record["segments"]
+            ],
+            error=record["error"],
+            filename=record["filename"],
+            file_path=None if record["file_path"] is None else Path(record["file_path"]),
+            created_at=record["created_at"],
+            finished_at=record["finished_at"],
+        )
+
+
+def get_job_dir() -> Path:
+    """任务记录目录（cache_dir/.jobs）"""
+    job_dir = Path(settings.cache_dir) / JOB_DIR_NAME
+    job_dir.mkdir(parents=True, exist_ok=True)
+    return job_dir
+
+
+class JobService:
+    """异步合成任务服务类"""
+
+    def __init__(self, tts_service):
+        """
+        Args:
+            tts_service: TTSService 实例（分段合成复用其缓存和去重逻辑）
+        """
+        self.tts_service = tts_service
+        # 本 worker 执行的任务（其他 worker 的任务每次按记录重建）
+        self._jobs: dict[str, SynthesisJob] = {}
+        self._jobs_by_key: dict[str, SynthesisJob] = {}
+        # 持有后台任务的引用，防止任务在运行中被垃圾回收
+        self._tasks: set[asyncio.Task] = set()
+        self._last_purge = 0.0
+
+    async def submit(
+        self,
+        text: str,
+        voice: Optional[str] = None,
+        rate: Optional[str] = None,
+        volume: Optional[str] = None,
+        pitch: Optional[str] = None,
+        priority: str = PRIORITY_BATCH
+    ) -> tuple[SynthesisJob, bool]:
+        """
+        提交合成任务（相同缓存键的未失败任务直接复用；已完成的任务只在结果音频仍在缓存中时复用）
+
+        Args:
+            priority: 分段合成使用的上游调度优先级（默认 batch）
+
+        Returns:
+            (任务, 是否新建) 元组
+        """
+        await self._purge_expired()
+
+        processed_text, selected_voice, selected_rate, selected_volume, selected_pitch, cache_key = \
+            self.tts_service.resolve_params(text, voice, rate, volume, pitch)
+        if settings.mixed_language_enabled and is_mixed_script(processed_text):
+            # 中俄混合文本由 text_to_speech 按混合缓存键缓存，任务使用同一个键（单段任务无需拼接，已缓存的任务可直接命中）
+            cache_key = self.tts_service.mixed_cache_key(
+                processed_text, selected_voice, selected_rate, selected_volume, selected_pitch
+            )
+
+        existing = await self._get_by_key(cache_key)
+        if existing is not None and existing.status != JOB_FAILED and (
+            existing.status != JOB_DONE or self._result_available(existing)
+        ):
+            app_logger.info(f"复用已有合成任务 - job_id: {existing.job_id}, cache_key: {cache_key}")
+            return existing, False
+
+        job = SynthesisJob(
+            job_id=uuid.uuid4().hex,
+            cache_key=cache_key,
+            text=processed_text,
+            voice=selected_voice,
+            rate=selected_rate,
+            volume=selected_volume,
+            pitch=selected_pitch,
+            priority=priority,
+            chunks=split_text_progressive(
+                processed_text,
+                settings.job_first_chunk_max_chars,
+                settings.job_chunk_max_chars
+            ) or [processed_text]
+        )
+        # 先持有任务锁再写记录，其他 worker 读到记录时不会误认为任务无人执行
+        job._lock_fd = self._try_lock(job.job_id)
+        self._jobs[job.job_id] = job
+        self._jobs_by_key[cache_key] = job
+
+        cached_file = check_cache_exists(cache_key, ".mp3")
+        if cached_file:
+            job.chunks_done = job.chunks_total
+            await self._finish(job, get_cache_filename(cache_key, ".mp3"), cached_file)
+        else:
+            await self._save(job)
+            self._start(job)
+        await asyncio.to_thread(self._write_key_index, cache_key, job.job_id)
+
+        app_logger.info(
+            f"创建合成任务 - job_id: {job.job_id}, cache_key: {cache_key}, "
+            f"text_length: {len(processed_text)}, chunks: {job.chunks_total}"
+        )
+        return job, True
+
+    async def get(self, job_id: str) -> Optional[SynthesisJob]:
+        """
+        按任务 ID 获取任务（其他 worker 的任务按记录重建；无人执行的未完成任务由本 worker 接手）
+
+        Returns:
+            任务；不存在或已过期时返回 None
+        """
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return None if self._expired(job) else job
+        if JOB_ID_PATTERN.match(job_id) is None:
+            return None
+
+        job = await asyncio.to_thread(self._load, job_id)
+        if job is None or self._expired(job):
+            return None
+        if not job.finished:
+            return await self._adopt_if_orphaned(job)
+        return job
+
+    async def wait_for_change(self, job: SynthesisJob, since: Optional[int], timeout: float) -> SynthesisJob:
+        """
+        等待任务状态变化（长轮询）
+
+        本 worker 执行的任务等待状态变化通知；其他 worker 的任务每隔 job_poll_interval_seconds 重新读取记录。
+
+        Args:
+            since: 客户端已知的完成段数；与当前值不同时立即返回
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            最新的任务
+        """
+        deadline = time.monotonic() + timeout
+        current = job
+        while True:
+            if self._jobs.get(current.job_id) is current:
+                await current.wait_for_change(since, max(0.0, deadline - time.monotonic()))
+                return current
+            if current.finished or current.status != job.status or \
+                    current.chunks_done != (job.chunks_done if since is None else since):
+                return current
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return current
+            await asyncio.sleep(min(settings.job_poll_interval_seconds, remaining))
+            latest = await self.get(current.job_id)
+            if latest is None:
+                return current
+            current = latest
+
+    async def ready_segments(self, job: SynthesisJob) -> list[tuple[Path, float]]:
+        """
+        从第一段开始连续已完成的分段（用于 HLS 播放列表）
+
+        提交时整体已缓存的任务没有合成过程：各段音频仍在缓存中时使用各段，否则整条音频作为唯一的分段
+        （计算出的分段写回任务记录，其他 worker 不必重复读取音频计算时长）。
+
+        Returns:
+            (音频路径, 时长秒) 列表
+        """
+        if not job.segments and job.status == JOB_DONE and job.file_path is not None:
+            paths = self._cached_chunk_paths(job) or [job.file_path]
+            job.segments = [
+                (path, await asyncio.to_thread(self._segment_duration, path))
+                for path in paths
+            ]
+            await self._save(job)
+        ready = []
+        for segment in job.segments:
+            if segment is None:
+                break
+            ready.append(segment)
+        return ready
+
+    def _cached_chunk_paths(self, job: SynthesisJob) -> Optional[list[Path]]:
+        """各段的缓存文件路径（有段未缓存或为中俄混合文本时返回 None）"""
+        if job.chunks_total <= 1:
+            return None
+        paths = []
+        for chunk in job.chunks:
+            if settings.mixed_language_enabled and is_mixed_script(chunk):
+                return None
+            cache_key = self.tts_service.resolve_params(chunk, job.voice, job.rate, job.volume, job.pitch)[5]
+            path = check_cache_exists(cache_key, ".mp3")
+            if path is None:
+                return None
+            paths.append(path)
+        return paths
+
+    @staticmethod
+    def _segment_duration(file_path: Path) -> float:
+        return audio_duration(read_audio_file(file_path))
+
+    def _start(self, job: SynthesisJob) -> None:
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job: SynthesisJob) -> None:
+        """后台执行任务：并发合成各段，再拼接写入缓存"""
+        job.status = JOB_RUNNING
+        job.chunks_done = 0
+        await self._save(job)
+        job.notify()
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(settings.job_chunk_concurrency)
+        job.segments = [None] * job.chunks_total
+
+        async def synthesize_chunk(index: int, chunk: str) -> Path:
+            async with semaphore:
+                _, chunk_path, _, _ = await self.tts_service.text_to_speech(
+                    text=chunk,
+                    voice=job.voice,
+                    rate=job.rate,
+                    volume=job.volume,
+                    pitch=job.pitch,
+                    priority=job.priority
+                )
+            if not settings.enable_cache:
+                chunk_path = await asyncio.to_thread(self._keep_file, job.job_id, chunk_path, f"{index}.mp3")
+            job.segments[index] = (chunk_path, await asyncio.to_thread(self._segment_duration, chunk_path))
+            job.chunks_done += 1
+            # 先写记录再通知：长轮询返回后客户端的下一个请求可能到达其他 worker
+            await self._save(job)
+            job.notify()
+            return chunk_path
+
+        try:
+            chunk_paths = await asyncio.gather(*(synthesize_chunk(i, chunk) for i, chunk in enumerate(job.chunks)))
+
+            if len(chunk_paths) == 1:
+                # 单段任务的分段缓存键与整体缓存键相同，无需拼接
+                file_path = chunk_paths[0]
+            else:
+                # 各段仍是 HLS 分段，拼接后保留
+                file_path = await asyncio.to_thread(
+                    self.tts_service.stitch_audio, job.cache_key, chunk_paths, None, True
+                )
+                if not settings.enable_cache:
+                    file_path = await asyncio.to_thread(self._keep_file, job.job_id, file_path, "result.mp3", True)
+
+            await self._finish(job, file_path.name, file_path)
+            app_logger.info(
+                f"[性能追踪] 合成任务完成 - job_id: {job.job_id}, chunks: {job.chunks_total}, "
+                f"耗时: {time.perf_counter() - started:.2f}s"
+            )
+        except Exception as e:
+            job.status = JOB_FAILED
+            job.error = str(e)
+            job.finished_at = time.time()
+            await self._save(job)
+            self._unlock(job)
+            job.notify()
+            app_logger.error(f"合成任务失败 - job_id: {job.job_id}: {str(e)}")
+
+    async def _finish(self, job: SynthesisJob, filename: str, file_path: Path) -> None:
+        job.status = JOB_DONE
+        job.filename = filename
+        job.file_path = file_path
+        job.finished_at = time.time()
+        await self._save(job)
+        self._unlock(job)
+        job.notify()
+
+    @staticmethod
+    def _result_available(job: SynthesisJob) -> bool:
+        """已完成任务的音频是否仍可获取（缓存条目可能已被删除或隔离）"""
+        if settings.enable_cache:
+            return check_cache_exists(job.cache_key, ".mp3") is not None
+        return job.file_path is not None and job.file_path.exists()
+
+    @staticmethod
+    def _expired(job: SynthesisJob) -> bool:
+        return job.finished and job.finished_at is not None and \
+            job.finished_at < time.time() - settings.job_ttl_seconds
+
+    @staticmethod
+    def _keep_file(job_id: str, file_path: Path, name: str, move: bool = False) -> Path:
+        """
+        把输出目录中的临时文件保留到 .jobs/<job_id>/ 下（清理任务不会删除，任务过期时一起删除）
+
+        Args:
+            move: 移动文件（否则建立硬链接，同一合成结果的其他请求仍使用原文件；跨文件系统时复制）
+        """
+        target_dir = get_job_dir() / job_id
+        target_dir.mkdir(exist_ok=True)
+        target = target_dir / name
+        if move:
+            shutil.move(file_path, target)
+            return target
+        target.unlink(missing_ok=True)
+        try:
+            os.link(file_path, target)
+        except OSError:
+            shutil.copyfile(file_path, target)
+        return target
+
+    async def _get_by_key(self, cache_key: str) -> Optional[SynthesisJob]:
+        """按缓存键查找任务（本 worker 的任务或索引指向的任务记录）"""
+        job = self._jobs_by_key.get(cache_key)
+        if job is not None and not self._expired(job):
+            return job
+        job_id = await asyncio.to_thread(self._read_key_index, cache_key)
+        if job_id is None:
+            return None
+        return await self.get(job_id)
+
+    async def _adopt_if_orphaned(self, job: SynthesisJob) -> Optional[SynthesisJob]:
+        """未完成任务的锁无人持有（执行任务的 worker 已退出）时接手执行；记录已被删除时返回 None"""
+        fd = self._try_lock(job.job_id)
+        if fd < 0:
+            return job
+        # 获取锁之前任务可能刚好完成，以加锁后的记录为准
+        latest = await asyncio.to_thread(self._load, job.job_id)
+        if latest is None or latest.finished:
+            os.close(fd)
+            return latest
+        latest._lock_fd = fd
+        self._jobs[latest.job_id] = latest
+        self._jobs_by_key[latest.cache_key] = latest
+        app_logger.warning(
+            f"接手无人执行的合成任务 - job_id: {latest.job_id}, 进度: {latest.chunks_done}/{latest.chunks_total}"
+        )
+        self._start(latest)
+        return latest
+
+    @staticmethod
+    def _try_lock(job_id: str) -> int:
+        """尝试获取任务锁（不阻塞），成功返回文件描述符，否则返回 -1"""
+        fd = os.open(get_job_dir() / f"{job_id}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return -1
+        return fd
+
+    @staticmethod
+    def _unlock(job: SynthesisJob) -> None:
+        if job._lock_fd >= 0:
+            os.close(job._lock_fd)
+            job._lock_fd = -1
+
+    async def _save(self, job: SynthesisJob) -> None:
+        """写入任务记录（本 worker 之后的写入不会被之前的写入覆盖）"""
+        async with job._save_lock:
+            await asyncio.to_thread(self._write_record, job.to_record())
+
+    @staticmethod
+    def _write_record(record: dict) -> None:
+        path = get_job_dir() / f"{record['job_id']}.json"
+        temp_path = path.with_name(f".{path.name}.{os.getpid()}.{uuid.uuid4().hex[:12]}.tmp")
+        try:
+            temp_path.write_text(json.dumps(record, ensure_ascii=False), encoding="utf-8")
+            os.replace(temp_path, path)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+
+    @staticmethod
+    def _load(job_id: str) -> Optional[SynthesisJob]:
+        """读取任务记录（不存在或无法解析时返回 None）"""
+        try:
+            record = json.loads((get_job_dir() / f"{job_id}.json").read_text(encoding="utf-8"))
+            return SynthesisJob.from_record(record)
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            return None
+
+    @staticmethod
+    def _write_key_index(cache_key: str, job_id: str) -> None:
+        path = get_job_dir() / f"{cache_key}.key"
+        temp_path = path.with_name(f".{path.name}.{os.getpid()}.{uuid.uuid4().hex[:12]}.tmp")
+        temp_path.write_text(job_id)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def _read_key_index(cache_key: str) -> Optional[str]:
+        try:
+            job_id = (get_job_dir() / f"{cache_key}.key").read_text().strip()
+        except FileNotFoundError:
+            return None
+        return job_id if JOB_ID_PATTERN.match(job_id) else None
+
+    async def _purge_expired(self) -> None:
+        """清理已结束且超过保留时间的任务（任务记录每隔 JOB_PURGE_INTERVAL_SECONDS 扫描一次）"""
+        expired = [job for job in self._jobs.values() if self._expired(job)]
+        for job in expired:
+            del self._jobs[job.job_id]
+            if self._jobs_by_key.get(job.cache_key) is job:
+                del self._jobs_by_key[job.cache_key]
+
+        if time.monotonic() - self._last_purge < JOB_PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = time.monotonic()
+        removed = await asyncio.to_thread(self._purge_records)
+        if removed:
+            app_logger.info(f"已清理 {removed} 个过期任务记录")
+
+    def _purge_records(self) -> int:
+        """
+        在线程中删除过期的任务记录、锁文件、保留的临时文件和缓存键索引
+
+        未完成的任务只在锁无人持有且创建时间超过保留时间时删除（执行任务的 worker 已退出且无人再查询）。
+        """
+        job_dir = get_job_dir()
+        deadline = time.time() - settings.job_ttl_seconds
+        removed = 0
+        for path in job_dir.glob("*.json"):
+            job = self._load(path.stem)
+            if job is None:
+                continue
+            if job.finished:
+                if not self._expired(job):
+                    continue
+            elif job.created_at >= deadline or job.job_id in self._jobs:
+                continue
+            fd = self._try_lock(job.job_id)
+            if fd < 0:
+                continue
+            try:
+                path.unlink(missing_ok=True)
+                shutil.rmtree(job_dir / job.job_id, ignore_errors=True)
+                if self._read_key_index(job.cache_key) == job.job_id:
+                    (job_dir / f"{job.cache_key}.key").unlink(missing_ok=True)
+                (job_dir / f"{job.job_id}.lock").unlink(missing_ok=True)
+            finally:
+                os.close(fd)
+            removed += 1
+        return removed
@@ -0,0 +1,237 @@
+"""
+节点间缓存（对等层）
+多个节点按缓存键组成一致性哈希环，每个缓存键归属一个节点。本地未命中时先向归属节点
+（短超时）请求该缓存文件，取到后写入本地缓存；归属节点是本节点、对方也没有或请求失败时才调用上游。
+非归属节点自己合成后，在后台把音频推送给归属节点（需要 CACHE_SYNC_TOKEN），之后其他节点都能从归属节点取到。
+连接或等待响应头失败的节点在一段时间内不再访问，避免每次未命中都等待超时；
+响应头之后的数据传输另有时间预算，传输慢只算未命中，不标记节点不可用。
+"""
+import asyncio
+import bisect
+import hashlib
+import time
+from pathlib import Path
+from typing import Optional
+from app.config import settings
+from app.utils import (
+    app_logger,
+    generate_filename,
+    get_file_path,
+    save_to_cache,
+    file_in_use,
+    span
+)
+from app.utils.mp3_utils import check_integrity
+
+
+# 节点间请求携带的请求头（值为发起请求的节点地址）；下载接口据此直接返回音频数据，不交给 nginx 发送
+PEER_REQUEST_HEADER = "X-Peer-Request"
+
+
+class HashRing:
+    """一致性哈希环（每个节点在环上放置多个虚拟节点）"""
+
+    def __init__(self, nodes: list[str], virtual_nodes: int = 64):
+        """
+        Args:
+            nodes: 节点地址列表
+            virtual_nodes: 每个节点的虚拟节点数
+        """
+        self.nodes = sorted(set(nodes))
+        points = []
+        for node in self.nodes:
+            for i in range(virtual_nodes):
+                points.append((self._hash(f"{node}#{i}"), node))
+        points.sort()
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+    def owner(self, key: str) -> Optional[str]:
+        """缓存键的归属节点（环为空时返回 None）"""
+        if not self._points:
+            return None
+        i = bisect.bisect(self._points, self._hash(key)) % len(self._points)
+        return self._owners[i]
+
+
+class PeerCache:
+    """节点间缓存查找"""
+
+    def __init__(self):
+        self.self_url = (settings.peer_self_url or "").rstrip("/")
+        self.ring = HashRing([node.rstrip("/") for node in settings.peer_nodes], settings.peer_virtual_nodes)
+        self._session = None
+        self._down_until: dict[str, float] = {}
+        # 持有后台推送任务的引用，防止任务在运行中被垃圾回收
+        self._tasks: set[asyncio.Task] = set()
+        self.hits = 0
+        self.pushes = 0
+        self.misses = 0
+        self.errors = 0
+        self.skipped_down = 0
+        self.slow_bodies = 0
+        self.bytes_fetched = 0
+        # 本节点地址未设置或不在 peer_nodes 中时无法判断哪些缓存键归本节点所有（会向自己发请求），不启用对等层
+        self._self_listed = self.self_url in self.ring.nodes
+        if self.ring.nodes and not self._self_listed:
+            app_logger.warning(
+                f"PEER_SELF_URL（{self.self_url or '未设置'}）不在 PEER_NODES 中，节点间缓存已禁用"
+            )
+
+    @property
+    def enabled(self) -> bool:
+        return settings.enable_cache and len(self.ring.nodes) > 1 and self._self_listed
+
+    def _get_session(self):
+        import aiohttp
+
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                # 短超时只覆盖连接和等待响应头（sock_read 同时限制数据块之间的间隔），整体数据传输另有预算
+                timeout=aiohttp.ClientTimeout(
+                    total=None,
+                    connect=settings.peer_timeout_seconds,
+                    sock_read=settings.peer_timeout_seconds
+                ),
+                headers={PEER_REQUEST_HEADER: self.self_url or "1"}
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """关闭 HTTP 会话"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def fetch(self, cache_key: str) -> Optional[Path]:
+        """
+        向归属节点请求缓存文件，取到后写入本地缓存
+
+        Args:
+            cache_key: 缓存键
+
+        Returns:
+            本地缓存文件路径；归属节点为本节点、对方未命中或请求失败时返回 None
+        """
+        if not self.enabled:
+            return None
+        owner = self.ring.owner(cache_key)
+        if owner is None or owner == self.self_url:
+            return None
+        if self._down_until.get(owner, 0.0) > time.monotonic():
+            self.skipped_down += 1
+            return None
+
+        url = f"{owner}{settings.api_prefix}/tts/download/{cache_key}.mp3"
+        with span("peer_fetch", peer=owner):
+            try:
+                response = await self._get_session().get(url)
+            except Exception as e:
+                self.errors += 1
+                self._down_until[owner] = time.monotonic() + settings.peer_retry_after_seconds
+                app_logger.warning(f"节点缓存请求失败，{settings.peer_retry_after_seconds}s 内不再访问 - {owner}: {str(e) or type(e).__name__}")
+                return None
+            async with response:
+                if response.status != 200:
+                    self.misses += 1
+                    return None
+                try:
+                    data = await asyncio.wait_for(response.read(), settings.peer_body_timeout_seconds)
+                except Exception as e:
+                    # 已收到响应头说明节点可用，数据传输慢或中断只算未命中
+                    self.misses += 1
+                    self.slow_bodies += 1
+                    app_logger.warning(f"节点缓存数据接收失败 - {owner}: {str(e) or type(e).__name__}")
+                    return None
+
+        cached_file_path = await asyncio.to_thread(self._store, cache_key, data)
+        if cached_file_path is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.bytes_fetched += len(data)
+        app_logger.info(f"[性能追踪] 节点缓存命中 - cache_key: {cache_key}, 来自: {owner}")
+        return cached_file_path
+
+    @staticmethod
+    def _store(cache_key: str, data: bytes) -> Optional[Path]:
+        """
+        校验并写入本地缓存（在线程中调用）
+
+        Returns:
+            缓存文件路径；数据不是完整的 MP3 帧流时返回 None
+        """
+        # 只接受完整的 MP3 帧流，避免把错误页面或传输中断的数据写入缓存
+        if check_integrity(data) is not None:
+            return None
+
+        temp_file_path = get_file_path(generate_filename(".mp3"))
+        with file_in_use(temp_file_path):
+            try:
+                with open(temp_file_path, "wb") as f:
+                    f.write(data)
+                return save_to_cache(cache_key, temp_file_path, ".mp3")
+            finally:
+                temp_file_path.unlink(missing_ok=True)
+
+    def push_to_owner(self, cache_key: str, file_path: Path) -> None:
+        """
+        本节点合成的音频不归本节点所有时，在后台推送给归属节点
+
+        Args:
+            cache_key: 缓存键
+            file_path: 本地缓存文件路径
+        """
+        if not self.enabled or not settings.cache_sync_token:
+            return
+        owner = self.ring.owner(cache_key)
+        if owner is None or owner == self.self_url or self._down_until.get(owner, 0.0) > time.monotonic():
+            return
+        task = asyncio.create_task(self._push(owner, cache_key, file_path))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _push(self, owner: str, cache_key: str, file_path: Path) -> None:
+        url = f"{owner}{settings.api_prefix}/tts/cache/entry/{cache_key}"
+        try:
+            data = await asyncio.to_thread(file_path.read_bytes)
+            headers = {"X-Cache-Sync-Token": settings.cache_sync_token, "Content-Type": "audio/mpeg"}
+
+            async def put() -> int:
+                async with self._get_session().put(url, data=data, headers=headers) as response:
+                    return response.status
+
+            # 上传音频数据不受连接超时限制，整体另有时间预算
+            if await asyncio.wait_for(put(), settings.peer_body_timeout_seconds) == 200:
+                self.pushes += 1
+            else:
+                self.errors += 1
+        except Exception as e:
+            self.errors += 1
+            app_logger.warning(f"推送缓存到归属节点失败 - {owner}: {str(e) or type(e).__name__}")
+
+    def stats(self) -> dict:
+        """对等层统计"""
+        now = time.monotonic()
+        return {
+            "enabled": self.enabled,
+            "self": self.self_url,
+            "nodes": self.ring.nodes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "pushes": self.pushes,
+            "errors": self.errors,
+            "skipped_down": self.skipped_down,
+            "slow_bodies": self.slow_bodies,
+            "bytes_fetched": self.bytes_fetched,
+            "down": [node for node, until in self._down_until.items() if until > now],
+        }
+
+
+# 全局节点缓存实例
+peer_cache = PeerCache()
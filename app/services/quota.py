@@ -0,0 +1,134 @@
+"""
+客户端合成配额
+每个客户端一个令牌桶，只在缓存未命中、需要调用上游合成时消耗令牌（缓存命中不计量）。
+令牌不足时按补充速度等待（预占令牌，排队者按到达顺序获得令牌），
+需要等待的时间超过上限时拒绝请求，由接口返回 429。
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Optional
+from app.config import settings
+
+
+class QuotaExceededError(Exception):
+    """客户端的合成配额已用完"""
+
+    def __init__(self, client: str, retry_after: float):
+        self.client = client
+        self.retry_after = retry_after
+        super().__init__(f"合成请求过于频繁，请 {retry_after:.0f} 秒后重试")
+
+
+class TokenBucket:
+    """令牌桶（令牌数可以为负，表示已被排队者预占）"""
+
+    def __init__(self, rate: float, burst: float):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            burst: 桶容量
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def reserve(self, amount: float, max_wait: Optional[float]) -> Optional[float]:
+        """
+        预占令牌
+
+        Args:
+            amount: 令牌数
+            max_wait: 最长可等待时间（秒，None 表示不限）
+
+        Returns:
+            需要等待的时间（秒）；超过 max_wait 时不预占，返回 None
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        wait = max(0.0, (amount - self.tokens) / self.rate)
+        if max_wait is not None and wait > max_wait:
+            return None
+        self.tokens -= amount
+        return wait
+
+    def retry_after(self, amount: float) -> float:
+        """令牌足够所需的时间（秒）"""
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+
+class ClientQuotas:
+    """按客户端划分的令牌桶集合"""
+
+    def __init__(self):
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self.throttled = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.quota_enabled and settings.quota_rate_per_second > 0
+
+    def _bucket(self, client: str) -> TokenBucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            weight = settings.client_weights.get(client, 1.0)
+            bucket = TokenBucket(settings.quota_rate_per_second * weight, settings.quota_burst * weight)
+            self._buckets[client] = bucket
+            # 只保留最近活跃的客户端（被淘汰的客户端下次以满桶重新开始）
+            while len(self._buckets) > settings.quota_max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket
+
+    async def acquire(self, client: Optional[str], max_wait: Optional[float]) -> float:
+        """
+        为一次上游合成获取令牌，不足时等待补充
+
+        Args:
+            client: 客户端标识（None 表示内部调用，不计量）
+            max_wait: 最长等待时间（秒，None 表示不限）
+
+        Returns:
+            等待时间（秒）
+
+        Raises:
+            QuotaExceededError: 需要等待的时间超过 max_wait
+        """
+        if client is None or not self.enabled:
+            return 0.0
+        bucket = self._bucket(client)
+        wait = bucket.reserve(1.0, max_wait)
+        if wait is None:
+            self.rejected += 1
+            raise QuotaExceededError(client, bucket.retry_after(1.0))
+        if wait > 0:
+            self.throttled += 1
+            self.total_wait += wait
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # 等待期间被取消：归还预占的令牌
+                bucket.tokens += 1.0
+                raise
+        return wait
+
+    def stats(self) -> dict:
+        """配额统计"""
+        return {
+            "enabled": self.enabled,
+            "rate_per_second": settings.quota_rate_per_second,
+            "burst": settings.quota_burst,
+            "clients": len(self._buckets),
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+            "total_wait_seconds": round(self.total_wait, 3),
+        }
+
+
+# 全局客户端配额实例
+client_quotas = ClientQuotas()
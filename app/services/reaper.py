@@ -0,0 +1,204 @@
+"""
+输出目录清理任务
+未启用缓存时生成的音频、合成失败留下的临时文件都会留在 output_dir 中。
+清理任务定期扫描 output_dir，删除超过保留时间的文件，并在总大小超限时从最旧的文件开始删除。
+扫描和删除都在线程中执行（os.scandir），不阻塞事件循环；正在流式返回或正在写入的文件不会被删除。
+多 worker 部署时通过文件锁只由一个 worker 执行清理；各 worker 对正在使用的文件持有共享锁，
+执行清理的 worker 删除前先尝试加排他锁，不会删除其他 worker 正在返回的文件。
+"""
+import asyncio
+import fcntl
+import os
+import time
+from pathlib import Path
+from typing import Optional
+from app.config import settings
+from app.utils import app_logger, ensure_output_dir, is_file_in_use, expire_file_marks
+
+
+LOCK_NAME = ".reaper.lock"
+
+
+class OutputReaper:
+    """输出目录清理任务"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        # 清理锁：持有后一直保留到 stop，其他 worker 每次清理前重试（持有锁的 worker 退出后接管）
+        self._lock_fd = -1
+        self.runs = 0
+        self.files_deleted = 0
+        self.bytes_freed = 0
+        self.last_run: Optional[dict] = None
+
+    def start(self) -> None:
+        """启动后台清理循环"""
+        if self._task is None and settings.reaper_enabled:
+            self._task = asyncio.create_task(self._run_forever())
+            app_logger.info(
+                f"输出目录清理任务已启动 - 间隔: {settings.reaper_interval_seconds}s, "
+                f"最长保留: {settings.output_max_age_seconds}s, 大小上限: {settings.output_max_size_mb}MB"
+            )
+
+    async def stop(self) -> None:
+        """停止后台清理循环"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._lock_fd >= 0:
+            os.close(self._lock_fd)
+            self._lock_fd = -1
+
+    async def _run_forever(self) -> None:
+        while True:
+            await asyncio.sleep(settings.reaper_interval_seconds)
+            # 使用标记是进程内的，每个 worker 都清除自己过期的标记
+            expire_file_marks(settings.reaper_in_use_grace_seconds)
+            try:
+                await self.reap_once()
+            except Exception as e:
+                app_logger.error(f"输出目录清理失败: {str(e)}")
+
+    async def reap_once(self) -> Optional[dict]:
+        """
+        执行一次清理
+
+        Returns:
+            本次清理结果（扫描文件数、删除文件数、释放字节数、耗时）；其他 worker 负责清理时返回 None
+        """
+        started = time.perf_counter()
+        result = await asyncio.to_thread(self._reap, ensure_output_dir())
+        if result is None:
+            return None
+        result["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+
+        self.runs += 1
+        self.files_deleted += result["deleted"]
+        self.bytes_freed += result["bytes_freed"]
+        self.last_run = result
+        if result["deleted"]:
+            app_logger.info(
+                f"输出目录清理完成 - 删除 {result['deleted']} 个文件, "
+                f"释放 {result['bytes_freed'] / (1024 * 1024):.2f}MB, 耗时 {result['duration_ms']:.1f}ms"
+            )
+        return result
+
+    def _hold_lock(self, output_dir: Path) -> bool:
+        """持有清理锁（其他 worker 持有时返回 False）"""
+        if self._lock_fd >= 0:
+            return True
+        lock_fd = os.open(output_dir / LOCK_NAME, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(lock_fd)
+            return False
+        self._lock_fd = lock_fd
+        return True
+
+    @staticmethod
+    def _unlink(path: str) -> Optional[bool]:
+        """
+        删除文件（加排他锁成功后才删除，其他 worker 持有共享锁时跳过）
+
+        Returns:
+            True 表示已删除；False 表示文件已不存在；None 表示其他 worker 正在使用
+        """
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return False
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                return False
+            return True
+        finally:
+            os.close(fd)
+
+    def _reap(self, output_dir: Path) -> Optional[dict]:
+        """在线程中扫描并删除文件"""
+        if not self._hold_lock(output_dir):
+            return None
+
+        now = time.time()
+        max_age = settings.output_max_age_seconds
+        max_bytes = settings.output_max_size_mb * 1024 * 1024
+        min_age = settings.reaper_min_age_seconds
+        grace = settings.reaper_in_use_grace_seconds
+
+        entries: list[tuple[float, int, str]] = []
+        with os.scandir(output_dir) as it:
+            for entry in it:
+                try:
+                    if entry.name == LOCK_NAME or not entry.is_file(follow_symlinks=False):
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        deleted = 0
+        bytes_freed = 0
+        skipped_in_use = 0
+
+        def delete(path: str, size: int) -> bool:
+            nonlocal deleted, bytes_freed, skipped_in_use, total_bytes
+            if is_file_in_use(Path(path), grace):
+                skipped_in_use += 1
+                return False
+            removed = OutputReaper._unlink(path)
+            if removed is None:
+                skipped_in_use += 1
+                return False
+            # 已被其他代码删除的文件不计入删除数，但不再占用空间
+            total_bytes -= size
+            if not removed:
+                return False
+            deleted += 1
+            bytes_freed += size
+            return True
+
+        # 按修改时间从旧到新处理：先删超龄文件，再在总大小超限时继续删除最旧的文件
+        entries.sort()
+        for mtime, size, path in entries:
+            age = now - mtime
+            expired = max_age > 0 and age > max_age
+            over_size = max_bytes > 0 and total_bytes > max_bytes and age > min_age
+            if not expired and not over_size:
+                # 后面的文件更新：既不会超龄，也不需要再为大小上限让位
+                break
+            delete(path, size)
+
+        return {
+            "scanned": len(entries),
+            "deleted": deleted,
+            "bytes_freed": bytes_freed,
+            "skipped_in_use": skipped_in_use,
+            "remaining_bytes": total_bytes,
+        }
+
+    def stats(self) -> dict:
+        """清理任务统计"""
+        return {
+            "enabled": settings.reaper_enabled,
+            "active": self._lock_fd >= 0,
+            "runs": self.runs,
+            "files_deleted": self.files_deleted,
+            "bytes_freed": self.bytes_freed,
+            "last_run": self.last_run,
+        }
+
+
+# 全局清理任务实例
+output_reaper = OutputReaper()
@@ -0,0 +1,258 @@
+"""
+预测性回热
+每次请求在计数草图中记录缓存键的访问（Count-Min 草图 + 固定大小的热门键表，不保存访问日志），
+后台定期检查热门缓存键：
+- 缓存文件已被删除：只在闲时时段、上游槽位空闲时按预算重新合成，下一个请求不再承担未命中的上游延迟
+- 共享热缓存中已被淘汰或即将被覆盖：从缓存文件重新写入（不调用上游）
+"""
+import asyncio
+import heapq
+import time
+from datetime import datetime
+from typing import Optional
+from app.config import settings
+from app.utils import app_logger, check_cache_exists, get_hot_cache, read_audio_file
+from app.utils.count_min import CountMinSketch
+from app.services.scheduler import PRIORITY_PREFETCH
+
+
+class Rewarmer:
+    """预测性回热任务"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._tts_service = None
+        self._sketch: Optional[CountMinSketch] = None
+        # 热门缓存键 -> (最近一次记录时的估计访问次数, 合成参数 (text, voice, rate, volume, pitch))
+        self._top: dict[str, tuple[int, tuple[str, str, str, str, str]]] = {}
+        # 热门键表的最小堆 [(计数, 缓存键)]：计数只增不减，堆中的计数不大于表中的计数，
+        # 取最小值时才按表中的计数修正（惰性更新），记录访问时不需要扫描整张表
+        self._top_heap: list[tuple[int, str]] = []
+        self.runs = 0
+        self.resynthesized = 0
+        self.hot_refreshed = 0
+        self.upstream_seconds = 0.0
+        self.last_run: Optional[dict] = None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.rewarm_enabled and settings.enable_cache
+
+    def record(self, cache_key: str, params: tuple[str, str, str, str, str]) -> None:
+        """
+        记录一次访问（缓存命中和未命中都记录）
+
+        Args:
+            cache_key: 缓存键
+            params: 合成参数 (text, voice, rate, volume, pitch)，回热时按原参数重新合成
+        """
+        if not self.enabled or len(params[0]) > settings.rewarm_max_chars:
+            return
+        sketch = self._sketch
+        if sketch is None:
+            sketch = self._sketch = CountMinSketch(settings.rewarm_sketch_width)
+        resets = sketch.resets
+        count = sketch.add(cache_key)
+        top = self._top
+        if sketch.resets != resets:
+            # 草图衰减时热门键表的计数同步减半
+            for key, (key_count, key_params) in top.items():
+                top[key] = (key_count >> 1, key_params)
+            self._rebuild_heap()
+
+        if cache_key in top:
+            top[cache_key] = (count, params)
+        elif len(top) < settings.rewarm_track_keys:
+            top[cache_key] = (count, params)
+            heapq.heappush(self._top_heap, (count, cache_key))
+        elif count > self._top_min():
+            # 表已满：替换计数最小的键
+            _, victim = heapq.heapreplace(self._top_heap, (count, cache_key))
+            del top[victim]
+            top[cache_key] = (count, params)
+
+    def _top_min(self) -> int:
+        """热门键表中的最小计数（修正堆顶过期的计数后返回）"""
+        heap = self._top_heap
+        top = self._top
+        while heap:
+            heap_count, key = heap[0]
+            entry = top.get(key)
+            if entry is None:
+                heapq.heappop(heap)
+            elif entry[0] != heap_count:
+                heapq.heapreplace(heap, (entry[0], key))
+            else:
+                return heap_count
+        return 0
+
+    def _rebuild_heap(self) -> None:
+        self._top_heap = [(count, key) for key, (count, _) in self._top.items()]
+        heapq.heapify(self._top_heap)
+
+    def hot_keys(self, min_count: int = 1) -> list[tuple[str, int]]:
+        """
+        热门缓存键（按估计访问次数从高到低）
+
+        Args:
+            min_count: 最低估计访问次数
+        """
+        return sorted(
+            ((key, count) for key, (count, _) in self._top.items() if count >= min_count),
+            key=lambda item: -item[1]
+        )
+
+    def start(self, tts_service) -> None:
+        """
+        启动后台回热循环
+
+        Args:
+            tts_service: TTSService 实例（重新合成时使用其合并和调度）
+        """
+        self._tts_service = tts_service
+        if self._task is None and self.enabled:
+            self._task = asyncio.create_task(self._run_forever())
+            app_logger.info(
+                f"预测性回热任务已启动 - 间隔: {settings.rewarm_interval_seconds}s, "
+                f"闲时: {settings.rewarm_off_peak_hours or '不限'}, 每次预算: {settings.rewarm_budget_seconds}s"
+            )
+
+    async def stop(self) -> None:
+        """停止后台回热循环"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run_forever(self) -> None:
+        while True:
+            await asyncio.sleep(settings.rewarm_interval_seconds)
+            try:
+                await self.rewarm_once()
+            except Exception as e:
+                app_logger.error(f"预测性回热失败: {str(e)}")
+
+    @staticmethod
+    def _off_peak() -> bool:
+        hours = settings.rewarm_off_peak_hours
+        return not hours or datetime.now().hour in hours
+
+    async def rewarm_once(self, force: bool = False) -> dict:
+        """
+        执行一次回热
+
+        Args:
+            force: 忽略闲时时段限制（仍受上游预算和槽位占用限制）
+
+        Returns:
+            本次回热结果（候选数、缺失数、重新合成数、热缓存刷新数、使用的上游预估时间）
+        """
+        started = time.perf_counter()
+        candidates = [key for key, _ in self.hot_keys(settings.rewarm_min_count)]
+        missing, hot_refreshed = await asyncio.to_thread(self._check_entries, candidates)
+
+        resynthesized = 0
+        errors = 0
+        budget_used = 0.0
+        stopped: Optional[str] = None
+        if missing and not (force or self._off_peak()):
+            stopped = "peak_hours"
+        elif missing and self._tts_service is not None:
+            scheduler = self._tts_service.scheduler
+            for cache_key in missing:
+                entry = self._top.get(cache_key)
+                if entry is None:
+                    continue
+                text, voice, rate, volume, pitch = entry[1]
+                cost = scheduler.estimate_cost(text, voice)
+                if budget_used + cost > settings.rewarm_budget_seconds:
+                    stopped = "budget"
+                    break
+                if scheduler.utilization() >= settings.rewarm_max_utilization:
+                    stopped = "busy"
+                    break
+                budget_used += cost
+                try:
+                    await self._tts_service._synthesize_once(
+                        cache_key, text, voice, rate, volume, pitch, PRIORITY_PREFETCH
+                    )
+                    resynthesized += 1
+                except Exception as e:
+                    errors += 1
+                    app_logger.warning(f"回热合成失败 - cache_key: {cache_key}, 错误: {str(e)}")
+
+        result = {
+            "candidates": len(candidates),
+            "missing": len(missing),
+            "resynthesized": resynthesized,
+            "errors": errors,
+            "hot_refreshed": hot_refreshed,
+            "upstream_seconds": round(budget_used, 3),
+            "stopped": stopped,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+        self.runs += 1
+        self.resynthesized += resynthesized
+        self.hot_refreshed += hot_refreshed
+        self.upstream_seconds += budget_used
+        self.last_run = result
+        if resynthesized or hot_refreshed:
+            app_logger.info(
+                f"预测性回热完成 - 重新合成 {resynthesized}/{len(missing)} 条, "
+                f"刷新热缓存 {hot_refreshed} 条, 上游预估 {budget_used:.1f}s"
+            )
+        return result
+
+    @staticmethod
+    def _check_entries(keys: list[str]) -> tuple[list[str], int]:
+        """
+        在线程中检查热门键的缓存文件，并刷新共享热缓存中即将被覆盖的条目
+
+        Returns:
+            (缓存文件已不存在的键, 刷新的热缓存条目数)
+        """
+        hot_cache = get_hot_cache()
+        missing: list[str] = []
+        refreshed = 0
+        for cache_key in keys:
+            path = check_cache_exists(cache_key, ".mp3")
+            if path is None:
+                missing.append(cache_key)
+                continue
+            if hot_cache is None:
+                continue
+            remaining = hot_cache.remaining_fraction(cache_key)
+            if remaining is not None and remaining > settings.rewarm_hot_refresh_fraction:
+                continue
+            try:
+                # 不在热缓存中时读取会回填热缓存
+                data = read_audio_file(path)
+            except FileNotFoundError:
+                missing.append(cache_key)
+                continue
+            if remaining is None or hot_cache.put(cache_key, data, refresh=True):
+                refreshed += 1
+        return missing, refreshed
+
+    def stats(self) -> dict:
+        """回热统计"""
+        sketch = self._sketch
+        return {
+            "enabled": self.enabled,
+            "tracked_keys": len(self._top),
+            "sketch_additions": sketch.additions if sketch is not None else 0,
+            "sketch_resets": sketch.resets if sketch is not None else 0,
+            "top": self.hot_keys()[:10],
+            "runs": self.runs,
+            "resynthesized": self.resynthesized,
+            "hot_refreshed": self.hot_refreshed,
+            "upstream_seconds": round(self.upstream_seconds, 3),
+            "last_run": self.last_run,
+        }
+
+
+# 全局回热任务实例
+rewarmer = Rewarmer()
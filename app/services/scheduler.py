@@ -0,0 +1,217 @@
+"""
+上游合成调度器
+限制同时进行的上游合成数量，排队的请求按「优先级类别 + 预估成本 - 等待时长」排序：
+单词查询（成本低、interactive 类别）优先于长段落和批量预取，
+等待时间越长排序越靠前（老化），长文本不会被饿死。
+同一客户端已占用和排队中的预估成本会累加到其新请求的排序键上（按客户端权重折算），
+大量提交的客户端只会让自己的请求排到后面，其他客户端的请求与其交错执行（加权公平排队）。
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+from app.config import settings
+from app.utils import app_logger
+
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_PREFETCH = "prefetch"
+PRIORITY_BATCH = "batch"
+PRIORITY_CLASSES = (PRIORITY_INTERACTIVE, PRIORITY_PREFETCH, PRIORITY_BATCH)
+
+
+class _ClassStats:
+    """单个优先级类别的统计"""
+
+    def __init__(self):
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.recent_waits: deque[float] = deque(maxlen=1000)
+
+    def record_wait(self, wait: float) -> None:
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.recent_waits.append(wait)
+
+    def to_dict(self) -> dict:
+        granted = self.active + self.completed
+        recent = sorted(self.recent_waits)
+        return {
+            "queued": self.queued,
+            "active": self.active,
+            "completed": self.completed,
+            "avg_wait_ms": round(self.total_wait / granted * 1000, 3) if granted else 0.0,
+            "p95_wait_ms": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))] * 1000, 3)
+            if recent else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+        }
+
+
+class SynthesisScheduler:
+    """上游合成槽位调度器（最短作业优先 + 优先级类别 + 老化）"""
+
+    def __init__(
+        self,
+        concurrency: int,
+        class_offsets: dict[str, float],
+        aging_rate: float
+    ):
+        """
+        Args:
+            concurrency: 同时进行的上游合成数量
+            class_offsets: 各优先级类别的排序偏移（秒，越小越优先）
+            aging_rate: 老化速率（每等待 1 秒抵消的预估成本秒数）
+        """
+        self.concurrency = concurrency
+        self.class_offsets = class_offsets
+        self.aging_rate = aging_rate
+        self._active = 0
+        self._queue: list[tuple[float, int, asyncio.Future, str]] = []
+        self._counter = itertools.count()
+        self._epoch = time.monotonic()
+        self._stats = {name: _ClassStats() for name in PRIORITY_CLASSES}
+        # 各客户端已占用和排队中的预估成本（秒）
+        self._backlog: dict[str, float] = {}
+
+    @classmethod
+    def from_settings(cls) -> "SynthesisScheduler":
+        """根据应用配置创建实例"""
+        return cls(
+            concurrency=settings.upstream_concurrency,
+            class_offsets=settings.scheduler_class_offsets,
+            aging_rate=settings.scheduler_aging_rate
+        )
+
+    @staticmethod
+    def estimate_cost(text: str, voice: str) -> float:
+        """
+        预估合成成本（秒）：基础开销 + 按语言估算的音频时长
+
+        Args:
+            text: 文本
+            voice: 语音名称（按 zh / ru 前缀选择每字符时长）
+        """
+        locale = voice.split("-", 1)[0]
+        per_char = settings.scheduler_cost_per_char.get(locale, 0.1)
+        return settings.scheduler_cost_base + per_char * len(text)
+
+    def _sort_key(self, cost: float, priority: str, enqueued_at: float, backlog: float = 0.0) -> float:
+        # 所有排队者的老化量都随当前时间同步增长，因此按入队时间计算即可得到静态排序键
+        offset = self.class_offsets.get(priority, 0.0)
+        return offset + cost + backlog + self.aging_rate * (enqueued_at - self._epoch)
+
+    def _add_backlog(self, client: Optional[str], cost: float) -> float:
+        """累加客户端的未完成成本，返回累加前按权重折算的值"""
+        if client is None:
+            return 0.0
+        backlog = self._backlog.get(client, 0.0)
+        self._backlog[client] = backlog + cost
+        return backlog / settings.client_weights.get(client, 1.0)
+
+    def _remove_backlog(self, client: Optional[str], cost: float) -> None:
+        if client is None:
+            return
+        backlog = self._backlog.get(client, 0.0) - cost
+        if backlog > 1e-9:
+            self._backlog[client] = backlog
+        else:
+            self._backlog.pop(client, None)
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        cost: float,
+        priority: str = PRIORITY_INTERACTIVE,
+        client: Optional[str] = None
+    ) -> AsyncIterator[float]:
+        """
+        获取一个上游合成槽位
+
+        Args:
+            cost: 预估成本（秒）
+            priority: 优先级类别（interactive、prefetch、batch）
+            client: 客户端标识（用于公平排队，None 表示不区分）
+
+        Yields:
+            排队等待时间（秒）
+        """
+        if priority not in self._stats:
+            priority = PRIORITY_INTERACTIVE
+        stats = self._stats[priority]
+        enqueued_at = time.monotonic()
+        backlog = self._add_backlog(client, cost)
+
+        # 有排队者时槽位一定已满（释放时直接转交），所以空闲槽位可以直接占用
+        if self._active < self.concurrency:
+            self._active += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            entry = (self._sort_key(cost, priority, enqueued_at, backlog), next(self._counter), future, priority)
+            heapq.heappush(self._queue, entry)
+            stats.queued += 1
+            try:
+                await future
+            except asyncio.CancelledError:
+                stats.queued -= 1
+                self._remove_backlog(client, cost)
+                if future.done() and not future.cancelled():
+                    # 已分配到槽位后才被取消：把槽位交给下一个排队者
+                    self._release()
+                raise
+            stats.queued -= 1
+
+        wait = time.monotonic() - enqueued_at
+        stats.record_wait(wait)
+        stats.active += 1
+        if wait > 1.0:
+            app_logger.info(f"[性能追踪] 上游槽位排队 {wait * 1000:.0f}ms - 类别: {priority}, 预估成本: {cost:.2f}s")
+        try:
+            yield wait
+        finally:
+            stats.active -= 1
+            stats.completed += 1
+            self._remove_backlog(client, cost)
+            self._release()
+
+    def _release(self) -> None:
+        """释放槽位：直接转交给排序最靠前的排队者"""
+        while self._queue:
+            _, _, future, _ = heapq.heappop(self._queue)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    def utilization(self) -> float:
+        """上游槽位占用比例（有排队者时为 1）"""
+        return self._active / self.concurrency
+
+    def stats(self) -> dict:
+        """调度器统计（各类别排队深度、等待时间）"""
+        return {
+            "concurrency": self.concurrency,
+            "active": self._active,
+            "queued": sum(1 for _, _, future, _ in self._queue if not future.done()),
+            "classes": {name: stats.to_dict() for name, stats in self._stats.items()},
+            "clients": {
+                client: round(backlog, 3)
+                for client, backlog in sorted(self._backlog.items(), key=lambda item: -item[1])[:10]
+            },
+        }
+
+
+_scheduler: Optional[SynthesisScheduler] = None
+
+
+def get_scheduler() -> SynthesisScheduler:
+    """获取全局调度器实例（首次调用时创建）"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = SynthesisScheduler.from_settings()
+    return _scheduler
@@ -2,6 +2,10 @@
 文本转语音服务
 使用 edge-tts 实现 TTS 功能
 """
+import asyncio
+import difflib
+import json
+import time
 from pathlib import Path
 from typing import Optional, List
 import edge_tts  # type: ignore[reportMissingImports]
@@ -14,9 +18,39 @@ from app.utils import (
     generate_cache_key,
     check_cache_exists,
     save_to_cache,
-    get_cache_filename
+    get_cache_filename,
+    get_cache_path,
+    acquire_synthesis_lease,
+    file_in_use,
+    span,
+    record_span,
+    current_client,
+    split_scripts,
+    is_mixed_script,
+    concat_mp3,
+    read_audio_file
 )
 from app.models.response_models import VoiceInfo
+from app.services.scheduler import get_scheduler, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+from app.services.quota import client_quotas
+from app.services.peer_cache import peer_cache
+from app.services.rewarmer import rewarmer
+
+
+# 无效语音的缓存条数上限（语音目录刷新时清空）
+UNKNOWN_VOICE_CACHE_SIZE = 1024
+
+
+class UnknownVoiceError(ValueError):
+    """请求的语音不在语音目录中"""
+
+    def __init__(self, voice: str, suggestions: list[str]):
+        self.voice = voice
+        self.suggestions = suggestions
+        message = f"未知的语音: {voice}"
+        if suggestions:
+            message += f"，是否要使用: {', '.join(suggestions)}"
+        super().__init__(message)
 
 
 class TTSService:
@@ -28,6 +62,63 @@ class TTSService:
         self.default_rate = settings.default_rate
         self.default_volume = settings.default_volume
         self.default_pitch = settings.default_pitch
+        # 进行中的合成任务（cache_key -> 任务），用于合并并发的相同请求
+        self._inflight: dict[str, asyncio.Task] = {}
+        # 等待各进行中合成任务的请求数（降为 0 时取消上游合成）
+        self._waiters: dict[str, int] = {}
+        # 合成取消统计：节省的上游时间为被取消任务的预估成本减去已用时间
+        self._cancel_stats = {
+            "cancelled": 0,
+            "finished_unwatched": 0,
+            "wasted_seconds": 0.0,
+            "saved_seconds": 0.0,
+        }
+        # 上游合成调度器（全局共享槽位）
+        self.scheduler = get_scheduler()
+        # 语音目录缓存（上游返回的原始列表）
+        self._voice_catalog: Optional[list[dict]] = None
+        self._voice_catalog_at = 0.0
+        self.voice_catalog_version = 0  # 每次刷新加 1，用于使预渲染的语音列表响应失效
+        self._voice_catalog_task: Optional[asyncio.Task] = None
+        # 语音目录中支持的语音名称（用于在调用上游前校验请求的语音）和无效语音的候选结果
+        self._voice_names: Optional[frozenset[str]] = None
+        self._unknown_voices: dict[str, list[str]] = {}
+        self._voice_catalog_loader: Optional[asyncio.Task] = None
+    
+    async def get_voice_catalog(self, refresh: bool = False) -> list[dict]:
+        """
+        获取上游语音目录（缓存 voice_catalog_ttl_seconds 秒，并发刷新只请求一次上游）
+        
+        Args:
+            refresh: 是否忽略缓存强制刷新
+            
+        Returns:
+            上游返回的原始语音列表
+        """
+        expired = time.monotonic() - self._voice_catalog_at > settings.voice_catalog_ttl_seconds
+        if self._voice_catalog is not None and not refresh and not expired:
+            return self._voice_catalog
+        
+        if self._voice_catalog_task is None:
+            self._voice_catalog_task = asyncio.ensure_future(edge_tts.list_voices())
+        task = self._voice_catalog_task
+        try:
+            voices = await asyncio.shield(task)
+        finally:
+            if self._voice_catalog_task is task and task.done():
+                self._voice_catalog_task = None
+        
+        if self._voice_catalog is not voices:
+            self._voice_catalog = voices
+            self._voice_catalog_at = time.monotonic()
+            self.voice_catalog_version += 1
+            self._voice_names = frozenset(
+                name for name in map(self._voice_short_name, voices)
+                if name.startswith("zh-") or name.startswith("ru-")
+            )
+            self._unknown_voices.clear()
+            app_logger.info(f"语音目录已刷新 - 共 {len(voices)} 个语音")
+        return voices
     
     async def get_voices(
         self,
@@ -47,8 +138,8 @@ class TTSService:
         try:
             app_logger.info(f"获取语音列表 - locale: {locale}, gender: {gender}")
             
-            # 获取所有语音
-            voices = await edge_tts.list_voices()
+            # 获取所有语音（使用缓存的语音目录）
+            voices = await self.get_voice_catalog()
             
             # 转换为 VoiceInfo 对象
             voice_list = []
@@ -66,20 +157,8 @@ class TTSService:
                 if gender and voice_gender != gender:
                     continue
                 
-                # 使用 ShortName 作为语音名称（edge-tts 实际使用的格式）
-                voice_short_name = voice.get("ShortName", "")
-                if not voice_short_name:
-                    # 如果没有 ShortName，尝试从 Name 中提取
-                    name = voice.get("Name", "")
-                    # 格式: "Microsoft Server Speech Text to Speech Voice (zh-CN, XiaoxiaoNeural)"
-                    # 提取: zh-CN-XiaoxiaoNeural
-                    if "(" in name and ")" in name:
-                        parts = name.split("(")[1].split(")")[0].split(", ")
-                        if len(parts) == 2:
-                            voice_short_name = f"{parts[0]}-{parts[1]}"
-                
                 voice_info = VoiceInfo(
-                    name=voice_short_name,
+                    name=self._voice_short_name(voice),
                     gender=voice_gender,
                     locale=voice_locale,
                     friendly_name=voice.get("FriendlyName", "")
@@ -93,6 +172,60 @@ class TTSService:
             app_logger.error(f"获取语音列表失败: {str(e)}")
             raise
     
+    @staticmethod
+    def _voice_short_name(voice: dict) -> str:
+        """语音目录条目的名称（edge-tts 实际使用的 ShortName 格式）"""
+        voice_short_name = voice.get("ShortName", "")
+        if not voice_short_name:
+            # 如果没有 ShortName，尝试从 Name 中提取
+            name = voice.get("Name", "")
+            # 格式: "Microsoft Server Speech Text to Speech Voice (zh-CN, XiaoxiaoNeural)"
+            # 提取: zh-CN-XiaoxiaoNeural
+            if "(" in name and ")" in name:
+                parts = name.split("(")[1].split(")")[0].split(", ")
+                if len(parts) == 2:
+                    voice_short_name = f"{parts[0]}-{parts[1]}"
+        return voice_short_name
+    
+    def validate_voice(self, voice: str) -> None:
+        """
+        按本地缓存的语音目录校验语音（不调用上游）
+        
+        语音目录尚未加载时不做校验（由上游判定），并在后台加载语音目录。无效语音的候选结果会被缓存，
+        重复的错误请求不再计算相似度。
+        
+        Args:
+            voice: 语音名称
+            
+        Raises:
+            UnknownVoiceError: 语音不在语音目录中
+        """
+        names = self._voice_names
+        if names is None:
+            self._load_voice_catalog_soon()
+            return
+        if voice in names:
+            return
+        suggestions = self._unknown_voices.get(voice)
+        if suggestions is None:
+            suggestions = difflib.get_close_matches(voice, names, n=3, cutoff=0.6)
+            if len(self._unknown_voices) >= UNKNOWN_VOICE_CACHE_SIZE:
+                self._unknown_voices.clear()
+            self._unknown_voices[voice] = suggestions
+        raise UnknownVoiceError(voice, suggestions)
+    
+    def _load_voice_catalog_soon(self) -> None:
+        """在后台加载语音目录（已在加载或不在事件循环中时跳过）"""
+        if self._voice_catalog_loader is not None and not self._voice_catalog_loader.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._voice_catalog_loader = loop.create_task(self.get_voice_catalog())
+        # 加载失败只影响校验，取出异常避免 "Task exception was never retrieved"
+        self._voice_catalog_loader.add_done_callback(lambda task: task.cancelled() or task.exception())
+    
     def _process_russian_text(self, text: str) -> str:
         """
         处理俄语文本，为长句子添加适当的停顿
@@ -139,13 +272,67 @@ class TTSService:
         # 短文本使用正常语速
         return self.default_rate
     
-    async def text_to_speech(
+    def resolve_params(
         self,
         text: str,
         voice: Optional[str] = None,
         rate: Optional[str] = None,
         volume: Optional[str] = None,
         pitch: Optional[str] = None
+    ) -> tuple[str, str, str, str, str, str]:
+        """
+        解析实际使用的合成参数并生成缓存键（不调用上游）
+        
+        Args:
+            text: 要转换的文本
+            voice: 语音名称（必须是中文或俄语语音）
+            rate: 语速（如果未指定，俄语长句子会自动降低语速）
+            volume: 音量
+            pitch: 音调
+            
+        Returns:
+            (处理后的文本, 语音, 语速, 音量, 音调, 缓存键) 元组
+        """
+        # 使用默认值或提供的参数
+        selected_voice = voice or self.default_voice
+        selected_volume = volume or self.default_volume
+        selected_pitch = pitch or self.default_pitch
+        
+        # 验证语音是否为中文或俄语
+        if not (selected_voice.startswith("zh-") or selected_voice.startswith("ru-")):
+            raise ValueError(f"不支持的语音: {selected_voice}，仅支持中文（zh-）和俄语（ru-）语音")
+        self.validate_voice(selected_voice)
+        
+        # 处理俄语文本：如果是俄语且为长句子，自动优化语速
+        processed_text = text
+        if selected_voice.startswith("ru-"):
+            # 处理俄语文本格式
+            processed_text = self._process_russian_text(text)
+            # 为俄语长句子自动调整语速
+            selected_rate = self._get_optimal_rate_for_russian(processed_text, rate)
+        else:
+            # 中文使用用户指定或默认语速
+            selected_rate = rate or self.default_rate
+        
+        # 生成缓存键（基于处理后的文本和实际使用的参数）
+        cache_key = generate_cache_key(
+            text=processed_text,
+            voice=selected_voice,
+            rate=selected_rate,
+            volume=selected_volume,
+            pitch=selected_pitch
+        )
+        
+        return processed_text, selected_voice, selected_rate, selected_volume, selected_pitch, cache_key
+    
+    async def text_to_speech(
+        self,
+        text: str,
+        voice: Optional[str] = None,
+        rate: Optional[str] = None,
+        volume: Optional[str] = None,
+        pitch: Optional[str] = None,
+        priority: str = PRIORITY_INTERACTIVE
     ) -> tuple[str, Path, str, bool]:
         """
         将文本转换为语音（仅支持中文和俄语）
@@ -156,42 +343,26 @@ class TTSService:
             rate: 语速（如果未指定，俄语长句子会自动降低语速）
             volume: 音量
             pitch: 音调
+            priority: 上游调度优先级类别（interactive、prefetch、batch）
             
         Returns:
             (文件名, 文件路径, 实际使用的语速, 是否缓存命中) 元组
         """
         try:
-            # 使用默认值或提供的参数
-            selected_voice = voice or self.default_voice
-            selected_volume = volume or self.default_volume
-            selected_pitch = pitch or self.default_pitch
-            
-            # 验证语音是否为中文或俄语
-            if not (selected_voice.startswith("zh-") or selected_voice.startswith("ru-")):
-                raise ValueError(f"不支持的语音: {selected_voice}，仅支持中文（zh-）和俄语（ru-）语音")
-            
-            # 处理俄语文本：如果是俄语且为长句子，自动优化语速
-            processed_text = text
-            if selected_voice.startswith("ru-"):
-                # 处理俄语文本格式
-                processed_text = self._process_russian_text(text)
-                # 为俄语长句子自动调整语速
-                selected_rate = self._get_optimal_rate_for_russian(processed_text, rate)
-            else:
-                # 中文使用用户指定或默认语速
-                selected_rate = rate or self.default_rate
+            # 中俄混合文本按文字切分，分别用对应语言的语音合成
+            if settings.mixed_language_enabled and is_mixed_script(text):
+                return await self._mixed_text_to_speech(text, voice, rate, volume, pitch, priority)
             
-            # 生成缓存键（基于处理后的文本和实际使用的参数）
-            cache_key = generate_cache_key(
-                text=processed_text,
-                voice=selected_voice,
-                rate=selected_rate,
-                volume=selected_volume,
-                pitch=selected_pitch
+            processed_text, selected_voice, selected_rate, selected_volume, selected_pitch, cache_key = \
+                self.resolve_params(text, voice, rate, volume, pitch)
+            rewarmer.record(
+                cache_key,
+                (processed_text, selected_voice, selected_rate, selected_volume, selected_pitch)
             )
             
             # 检查缓存是否存在
-            cached_file = check_cache_exists(cache_key, ".mp3")
+            with span("cache_lookup"):
+                cached_file = check_cache_exists(cache_key, ".mp3")
             if cached_file:
                 app_logger.info(f"[性能追踪] 缓存命中 - cache_key: {cache_key}")
                 # 返回缓存文件名和路径
@@ -208,40 +379,475 @@ class TTSService:
                 f"cache_key: {cache_key}"
             )
             
-            # 生成临时文件名（用于生成音频）
-            temp_filename = generate_filename(".mp3")
-            temp_file_path = get_file_path(temp_filename)
-            
-            # 创建 TTS 实例
-            communicate = edge_tts.Communicate(
+            # 同一缓存键的合成只进行一次（进程内合并 + 跨进程租约）
+            cached_file_path = await self._synthesize_once(
+                cache_key=cache_key,
                 text=processed_text,
                 voice=selected_voice,
                 rate=selected_rate,
                 volume=selected_volume,
-                pitch=selected_pitch
+                pitch=selected_pitch,
+                priority=priority
             )
             
-            # 保存音频文件到临时位置
-            await communicate.save(str(temp_file_path))
-            
-            # 验证文件大小
-            if not validate_file_size(temp_file_path):
-                temp_file_path.unlink()
-                raise ValueError(f"生成的文件大小超过限制 ({settings.max_file_size_mb}MB)")
-            
-            # 保存到缓存
-            cached_file_path = save_to_cache(cache_key, temp_file_path, ".mp3")
-            
-            # 返回缓存文件名和路径
-            cache_filename = get_cache_filename(cache_key, ".mp3")
+            # 返回文件名和路径（未启用缓存时为输出目录中的临时文件）
+            cache_filename = cached_file_path.name
             app_logger.info(f"[性能追踪] 文本转语音成功（新生成） - 文件: {cache_filename}, 语速: {selected_rate}, 已缓存")
             
             return cache_filename, cached_file_path, selected_rate, False
             
+        except UnknownVoiceError as e:
+            app_logger.warning(str(e))
+            raise
         except Exception as e:
             app_logger.error(f"文本转语音失败: {str(e)}")
             raise
     
+    def _mixed_voices(self, voice: Optional[str]) -> dict[str, str]:
+        """中俄混合文本各语言使用的语音（请求指定的语音用于其所属语言）"""
+        voices = {"zh": settings.mixed_voice_zh, "ru": settings.mixed_voice_ru}
+        if voice:
+            if not (voice.startswith("zh-") or voice.startswith("ru-")):
+                raise ValueError(f"不支持的语音: {voice}，仅支持中文（zh-）和俄语（ru-）语音")
+            self.validate_voice(voice)
+            voices[voice[:2]] = voice
+        return voices
+    
+    def mixed_cache_key(
+        self,
+        text: str,
+        voice: Optional[str] = None,
+        rate: Optional[str] = None,
+        volume: Optional[str] = None,
+        pitch: Optional[str] = None
+    ) -> str:
+        """
+        中俄混合文本拼接结果的缓存键（text_to_speech 对混合文本使用该键缓存）
+        
+        Returns:
+            缓存键（MD5 哈希值）
+        """
+        voices = self._mixed_voices(voice)
+        # 未指定语速时各段自行决定（俄语长句自动降速），缓存键中记为 auto
+        return generate_cache_key(
+            text=text,
+            voice=f"{voices['zh']}+{voices['ru']}",
+            rate=rate or "auto",
+            volume=volume or self.default_volume,
+            pitch=pitch or self.default_pitch
+        )
+    
+    def request_cache_key(
+        self,
+        text: str,
+        voice: Optional[str] = None,
+        rate: Optional[str] = None,
+        volume: Optional[str] = None,
+        pitch: Optional[str] = None
+    ) -> str:
+        """
+        text_to_speech 对相同参数使用的缓存键（中俄混合文本为混合缓存键），不合成
+        
+        Returns:
+            缓存键（MD5 哈希值）
+        """
+        if settings.mixed_language_enabled and is_mixed_script(text):
+            return self.mixed_cache_key(text, voice, rate, volume, pitch)
+        return self.resolve_params(text, voice, rate, volume, pitch)[5]
+    
+    async def _mixed_text_to_speech(
+        self,
+        text: str,
+        voice: Optional[str],
+        rate: Optional[str],
+        volume: Optional[str],
+        pitch: Optional[str],
+        priority: str
+    ) -> tuple[str, Path, str, bool]:
+        """
+        中俄混合文本：切分为汉字段和西里尔字母段，各段用对应语言的语音并发合成（各自独立缓存），
+        再按原文顺序拼接为一条音频并缓存
+        
+        Args:
+            voice: 请求指定的语音，用于其所属语言的文本段；另一种语言使用配置的语音
+            
+        Returns:
+            (文件名, 文件路径, 实际使用的语速, 是否缓存命中) 元组
+        """
+        voices = self._mixed_voices(voice)
+        selected_volume = volume or self.default_volume
+        selected_pitch = pitch or self.default_pitch
+        cache_key = self.mixed_cache_key(text, voice, rate, volume, pitch)
+        with span("cache_lookup"):
+            cached_file = check_cache_exists(cache_key, ".mp3")
+        if cached_file:
+            app_logger.info(f"[性能追踪] 缓存命中（中俄混合） - cache_key: {cache_key}")
+            return get_cache_filename(cache_key, ".mp3"), cached_file, rate or self.default_rate, True
+        
+        runs = [(language, segment.strip()) for language, segment in split_scripts(text) if segment.strip()]
+        app_logger.info(
+            f"中俄混合文本 - 分段: {[language for language, _ in runs]}, "
+            f"zh: {voices['zh']}, ru: {voices['ru']}, cache_key: {cache_key}"
+        )
+        # 限制同时合成的段数：交替出现的短段很多时，一个请求不会占满上游槽位、一次耗尽客户端配额
+        semaphore = asyncio.Semaphore(settings.mixed_segment_concurrency)
+        
+        async def synthesize_run(language: str, segment: str) -> Path:
+            async with semaphore:
+                _, file_path, _, _ = await self.text_to_speech(
+                    text=segment,
+                    voice=voices[language],
+                    rate=rate,
+                    volume=selected_volume,
+                    pitch=selected_pitch,
+                    priority=priority
+                )
+            return file_path
+        
+        part_paths = await asyncio.gather(*(synthesize_run(language, segment) for language, segment in runs))
+        
+        file_path = await asyncio.to_thread(self.stitch_audio, cache_key, list(part_paths))
+        return file_path.name, file_path, rate or self.default_rate, False
+    
+    async def concat_to_speech(
+        self,
+        items: list[tuple[Optional[str], Optional[str]]],
+        gaps_ms: list[float],
+        voice: Optional[str] = None,
+        rate: Optional[str] = None,
+        volume: Optional[str] = None,
+        pitch: Optional[str] = None,
+        priority: str = PRIORITY_INTERACTIVE
+    ) -> tuple[str, Path, bool]:
+        """
+        按顺序拼接多条已缓存的音频（只合成未命中的文本），拼接结果按自己的缓存键缓存
+        
+        Args:
+            items: (文本, 缓存键) 列表，每条只有其中一个
+            gaps_ms: 各条之后插入的静音时长（毫秒）
+            voice / rate / volume / pitch: 文本条目使用的合成参数
+            priority: 上游调度优先级类别
+            
+        Returns:
+            (文件名, 文件路径, 是否缓存命中) 元组
+            
+        Raises:
+            FileNotFoundError: 指定的缓存键不存在
+        """
+        selected_volume = volume or self.default_volume
+        selected_pitch = pitch or self.default_pitch
+        cache_key = generate_cache_key(
+            text=json.dumps([[text, key, gap] for (text, key), gap in zip(items, gaps_ms)], ensure_ascii=False),
+            voice=f"concat:{voice or self.default_voice}",
+            rate=rate or "auto",
+            volume=selected_volume,
+            pitch=selected_pitch
+        )
+        with span("cache_lookup"):
+            cached_file = check_cache_exists(cache_key, ".mp3")
+        if cached_file:
+            app_logger.info(f"[性能追踪] 缓存命中（拼接） - cache_key: {cache_key}")
+            return get_cache_filename(cache_key, ".mp3"), cached_file, True
+        
+        async def resolve(text: Optional[str], key: Optional[str]) -> Path:
+            if key is not None:
+                file_path = check_cache_exists(key, ".mp3")
+                if file_path is None:
+                    raise FileNotFoundError(f"缓存不存在: {key}")
+                return file_path
+            _, file_path, _, _ = await self.text_to_speech(
+                text=text,
+                voice=voice,
+                rate=rate,
+                volume=volume,
+                pitch=pitch,
+                priority=priority
+            )
+            return file_path
+        
+        part_paths = await asyncio.gather(*(resolve(text, key) for text, key in items))
+        app_logger.info(f"拼接音频 - 条目数: {len(items)}, cache_key: {cache_key}")
+        file_path = await asyncio.to_thread(self.stitch_audio, cache_key, list(part_paths), gaps_ms)
+        return file_path.name, file_path, False
+    
+    @staticmethod
+    def stitch_audio(
+        cache_key: str,
+        part_paths: list[Path],
+        gaps_ms: Optional[list[float]] = None,
+        keep_parts: bool = False
+    ) -> Path:
+        """
+        按顺序拼接多段音频（按帧拼接，去掉各段的 ID3 标签和信息帧）并写入缓存（在线程中调用）
+        
+        Args:
+            cache_key: 拼接结果的缓存键
+            part_paths: 各段音频文件路径
+            gaps_ms: 各段之后插入的静音时长（毫秒）
+            keep_parts: 拼接后保留各段（未启用缓存时默认删除输出目录中的各段临时文件）
+            
+        Returns:
+            缓存文件路径（未启用缓存时为输出目录中的文件）
+        """
+        parts = [read_audio_file(part_path) for part_path in part_paths]
+        
+        temp_file_path = get_file_path(generate_filename(".mp3"))
+        with file_in_use(temp_file_path):
+            try:
+                with open(temp_file_path, "wb") as output:
+                    output.write(concat_mp3(parts, gaps_ms))
+                cached_file_path = save_to_cache(cache_key, temp_file_path, ".mp3")
+            except BaseException:
+                temp_file_path.unlink(missing_ok=True)
+                raise
+        
+        if cached_file_path != temp_file_path:
+            temp_file_path.unlink(missing_ok=True)
+        if not settings.enable_cache and not keep_parts:
+            # 未启用缓存时各段是输出目录中的临时文件，拼接后不再需要
+            for part_path in part_paths:
+                part_path.unlink(missing_ok=True)
+        return cached_file_path
+    
+    async def _synthesize_once(
+        self,
+        cache_key: str,
+        text: str,
+        voice: str,
+        rate: str,
+        volume: str,
+        pitch: str,
+        priority: str
+    ) -> Path:
+        """
+        合并同一缓存键的并发合成请求
+        
+        进程内：同一缓存键只创建一个合成任务，其余请求等待该任务的结果；
+        跨进程：通过 cache_dir 下的文件锁租约，只让一个 worker 调用上游。
+        所有等待的请求都被取消（客户端断开）后取消合成任务，短文本按配置继续合成写入缓存。
+        
+        Returns:
+            音频文件路径
+        """
+        task = self._inflight.get(cache_key)
+        if task is not None:
+            app_logger.info(f"[性能追踪] 合并进行中的合成请求 - cache_key: {cache_key}")
+        else:
+            task = asyncio.ensure_future(
+                self._synthesize_with_lease(cache_key, text, voice, rate, volume, pitch, priority)
+            )
+            self._inflight[cache_key] = task
+            task.add_done_callback(lambda t: self._on_synthesis_done(cache_key, t))
+        
+        self._waiters[cache_key] = self._waiters.get(cache_key, 0) + 1
+        try:
+            # shield：单个请求被取消不影响其他等待同一结果的请求
+            return await asyncio.shield(task)
+        finally:
+            remaining = self._waiters[cache_key] - 1
+            if remaining:
+                self._waiters[cache_key] = remaining
+            else:
+                del self._waiters[cache_key]
+                if not task.done():
+                    self._abandon_synthesis(cache_key, task, text)
+    
+    def _abandon_synthesis(self, cache_key: str, task: asyncio.Task, text: str) -> None:
+        """
+        合成任务已没有等待的请求：取消任务，释放上游槽位
+        
+        Args:
+            cache_key: 缓存键
+            task: 合成任务
+            text: 合成文本（不超过 synthesis_finish_max_chars 的短文本继续合成写入缓存）
+        """
+        if not settings.synthesis_cancel_on_disconnect or len(text) <= settings.synthesis_finish_max_chars:
+            self._cancel_stats["finished_unwatched"] += 1
+            return
+        
+        app_logger.info(f"[性能追踪] 没有请求等待，取消合成 - cache_key: {cache_key}")
+        # 立即移出进行中列表，随后到达的相同请求重新合成，而不是等待正在取消的任务
+        if self._inflight.get(cache_key) is task:
+            del self._inflight[cache_key]
+        task.cancel()
+        self._cancel_stats["cancelled"] += 1
+    
+    def _record_cancelled(self, cost: float, upstream_started: Optional[float]) -> None:
+        """
+        记录被取消合成的上游耗时
+        
+        Args:
+            cost: 预估合成成本（秒）
+            upstream_started: 开始调用上游的时间（monotonic，尚未调用上游时为 None）
+        """
+        elapsed = time.monotonic() - upstream_started if upstream_started is not None else 0.0
+        self._cancel_stats["wasted_seconds"] += elapsed
+        self._cancel_stats["saved_seconds"] += max(0.0, cost - elapsed)
+    
+    def cancel_stats(self) -> dict:
+        """合成取消统计（已取消数、无人等待但继续完成的数量、浪费和节省的上游时间）"""
+        return {
+            "cancelled": self._cancel_stats["cancelled"],
+            "finished_unwatched": self._cancel_stats["finished_unwatched"],
+            "wasted_seconds": round(self._cancel_stats["wasted_seconds"], 3),
+            "saved_seconds": round(self._cancel_stats["saved_seconds"], 3),
+        }
+    
+    async def drain(self, timeout: float) -> int:
+        """
+        等待进行中的合成任务完成（worker 退出时调用，已开始的上游合成写入缓存而不是丢弃）
+        
+        Args:
+            timeout: 最长等待时间（秒），超时后取消剩余任务
+            
+        Returns:
+            超时被取消的任务数
+        """
+        tasks = set(self._inflight.values())
+        if not tasks:
+            return 0
+        app_logger.info(f"等待 {len(tasks)} 个进行中的合成完成...")
+        pending = tasks
+        if timeout > 0:
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            app_logger.warning(f"等待合成超时，已取消 {len(pending)} 个合成任务")
+        return len(pending)
+    
+    def _on_synthesis_done(self, cache_key: str, task: asyncio.Task) -> None:
+        """合成任务结束后从进行中列表移除"""
+        if self._inflight.get(cache_key) is task:
+            del self._inflight[cache_key]
+        if not task.cancelled():
+            # 标记异常已读取，避免所有等待者都已离开时出现 "exception was never retrieved"
+            task.exception()
+    
+    async def _synthesize_with_lease(
+        self,
+        cache_key: str,
+        text: str,
+        voice: str,
+        rate: str,
+        volume: str,
+        pitch: str,
+        priority: str
+    ) -> Path:
+        """获取跨进程租约后合成；其他 worker 已写出缓存时直接使用缓存，归属节点有缓存时从该节点获取"""
+        if not settings.enable_cache:
+            return await self._synthesize(cache_key, text, voice, rate, volume, pitch, priority)
+        
+        lease = await acquire_synthesis_lease(cache_key, get_cache_path(cache_key, ".mp3"))
+        try:
+            cached_file = check_cache_exists(cache_key, ".mp3")
+            if cached_file:
+                return cached_file
+            peer_file = await peer_cache.fetch(cache_key)
+            if peer_file:
+                return peer_file
+            cached_file_path = await self._synthesize(cache_key, text, voice, rate, volume, pitch, priority)
+            peer_cache.push_to_owner(cache_key, cached_file_path)
+            return cached_file_path
+        finally:
+            if lease is not None:
+                lease.release()
+    
+    async def _synthesize(
+        self,
+        cache_key: str,
+        text: str,
+        voice: str,
+        rate: str,
+        volume: str,
+        pitch: str,
+        priority: str
+    ) -> Path:
+        """
+        调用上游合成音频并写入缓存（经调度器排队获取上游槽位）
+        
+        Returns:
+            缓存文件路径（未启用缓存时为临时文件路径）
+        """
+        # 生成临时文件名（用于生成音频）
+        temp_filename = generate_filename(".mp3")
+        temp_file_path = get_file_path(temp_filename)
+        
+        # 创建 TTS 实例
+        communicate = edge_tts.Communicate(
+            text=text,
+            voice=voice,
+            rate=rate,
+            volume=volume,
+            pitch=pitch
+        )
+        
+        cost = self.scheduler.estimate_cost(text, voice)
+        client = current_client()
+        upstream_started: Optional[float] = None
+        
+        try:
+            # 按客户端配额限速（只在真正调用上游时计量；batch 类别只等待不拒绝）
+            quota_started_ns = time.time_ns()
+            if await client_quotas.acquire(client, None if priority == PRIORITY_BATCH else settings.quota_max_wait_seconds):
+                record_span("quota_wait", quota_started_ns, time.time_ns())
+            
+            with file_in_use(temp_file_path):
+                try:
+                    # 保存音频文件到临时位置（占用一个上游槽位）
+                    enqueued_ns = time.time_ns()
+                    async with self.scheduler.slot(cost, priority, client):
+                        record_span("queue_wait", enqueued_ns, time.time_ns(), priority=priority)
+                        upstream_started = time.monotonic()
+                        await self._stream_to_file(communicate, temp_file_path)
+                    
+                    # 验证文件大小
+                    if not validate_file_size(temp_file_path):
+                        raise ValueError(f"生成的文件大小超过限制 ({settings.max_file_size_mb}MB)")
+                    
+                    # 保存到缓存（静音裁剪逐帧解析，在线程中执行，不阻塞事件循环）
+                    with span("cache_write"):
+                        cached_file_path = await asyncio.to_thread(
+                            save_to_cache,
+                            cache_key,
+                            temp_file_path,
+                            ".mp3",
+                            settings.silence_trim_modes.get(priority, "none")
+                        )
+                except BaseException:
+                    # 合成失败或被取消时删除不完整的临时文件
+                    temp_file_path.unlink(missing_ok=True)
+                    raise
+        except asyncio.CancelledError:
+            self._record_cancelled(cost, upstream_started)
+            raise
+        
+        # 已复制到缓存的临时文件不再需要
+        if cached_file_path != temp_file_path:
+            temp_file_path.unlink(missing_ok=True)
+        return cached_file_path
+    
+    @staticmethod
+    async def _stream_to_file(communicate, file_path: Path) -> None:
+        """
+        流式接收上游音频并写入文件（与 Communicate.save 等价），同时记录首包时间和总耗时
+        
+        Args:
+            communicate: edge_tts.Communicate 实例
+            file_path: 输出文件路径
+        """
+        started_ns = time.time_ns()
+        first_chunk = True
+        with span("upstream_total"):
+            with open(file_path, "wb") as f:
+                async for message in communicate.stream():
+                    if message["type"] != "audio":
+                        continue
+                    if first_chunk:
+                        record_span("upstream_ttfb", started_ns, time.time_ns())
+                        first_chunk = False
+                    f.write(message["data"])
+    
     async def get_audio_duration(self, file_path: Path) -> Optional[float]:
         """
         获取音频文件时长（秒）
@@ -0,0 +1,143 @@
+"""
+启动预热
+应用启动后在后台执行：导入并初始化 edge_tts、拉取语音目录（同时完成到上游的 DNS 解析和 TLS 握手）、
+把最近访问的缓存音频预加载到内存。预热完成前 /ready 返回 503，负载均衡器不会把流量转发到冷实例。
+"""
+import asyncio
+import os
+import time
+from typing import Optional
+from app.config import settings
+from app.utils import app_logger, ensure_cache_dir, get_hot_cache
+
+
+class Warmup:
+    """启动预热任务"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.ready = False
+        self.result: Optional[dict] = None
+
+    def start(self, tts_service) -> None:
+        """
+        在后台启动预热（未启用预热时直接就绪）
+
+        Args:
+            tts_service: TTSService 实例（预热其语音目录缓存）
+        """
+        if not settings.warmup_enabled:
+            self.ready = True
+            self.result = {"enabled": False}
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(tts_service))
+
+    async def stop(self) -> None:
+        """取消尚未完成的预热"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def run(self, tts_service) -> dict:
+        """
+        执行预热；任一步骤失败或超时只记录错误，预热结束后总会进入就绪状态
+
+        Returns:
+            预热结果（各步骤耗时、预加载数量、错误）
+        """
+        started = time.perf_counter()
+        result: dict = {"enabled": True, "steps": {}, "errors": {}}
+
+        async def step(name: str, coro) -> None:
+            step_started = time.perf_counter()
+            try:
+                value = await asyncio.wait_for(coro, settings.warmup_step_timeout_seconds)
+                if value is not None:
+                    result[name] = value
+            except Exception as e:
+                result["errors"][name] = str(e) or type(e).__name__
+                app_logger.warning(f"预热步骤 {name} 失败: {result['errors'][name]}")
+            result["steps"][name] = round((time.perf_counter() - step_started) * 1000, 3)
+
+        # 拉取语音目录：edge_tts 每次合成都新建连接，无法保持长连接，
+        # 这里通过访问同一上游主机完成模块导入、SSL 上下文初始化和 DNS 解析
+        await step("voice_catalog", self._warm_voice_catalog(tts_service))
+        if settings.enable_cache and settings.warmup_preload_top_n > 0:
+            await step("preload", asyncio.to_thread(self._preload_cache, settings.warmup_preload_top_n))
+
+        result["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        self.result = result
+        self.ready = True
+        app_logger.info(
+            f"[性能追踪] 预热完成 - 耗时: {result['duration_ms']:.1f}ms, "
+            f"各步骤: {result['steps']}, 失败: {list(result['errors'])}"
+        )
+        return result
+
+    @staticmethod
+    async def _warm_voice_catalog(tts_service) -> int:
+        voices = await tts_service.get_voice_catalog(refresh=True)
+        return len(voices)
+
+    @staticmethod
+    def _preload_cache(top_n: int) -> dict:
+        """
+        预加载最近访问的 top_n 个缓存音频（在线程中执行）
+
+        启用共享热缓存时写入热缓存，否则提示内核预读到页缓存
+        """
+        entries: list[tuple[float, str, str]] = []
+        with os.scandir(ensure_cache_dir()) as it:
+            for entry in it:
+                if not entry.name.endswith(".mp3") or entry.name.startswith("."):
+                    continue
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                entries.append((max(stat.st_atime, stat.st_mtime), entry.name, entry.path))
+        entries.sort(reverse=True)
+
+        hot_cache = get_hot_cache()
+        loaded = 0
+        loaded_bytes = 0
+        for _, name, path in entries[:top_n]:
+            try:
+                if hot_cache is not None:
+                    cache_key = name[:-4]
+                    if hot_cache.contains(cache_key):
+                        continue
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    if hot_cache.put(cache_key, data):
+                        loaded += 1
+                        loaded_bytes += len(data)
+                else:
+                    fd = os.open(path, os.O_RDONLY)
+                    try:
+                        size = os.fstat(fd).st_size
+                        if hasattr(os, "posix_fadvise"):
+                            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+                        else:
+                            os.read(fd, size)
+                    finally:
+                        os.close(fd)
+                    loaded += 1
+                    loaded_bytes += size
+            except FileNotFoundError:
+                continue
+
+        return {
+            "candidates": len(entries),
+            "loaded": loaded,
+            "bytes": loaded_bytes,
+            "target": "shared_cache" if hot_cache is not None else "page_cache",
+        }
+
+
+# 全局预热任务实例
+warmup = Warmup()
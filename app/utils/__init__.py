@@ -14,8 +14,24 @@ from app.utils.file_utils import (
     get_file_size_mb,
     validate_file_size,
     check_cache_exists,
-    save_to_cache
+    save_to_cache,
+    get_trim_stats,
+    read_cached_audio,
+    fill_hot_cache,
+    read_audio_file,
+    acquire_file,
+    release_file,
+    file_in_use,
+    is_file_in_use,
+    expire_file_marks
 )
+from app.utils.shared_cache import get_hot_cache
+from app.utils.vocab_archive import get_vocab_archive
+from app.utils.synthesis_lock import acquire_synthesis_lease
+from app.utils.text_utils import split_text, split_text_progressive, split_scripts, is_mixed_script
+from app.utils.mp3_utils import concat_mp3
+from app.utils.tracing import span, record_span, current_trace
+from app.utils.client_identity import current_client
 
 __all__ = [
     "app_logger",
@@ -30,6 +46,27 @@ __all__ = [
     "get_file_size_mb",
     "validate_file_size",
     "check_cache_exists",
-    "save_to_cache"
+    "save_to_cache",
+    "get_trim_stats",
+    "read_cached_audio",
+    "fill_hot_cache",
+    "read_audio_file",
+    "acquire_file",
+    "release_file",
+    "file_in_use",
+    "is_file_in_use",
+    "expire_file_marks",
+    "get_hot_cache",
+    "get_vocab_archive",
+    "acquire_synthesis_lease",
+    "split_text",
+    "split_text_progressive",
+    "split_scripts",
+    "is_mixed_script",
+    "concat_mp3",
+    "span",
+    "record_span",
+    "current_trace",
+    "current_client"
 ]
 
@@ -0,0 +1,205 @@
+"""
+缓存导出 / 导入
+把缓存目录中的音频以 tar 流导出（第一个成员为清单 manifest.json，其后为各条 <cache_key>.mp3），
+导入时逐条校验 MP3 帧流后写入目标缓存目录（已存在的跳过，不完整的丢弃，原子替换写入）。
+节点之间比较清单中的缓存键，只传输对方缺少的条目（增量同步）。
+MP3 本身已经压缩，tar 流不再压缩。
+"""
+import io
+import json
+import os
+import re
+import tarfile
+import time
+import uuid
+from pathlib import Path
+from typing import IO, Iterable, Iterator, Optional
+from app.utils.mp3_utils import check_integrity
+
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+CACHE_ENTRY_PATTERN = re.compile(r"^([0-9a-f]{32})\.mp3$")
+
+
+def list_cache_entries(cache_dir: Path) -> dict[str, tuple[int, float]]:
+    """
+    列出缓存目录中的音频
+
+    Args:
+        cache_dir: 缓存目录
+
+    Returns:
+        缓存键 -> (文件大小, 修改时间)
+    """
+    entries: dict[str, tuple[int, float]] = {}
+    if not cache_dir.is_dir():
+        return entries
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            match = CACHE_ENTRY_PATTERN.match(entry.name)
+            if match is None:
+                continue
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            if stat.st_size > 0:
+                entries[match.group(1)] = (stat.st_size, stat.st_mtime)
+    return entries
+
+
+class _ChunkBuffer:
+    """tarfile 的写入目标：收集写入的数据，由导出生成器分块取走"""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_export(cache_dir: Path, keys: Optional[Iterable[str]] = None) -> Iterator[bytes]:
+    """
+    以 tar 流导出缓存条目（边读边产出，不在内存中保存整个归档）
+
+    Args:
+        cache_dir: 缓存目录
+        keys: 只导出这些缓存键（None 表示全部）；不存在的键忽略
+
+    Yields:
+        tar 流数据块
+    """
+    available = list_cache_entries(cache_dir)
+    if keys is not None:
+        available = {key: available[key] for key in keys if key in available}
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "created_at": time.time(),
+        "entries": [
+            {"key": key, "size": size, "mtime": mtime}
+            for key, (size, mtime) in sorted(available.items())
+        ],
+    }
+    manifest_bytes = json.dumps(manifest, ensure_ascii=False).encode("utf-8")
+
+    buffer = _ChunkBuffer()
+    with tarfile.open(fileobj=buffer, mode="w|", format=tarfile.GNU_FORMAT) as tar:
+        info = tarfile.TarInfo(MANIFEST_NAME)
+        info.size = len(manifest_bytes)
+        info.mtime = int(manifest["created_at"])
+        tar.addfile(info, io.BytesIO(manifest_bytes))
+
+        for key, (_, mtime) in sorted(available.items()):
+            try:
+                with open(cache_dir / f"{key}.mp3", "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                continue
+            info = tarfile.TarInfo(f"{key}.mp3")
+            info.size = len(data)
+            info.mtime = int(mtime)
+            tar.addfile(info, io.BytesIO(data))
+            chunk = buffer.drain()
+            if chunk:
+                yield chunk
+    chunk = buffer.drain()
+    if chunk:
+        yield chunk
+
+
+def _write_atomic(path: Path, data: bytes, mtime: Optional[float]) -> None:
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.{uuid.uuid4().hex[:12]}.tmp")
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        if mtime:
+            os.utime(temp_path, (mtime, mtime))
+        os.replace(temp_path, path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+
+def write_entry(cache_dir: Path, cache_key: str, data: bytes, overwrite: bool = False) -> bool:
+    """
+    写入单条缓存
+
+    Returns:
+        是否写入（已存在且不覆盖时返回 False）
+    """
+    target = cache_dir / f"{cache_key}.mp3"
+    if not overwrite and target.exists():
+        return False
+    _write_atomic(target, data, None)
+    return True
+
+
+def import_archive(stream: IO[bytes], cache_dir: Path, overwrite: bool = False) -> dict:
+    """
+    从 tar 流导入缓存条目
+
+    Args:
+        stream: tar 流（只需顺序读取）
+        cache_dir: 目标缓存目录
+        overwrite: 是否覆盖已存在的条目
+
+    Returns:
+        导入结果（导入数、跳过数、无效数、不完整数、字节数）
+
+    Raises:
+        ValueError: 不是有效的缓存导出流
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    expected: dict[str, int] = {}
+    imported = skipped = invalid = corrupt = 0
+    imported_bytes = 0
+
+    try:
+        with tarfile.open(fileobj=stream, mode="r|") as tar:
+            for member in tar:
+                if member.name == MANIFEST_NAME:
+                    manifest = json.loads(tar.extractfile(member).read())
+                    expected = {item["key"]: item["size"] for item in manifest.get("entries", [])}
+                    continue
+
+                match = CACHE_ENTRY_PATTERN.match(member.name)
+                if match is None or not member.isfile():
+                    invalid += 1
+                    continue
+                key = match.group(1)
+                target = cache_dir / member.name
+                if not overwrite and target.exists():
+                    skipped += 1
+                    continue
+
+                data = tar.extractfile(member).read()
+                if not data or (key in expected and expected[key] != len(data)):
+                    invalid += 1
+                    continue
+                # 截断的导出、传输中断的数据不写入缓存（否则在后台完整性校验隔离之前会一直被返回）
+                if check_integrity(data) is not None:
+                    corrupt += 1
+                    continue
+                _write_atomic(target, data, member.mtime)
+                imported += 1
+                imported_bytes += len(data)
+    except tarfile.TarError as e:
+        raise ValueError(f"不是有效的缓存导出流: {str(e)}")
+
+    return {
+        "imported": imported,
+        "skipped": skipped,
+        "invalid": invalid,
+        "corrupt": corrupt,
+        "bytes": imported_bytes,
+    }
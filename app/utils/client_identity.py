@@ -0,0 +1,92 @@
+"""
+客户端标识
+按 API Key（优先）或 nginx 转发的客户端 IP 识别请求来源，写入请求上下文，
+供上游合成的配额和公平排队按客户端区分。
+只有 client_api_keys 中配置的 API Key 才按 Key 区分；请求头由客户端任意填写，
+不受信任的 Key 按 IP 区分，否则轮换随机 Key 就能绕过按客户端的配额。
+同理，只有连接来自 client_trusted_proxies（nginx）时才采用转发的客户端 IP 请求头，
+直接连接的客户端按连接地址区分。
+"""
+import contextvars
+import hashlib
+import ipaddress
+from functools import lru_cache
+from typing import Optional
+from app.config import settings
+
+
+_current_client: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_client", default=None)
+
+
+def current_client() -> Optional[str]:
+    """当前请求的客户端标识（不在请求中时返回 None）"""
+    return _current_client.get()
+
+
+@lru_cache(maxsize=4)
+def _trusted_key_digests(api_keys: tuple[str, ...]) -> frozenset[str]:
+    return frozenset(hashlib.sha256(key.encode("latin-1")).hexdigest()[:16] for key in api_keys)
+
+
+@lru_cache(maxsize=4)
+def _trusted_proxy_networks(proxies: tuple[str, ...]) -> tuple:
+    return tuple(ipaddress.ip_network(proxy, strict=False) for proxy in proxies)
+
+
+def _is_trusted_proxy(peer_host: Optional[str]) -> bool:
+    """连接的对端地址是否在 client_trusted_proxies 中（地址或网段）"""
+    if not peer_host or not settings.client_trusted_proxies:
+        return False
+    try:
+        address = ipaddress.ip_address(peer_host)
+    except ValueError:
+        return False
+    if address.version == 6 and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    return any(address in network for network in _trusted_proxy_networks(tuple(settings.client_trusted_proxies)))
+
+
+def resolve_client(headers: dict[bytes, bytes], peer_host: Optional[str]) -> Optional[str]:
+    """
+    根据请求头识别客户端
+
+    Args:
+        headers: 请求头（小写名称）
+        peer_host: 连接的对端地址（在 client_trusted_proxies 中时才采用转发的客户端 IP 请求头）
+
+    Returns:
+        客户端标识：key:<受信任的 API Key 摘要>、ip:<地址>；无法识别时返回 None
+    """
+    if settings.client_api_key_header:
+        api_key = headers.get(settings.client_api_key_header.lower().encode("latin-1"))
+        if api_key and settings.client_api_keys:
+            # 只保留摘要，统计和日志中不出现原始 API Key
+            digest = hashlib.sha256(api_key).hexdigest()[:16]
+            if digest in _trusted_key_digests(tuple(settings.client_api_keys)):
+                return f"key:{digest}"
+    if settings.client_ip_header and _is_trusted_proxy(peer_host):
+        forwarded = headers.get(settings.client_ip_header.lower().encode("latin-1"))
+        if forwarded:
+            return f"ip:{forwarded.decode('latin-1').strip()}"
+    if peer_host:
+        return f"ip:{peer_host}"
+    return None
+
+
+class ClientIdentityMiddleware:
+    """客户端标识中间件（纯 ASGI）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        token = _current_client.set(resolve_client(dict(scope.get("headers") or []), client[0] if client else None))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_client.reset(token)
@@ -0,0 +1,70 @@
+"""
+Count-Min 计数草图
+用固定大小的计数器矩阵估计各缓存键的访问次数，内存占用与键的数量无关。
+估计值只会偏大不会偏小；使用保守更新（只增加当前最小的计数器）减小偏差，
+累计增加次数达到 sample_size 后所有计数器减半，使估计值反映近期的访问频率。
+"""
+from array import array
+
+
+class CountMinSketch:
+    """Count-Min 计数草图（4 行，键为 32 位十六进制 MD5 缓存键）"""
+
+    MAX_COUNT = 0xFFFF
+
+    def __init__(self, width: int = 16384, sample_size: int = 0):
+        """
+        Args:
+            width: 每行计数器数量（向上取整为 2 的幂）
+            sample_size: 累计增加次数达到该值后计数器减半（0 表示 10 × width）
+        """
+        self.width = 1 << max(0, width - 1).bit_length()
+        self.sample_size = sample_size or 10 * self.width
+        self._mask = self.width - 1
+        self._rows = [array("H", bytes(2 * self.width)) for _ in range(4)]
+        self.additions = 0
+        self.resets = 0
+
+    def _indexes(self, cache_key: str) -> tuple[int, int, int, int]:
+        # 每行取缓存键（128 位 MD5）中不同的 32 位作为哈希值，MD5 本身分布均匀，不需要再哈希
+        value = int(cache_key, 16)
+        mask = self._mask
+        return value & mask, (value >> 32) & mask, (value >> 64) & mask, (value >> 96) & mask
+
+    def estimate(self, cache_key: str) -> int:
+        """估计缓存键的访问次数"""
+        i0, i1, i2, i3 = self._indexes(cache_key)
+        r0, r1, r2, r3 = self._rows
+        return min(r0[i0], r1[i1], r2[i2], r3[i3])
+
+    def add(self, cache_key: str) -> int:
+        """
+        记录一次访问
+
+        Returns:
+            记录后的估计次数
+        """
+        i0, i1, i2, i3 = self._indexes(cache_key)
+        r0, r1, r2, r3 = self._rows
+        current = min(r0[i0], r1[i1], r2[i2], r3[i3])
+        if current < self.MAX_COUNT:
+            current += 1
+            if r0[i0] < current:
+                r0[i0] = current
+            if r1[i1] < current:
+                r1[i1] = current
+            if r2[i2] < current:
+                r2[i2] = current
+            if r3[i3] < current:
+                r3[i3] = current
+
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.halve()
+        return current
+
+    def halve(self) -> None:
+        """所有计数器减半（衰减旧的访问）"""
+        self._rows = [array("H", (count >> 1 for count in row)) for row in self._rows]
+        self.additions //= 2
+        self.resets += 1
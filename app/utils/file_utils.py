@@ -3,12 +3,30 @@
 处理文件相关的操作
 """
 import os
+import time
 import uuid
+import fcntl
 import hashlib
+import threading
+from contextlib import contextmanager
+from stat import S_ISREG
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 from app.config import settings
 from app.utils.logger import app_logger
+from app.utils.shared_cache import get_hot_cache
+from app.utils.vocab_archive import get_vocab_archive
+from app.utils.mp3_utils import trim_silence
+
+
+# 正在使用（流式返回、正在写入）的文件：路径 -> (引用计数, 最近一次标记时间, 共享锁文件描述符)
+# 标记在事件循环和清理线程中都会访问；共享锁（flock LOCK_SH）让其他 worker 的清理任务也能识别正在使用的文件
+_files_in_use: dict[str, tuple[int, float, int]] = {}
+_files_in_use_lock = threading.Lock()
+
+# 写入缓存时的静音裁剪统计（写入缓存在多个线程中并发执行）
+_trim_stats = {"files": 0, "trimmed": 0, "bytes_saved": 0, "ms_saved": 0.0}
+_trim_stats_lock = threading.Lock()
 
 
 def ensure_output_dir() -> Path:
@@ -117,13 +135,28 @@ def check_cache_exists(cache_key: str, extension: str = ".mp3") -> Optional[Path
     if not settings.enable_cache:
         return None
     
+    # 词表归档中的条目没有对应文件，返回其规范缓存路径，读取时通过 read_cached_audio / read_audio_file
+    archive = get_vocab_archive()
+    if archive is not None and extension == ".mp3" and archive.contains(cache_key):
+        return get_cache_path(cache_key, extension)
+    
     cache_path = get_cache_path(cache_key, extension)
-    if cache_path.exists() and cache_path.is_file():
+    try:
+        stat = cache_path.stat()
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    # 空文件不是有效的缓存（其他损坏由后台完整性校验隔离）
+    if S_ISREG(stat.st_mode) and stat.st_size > 0:
         return cache_path
     return None
 
 
-def save_to_cache(cache_key: str, source_file: Path, extension: str = ".mp3") -> Path:
+def save_to_cache(
+    cache_key: str,
+    source_file: Path,
+    extension: str = ".mp3",
+    trim: str = "none"
+) -> Path:
     """
     将文件保存到缓存
     
@@ -131,6 +164,7 @@ def save_to_cache(cache_key: str, source_file: Path, extension: str = ".mp3") ->
         cache_key: 缓存键
         source_file: 源文件路径
         extension: 文件扩展名
+        trim: 静音裁剪方式（both、head、tail、none），只对 MP3 生效
         
     Returns:
         缓存文件路径
@@ -144,9 +178,221 @@ def save_to_cache(cache_key: str, source_file: Path, extension: str = ".mp3") ->
     if cache_path.exists():
         return cache_path
     
-    # 复制文件到缓存目录
+    # 先复制到同目录的临时文件再原子替换，其他 worker 不会读到写了一半的缓存文件；
+    # 临时文件名包含随机后缀，同一进程中多个线程（拼接、写入缓存）同时写同一缓存键时互不覆盖
     import shutil
-    shutil.copy2(source_file, cache_path)
+    temp_path = cache_path.with_name(f".{cache_path.name}.{os.getpid()}.{uuid.uuid4().hex[:12]}.tmp")
+    try:
+        trimmed = _trim_audio(source_file, trim) if extension == ".mp3" and trim != "none" else None
+        if trimmed is None:
+            shutil.copy2(source_file, temp_path)
+        else:
+            with open(temp_path, "wb") as f:
+                f.write(trimmed)
+        if settings.cache_fsync:
+            # 数据落盘后再替换：断电或崩溃后不会留下内容为空或不完整的缓存文件
+            fd = os.open(temp_path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        os.replace(temp_path, cache_path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
     app_logger.info(f"文件已保存到缓存: {cache_path}")
     return cache_path
 
+
+
+def _trim_audio(source_file: Path, mode: str) -> Optional[bytes]:
+    """裁剪首尾静音帧，返回裁剪后的数据（没有可裁剪的帧时返回 None）"""
+    with open(source_file, "rb") as f:
+        data = f.read()
+    trimmed, result = trim_silence(
+        data,
+        head=mode in ("both", "head"),
+        tail=mode in ("both", "tail"),
+        max_bits=settings.silence_trim_max_bits,
+        guard_frames=settings.silence_trim_guard_frames
+    )
+    with _trim_stats_lock:
+        _trim_stats["files"] += 1
+        if not result.bytes_saved:
+            return None
+        _trim_stats["trimmed"] += 1
+        _trim_stats["bytes_saved"] += result.bytes_saved
+        _trim_stats["ms_saved"] += result.ms_saved
+    app_logger.info(
+        f"静音裁剪 - 头部: {result.head_frames} 帧, 尾部: {result.tail_frames} 帧, "
+        f"节省: {result.bytes_saved} 字节 / {result.ms_saved:.0f}ms"
+    )
+    return trimmed
+
+
+def get_trim_stats() -> dict:
+    """静音裁剪统计（本进程写入缓存的文件）"""
+    with _trim_stats_lock:
+        return {
+            "files": _trim_stats["files"],
+            "trimmed": _trim_stats["trimmed"],
+            "bytes_saved": _trim_stats["bytes_saved"],
+            "ms_saved": round(_trim_stats["ms_saved"], 1),
+        }
+
+
+def read_cached_audio(cache_key: str, extension: str = ".mp3") -> Optional[bytes]:
+    """
+    读取缓存音频数据（依次查找共享热缓存、词表归档，都未命中时读取缓存文件并回填热缓存）
+    
+    Args:
+        cache_key: 缓存键
+        extension: 文件扩展名
+        
+    Returns:
+        音频数据；缓存文件不存在时返回 None
+    """
+    hot_cache = get_hot_cache()
+    if hot_cache is not None:
+        data = hot_cache.get(cache_key)
+        if data is not None:
+            return data
+    
+    archive = get_vocab_archive()
+    if archive is not None and extension == ".mp3":
+        data = archive.get(cache_key)
+        if data is not None:
+            return data
+    
+    cache_path = get_cache_path(cache_key, extension)
+    try:
+        with open(cache_path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    
+    if hot_cache is not None and len(data) <= hot_cache.max_entry_size:
+        hot_cache.put(cache_key, data)
+    return data
+
+
+def fill_hot_cache(cache_key: str, extension: str = ".mp3") -> bool:
+    """
+    读取缓存文件写入共享热缓存（在线程中调用；超过单条目上限的文件不读取）
+    
+    Returns:
+        是否写入了热缓存
+    """
+    hot_cache = get_hot_cache()
+    if hot_cache is None:
+        return False
+    try:
+        with open(get_cache_path(cache_key, extension), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0 or size > hot_cache.max_entry_size:
+                return False
+            data = f.read()
+    except FileNotFoundError:
+        return False
+    return hot_cache.put(cache_key, data)
+
+
+def read_audio_file(file_path: Path) -> bytes:
+    """
+    读取音频文件内容（缓存目录中的文件经 read_cached_audio 读取，可命中热缓存和词表归档）
+    
+    Args:
+        file_path: 文件路径（缓存路径或输出目录中的文件）
+        
+    Returns:
+        音频数据
+        
+    Raises:
+        FileNotFoundError: 文件不存在
+    """
+    if file_path.parent == Path(settings.cache_dir):
+        data = read_cached_audio(file_path.stem, file_path.suffix)
+        if data is not None:
+            return data
+    with open(file_path, "rb") as f:
+        return f.read()
+
+
+def _lock_shared(file_path: Path) -> int:
+    """对文件加共享锁，返回文件描述符（文件尚未创建或正在被删除时返回 -1）"""
+    try:
+        fd = os.open(file_path, os.O_RDONLY)
+    except OSError:
+        return -1
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return -1
+    return fd
+
+
+def acquire_file(file_path: Path) -> None:
+    """标记文件正在使用（清理任务不会删除正在使用的文件，包括其他 worker 的清理任务）"""
+    key = str(file_path)
+    with _files_in_use_lock:
+        count, _, fd = _files_in_use.get(key, (0, 0.0, -1))
+        if fd < 0:
+            # 正在写入的临时文件在标记时可能还不存在，只有本进程的标记；这类文件的修改时间很新，不会被清理
+            fd = _lock_shared(file_path)
+        _files_in_use[key] = (count + 1, time.monotonic(), fd)
+
+
+def release_file(file_path: Path) -> None:
+    """取消文件的使用标记"""
+    key = str(file_path)
+    with _files_in_use_lock:
+        count, marked_at, fd = _files_in_use.get(key, (0, 0.0, -1))
+        if count <= 1:
+            _files_in_use.pop(key, None)
+            if fd >= 0:
+                os.close(fd)
+        else:
+            _files_in_use[key] = (count - 1, marked_at, fd)
+
+
+def expire_file_marks(grace_seconds: float) -> int:
+    """
+    清除超过有效期的使用标记并释放共享锁（异常中断的响应可能没有取消标记）
+    
+    Returns:
+        清除的标记数
+    """
+    now = time.monotonic()
+    with _files_in_use_lock:
+        stale = [key for key, (_, marked_at, _) in _files_in_use.items() if now - marked_at >= grace_seconds]
+        for key in stale:
+            fd = _files_in_use.pop(key)[2]
+            if fd >= 0:
+                os.close(fd)
+    return len(stale)
+
+
+@contextmanager
+def file_in_use(file_path: Path) -> Iterator[Path]:
+    """在上下文内标记文件正在使用"""
+    acquire_file(file_path)
+    try:
+        yield file_path
+    finally:
+        release_file(file_path)
+
+
+def is_file_in_use(file_path: Path, grace_seconds: float) -> bool:
+    """
+    检查文件是否正在使用
+    
+    Args:
+        file_path: 文件路径
+        grace_seconds: 标记的有效期（秒），防止异常中断的响应没有取消标记导致文件永远不被清理
+    """
+    with _files_in_use_lock:
+        entry = _files_in_use.get(str(file_path))
+    if entry is None:
+        return False
+    return time.monotonic() - entry[1] < grace_seconds
@@ -0,0 +1,59 @@
+"""
+HLS 工具类
+长文本任务的各段音频作为 HLS packed audio 分段：播放列表（EVENT 类型）随合成进度增长，
+任务完成后加上 EXT-X-ENDLIST。每个分段开头带 ID3 时间戳标签，播放器据此衔接各段。
+"""
+import math
+
+
+# packed audio 分段时间戳使用的 ID3 PRIV 所有者标识
+_TIMESTAMP_OWNER = b"com.apple.streaming.transportStreamTimestamp\x00"
+
+
+def _syncsafe(value: int) -> bytes:
+    """ID3v2.4 同步安全整数（每字节 7 位）"""
+    return bytes(((value >> 21) & 0x7F, (value >> 14) & 0x7F, (value >> 7) & 0x7F, value & 0x7F))
+
+
+def id3_timestamp_tag(seconds: float) -> bytes:
+    """
+    生成分段开头的 ID3 时间戳标签
+
+    Args:
+        seconds: 分段在整条音频中的起始时间（秒）
+
+    Returns:
+        ID3v2.4 标签（一个 PRIV 帧，内容为 33 位 90kHz 时间戳）
+    """
+    timestamp = round(seconds * 90000) & ((1 << 33) - 1)
+    payload = _TIMESTAMP_OWNER + timestamp.to_bytes(8, "big")
+    frame = b"PRIV" + _syncsafe(len(payload)) + b"\x00\x00" + payload
+    return b"ID3\x04\x00\x00" + _syncsafe(len(frame)) + frame
+
+
+def render_playlist(segments: list[tuple[str, float]], ended: bool, min_target_duration: int = 0) -> str:
+    """
+    生成 HLS 播放列表
+
+    Args:
+        segments: (分段 URL, 时长秒) 列表
+        ended: 是否已完整（加上 EXT-X-ENDLIST）
+        min_target_duration: EXT-X-TARGETDURATION 下限（秒）
+
+    Returns:
+        m3u8 文本
+    """
+    target = max([min_target_duration, 1] + [math.ceil(duration) for _, duration in segments])
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        f"#EXT-X-TARGETDURATION:{target}",
+        "#EXT-X-PLAYLIST-TYPE:EVENT",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+    ]
+    for url, duration in segments:
+        lines.append(f"#EXTINF:{duration:.3f},")
+        lines.append(url)
+    if ended:
+        lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
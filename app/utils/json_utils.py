@@ -0,0 +1,40 @@
+"""
+JSON 序列化工具
+热路由（/tts/generate、/tts/voices）直接返回预先构建的 dict 或预渲染的字节，
+跳过 response_model 的二次校验和 jsonable_encoder；安装了 orjson 时使用 orjson，
+否则退回标准库 json（输出格式与 FastAPI 默认的 JSONResponse 一致）。
+"""
+import json
+from typing import Any
+from fastapi.responses import Response
+
+try:
+    import orjson  # type: ignore[reportMissingImports]
+except ImportError:  # pragma: no cover - 未安装 orjson 时使用标准库
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """
+    序列化为 UTF-8 编码的 JSON 字节（不转义非 ASCII 字符）
+
+    Args:
+        content: 由 dict、list、str、数字、bool、None 组成的数据
+
+    Returns:
+        JSON 字节
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """使用 orjson（可用时）序列化的 JSON 响应；content 为 bytes 时视为已渲染的 JSON 直接发送"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
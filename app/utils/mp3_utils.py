@@ -0,0 +1,329 @@
+"""
+MP3 工具类
+解析 MPEG Layer III 帧头，按帧拼接音频。
+Edge TTS 输出的是没有 ID3 标签的裸 MP3 帧流（24kHz / 48kbps / 单声道），
+多段音频去掉各自的 ID3 标签和 Xing/Info 头后按帧首尾相接，即得到一条可连续播放的音频。
+首尾的静音帧可以按边信息（part2_3_length / big_values）识别，无需解码即可按帧裁剪。
+"""
+from typing import Iterator, NamedTuple, Optional
+
+
+# Layer III 比特率表（kbps），下标为帧头中的比特率索引
+_BITRATES_MPEG1 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+_BITRATES_MPEG2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+# 采样率表（Hz），键为帧头中的版本位：3 = MPEG1, 2 = MPEG2, 0 = MPEG2.5
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+# VBR 信息帧标记（不含音频，拼接后长度信息会失效）
+_INFO_TAGS = (b"Xing", b"Info", b"VBRI")
+
+
+class FrameHeader(NamedTuple):
+    """MP3 帧头信息"""
+
+    version: int  # 3 = MPEG1, 2 = MPEG2, 0 = MPEG2.5
+    bitrate: int  # kbps
+    sample_rate: int  # Hz
+    padding: int
+    channels: int
+    length: int  # 帧长度（字节，含帧头）
+    samples: int  # 每帧采样数
+    side_info_size: int  # 帧头后 side info 的字节数（无 CRC 时）
+    has_crc: bool
+
+    @property
+    def duration(self) -> float:
+        """帧时长（秒）"""
+        return self.samples / self.sample_rate
+
+
+def parse_header(data: bytes, pos: int = 0) -> Optional[FrameHeader]:
+    """
+    解析 pos 处的 Layer III 帧头
+
+    Args:
+        data: 音频数据
+        pos: 帧起始位置
+
+    Returns:
+        帧头信息；不是合法的 Layer III 帧头时返回 None
+    """
+    if pos + 4 > len(data):
+        return None
+    b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+    if data[pos] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = (b1 >> 3) & 0x03
+    layer = (b1 >> 1) & 0x03
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = (_BITRATES_MPEG1 if mpeg1 else _BITRATES_MPEG2)[bitrate_index]
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    padding = (b2 >> 1) & 0x01
+    channels = 1 if (b3 >> 6) == 3 else 2
+    samples = 1152 if mpeg1 else 576
+    length = (144 if mpeg1 else 72) * bitrate * 1000 // sample_rate + padding
+    if mpeg1:
+        side_info_size = 17 if channels == 1 else 32
+    else:
+        side_info_size = 9 if channels == 1 else 17
+    return FrameHeader(
+        version=version,
+        bitrate=bitrate,
+        sample_rate=sample_rate,
+        padding=padding,
+        channels=channels,
+        length=length,
+        samples=samples,
+        side_info_size=side_info_size,
+        has_crc=(b1 & 0x01) == 0,
+    )
+
+
+def _skip_id3v2(data: bytes) -> int:
+    """返回 ID3v2 标签之后的位置（没有标签时为 0）"""
+    if len(data) >= 10 and data[:3] == b"ID3":
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def iter_frames(data: bytes) -> Iterator[tuple[int, FrameHeader]]:
+    """
+    遍历音频中的帧（跳过 ID3v2 标签和帧间的无效数据，忽略末尾不完整的帧）
+
+    Yields:
+        (帧起始位置, 帧头信息) 元组
+    """
+    pos = _skip_id3v2(data)
+    end = len(data)
+    while pos + 4 <= end:
+        header = parse_header(data, pos)
+        if header is None or pos + header.length > end:
+            if header is not None:
+                return
+            # 失去同步：查找下一个可能的帧头
+            pos = data.find(b"\xff", pos + 1)
+            if pos < 0:
+                return
+            continue
+        yield pos, header
+        pos += header.length
+
+
+def is_info_frame(data: bytes, pos: int, header: FrameHeader) -> bool:
+    """判断是否为 Xing/Info/VBRI 信息帧（不含音频）"""
+    offset = pos + 4 + (2 if header.has_crc else 0) + header.side_info_size
+    if data[offset:offset + 4] in _INFO_TAGS:
+        return True
+    return data[pos + 36:pos + 40] == b"VBRI"
+
+
+def audio_frames(data: bytes) -> Iterator[bytes]:
+    """
+    遍历音频帧数据（不含 ID3 标签和信息帧）
+
+    Yields:
+        单帧数据
+    """
+    view = memoryview(data)
+    for pos, header in iter_frames(data):
+        if not is_info_frame(data, pos, header):
+            yield view[pos:pos + header.length]
+
+
+def silent_frames(reference: bytes, duration_ms: float) -> bytes:
+    """
+    生成与参考音频格式相同的静音帧（边信息和主数据全为 0，解码后为静音）
+
+    Args:
+        reference: 参考音频（取第一个音频帧的版本、比特率、采样率和声道）
+        duration_ms: 静音时长（毫秒，按帧时长取整）
+
+    Returns:
+        静音帧数据；参考音频中没有音频帧时返回空
+    """
+    for pos, header in iter_frames(reference):
+        if is_info_frame(reference, pos, header):
+            continue
+        count = round(duration_ms / (header.duration * 1000))
+        if count <= 0:
+            return b""
+        # 去掉填充位和 CRC，帧长度按无填充重新计算
+        frame_header = bytes((
+            reference[pos],
+            reference[pos + 1] | 0x01,
+            reference[pos + 2] & ~0x02 & 0xFF,
+            reference[pos + 3],
+        ))
+        frame = frame_header + bytes(header.length - header.padding - 4)
+        return frame * count
+    return b""
+
+
+def concat_mp3(parts: list[bytes], gaps_ms: Optional[list[float]] = None) -> bytes:
+    """
+    按顺序拼接多段 MP3 音频
+
+    Args:
+        parts: 各段音频数据
+        gaps_ms: 各段之后插入的静音时长（毫秒，最后一段之后的忽略）
+
+    Returns:
+        拼接后的裸帧流
+    """
+    if not gaps_ms:
+        return b"".join(frame for part in parts for frame in audio_frames(part))
+    chunks = []
+    for i, part in enumerate(parts):
+        chunks.extend(audio_frames(part))
+        if i < len(parts) - 1 and i < len(gaps_ms) and gaps_ms[i] > 0:
+            chunks.append(silent_frames(part, gaps_ms[i]))
+    return b"".join(chunks)
+
+
+class TrimResult(NamedTuple):
+    """静音裁剪结果"""
+
+    head_frames: int  # 头部裁掉的帧数
+    tail_frames: int  # 尾部裁掉的帧数
+    bytes_saved: int
+    ms_saved: float
+
+
+def side_info(data: bytes, pos: int, header: FrameHeader) -> tuple[int, list[tuple[int, int]]]:
+    """
+    解析帧的边信息
+
+    Returns:
+        (main_data_begin, 各 granule / 声道的 (part2_3_length, big_values) 列表) 元组
+    """
+    offset = pos + 4 + (2 if header.has_crc else 0)
+    size = header.side_info_size
+    bits = int.from_bytes(data[offset:offset + size], "big")
+    total = size * 8
+    mono = header.channels == 1
+    if header.version == 3:
+        main_data_begin = bits >> (total - 9)
+        consumed = 9 + (5 if mono else 3) + 4 * header.channels
+        granules, block = 2, 59
+    else:
+        main_data_begin = bits >> (total - 8)
+        consumed = 8 + (1 if mono else 2)
+        granules, block = 1, 63
+    values = []
+    for _ in range(granules * header.channels):
+        shift = total - consumed
+        values.append(((bits >> (shift - 12)) & 0xFFF, (bits >> (shift - 21)) & 0x1FF))
+        consumed += block
+    return main_data_begin, values
+
+
+def is_silent_frame(data: bytes, pos: int, header: FrameHeader, max_bits: int = 0) -> bool:
+    """
+    判断是否为静音帧：所有 granule 都没有 big_values 区，且主数据不超过 max_bits 位
+
+    Args:
+        max_bits: 每个 granule / 声道允许的最大 part2_3_length（0 表示只认完全无主数据的帧）
+    """
+    _, values = side_info(data, pos, header)
+    return all(big_values == 0 and part2_3_length <= max_bits for part2_3_length, big_values in values)
+
+
+def trim_silence(
+    data: bytes,
+    head: bool = True,
+    tail: bool = True,
+    max_bits: int = 0,
+    guard_frames: int = 1
+) -> tuple[bytes, TrimResult]:
+    """
+    按帧裁剪首尾的静音（不重新编码）
+
+    头部至少保留 guard_frames 个静音帧，并保留第一个有声帧通过 main_data_begin
+    引用的比特池所在的帧；尾部保留 guard_frames 个静音帧，让解码器完成最后一个有声帧的重叠相加。
+    带 Xing/Info 头的音频（帧数写在头里）和全部为静音的音频不裁剪。
+
+    Args:
+        data: 音频数据
+        head: 是否裁剪头部
+        tail: 是否裁剪尾部
+        max_bits: 静音帧判定阈值，见 is_silent_frame
+        guard_frames: 首尾各保留的静音帧数
+
+    Returns:
+        (裁剪后的音频, 裁剪结果) 元组
+    """
+    unchanged = TrimResult(0, 0, 0, 0.0)
+    frames = list(iter_frames(data))
+    if not frames or not (head or tail) or is_info_frame(data, *frames[0]):
+        return data, unchanged
+
+    voiced = [i for i, (pos, header) in enumerate(frames) if not is_silent_frame(data, pos, header, max_bits)]
+    if not voiced:
+        return data, unchanged
+
+    first, last = 0, len(frames) - 1
+    if head:
+        first = max(0, voiced[0] - guard_frames)
+        # 第一个保留帧的主数据可能从前面帧的比特池开始，继续向前保留到足够覆盖 main_data_begin
+        main_data_begin, _ = side_info(data, *frames[first])
+        available = 0
+        while first > 0 and available < main_data_begin:
+            first -= 1
+            pos, header = frames[first]
+            available += header.length - 4 - (2 if header.has_crc else 0) - header.side_info_size
+    if tail:
+        last = min(len(frames) - 1, voiced[-1] + guard_frames)
+    if first == 0 and last == len(frames) - 1:
+        return data, unchanged
+
+    start = frames[first][0]
+    end = frames[last][0] + frames[last][1].length
+    # 保留 ID3 标签，其后只保留裁剪范围内的帧
+    trimmed = data[:_skip_id3v2(data)] + data[start:end]
+    removed = frames[:first] + frames[last + 1:]
+    return trimmed, TrimResult(
+        head_frames=first,
+        tail_frames=len(frames) - 1 - last,
+        bytes_saved=len(data) - len(trimmed),
+        ms_saved=sum(header.duration for _, header in removed) * 1000,
+    )
+
+
+def check_integrity(data: bytes) -> Optional[str]:
+    """
+    检查音频是否完整：ID3v2 标签之后直到末尾（可有 ID3v1 标签）都是首尾相接的合法帧
+
+    写入中断或磁盘写满留下的文件最后一帧不完整，未写入的块读出为 0，都无法通过检查。
+
+    Returns:
+        问题描述；完整时返回 None
+    """
+    if not data:
+        return "空文件"
+    pos = _skip_id3v2(data)
+    end = len(data)
+    if end - pos >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+    frames = 0
+    while pos < end:
+        header = parse_header(data, pos)
+        if header is None:
+            return f"偏移 {pos} 处不是合法的帧头"
+        if pos + header.length > end:
+            return f"最后一帧不完整（缺少 {pos + header.length - end} 字节）"
+        pos += header.length
+        frames += 1
+    if not frames:
+        return "没有音频帧"
+    return None
+
+
+def audio_duration(data: bytes) -> float:
+    """音频时长（秒，按帧累加）"""
+    return sum(header.duration for _, header in iter_frames(data))
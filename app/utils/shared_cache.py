@@ -0,0 +1,312 @@
+"""
+跨进程共享内存热音频缓存
+多个 worker 进程映射同一个文件（默认位于 /dev/shm），共用一份热数据，
+内存占用不随 worker 数量增长。
+
+文件布局:
+    [头部 64B][索引: slots × 32B][数据区: arena_size B]
+
+- 数据区是环形日志：写入位置 head 是单调递增的逻辑偏移，物理位置为 head % arena_size。
+  条目 [offset, offset + length) 只要满足 offset >= head - arena_size 就没有被覆盖，
+  因此淘汰策略天然是全局统一的 FIFO，不需要额外的淘汰线程或跨进程协调。
+- 索引是 4 路组相联哈希表，键为缓存键（MD5）的 16 字节摘要；
+  同组满时替换最旧（offset 最小）的条目。
+- 读取持共享锁，写入持排它锁（fcntl.flock），锁只在内存拷贝期间持有。
+  flock 属于打开的文件描述，同一进程内的线程之间不互斥，因此先持有进程内的 threading.Lock。
+- 读取返回数据的拷贝：环形数据区在释放锁后随时可能被覆盖，不能把映射区的视图交给调用方。
+"""
+import fcntl
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+from app.config import settings
+from app.utils.logger import app_logger
+
+
+MAGIC = b"TTSHOT01"
+# magic, index_slots, ways, arena_size, head
+HEADER_FORMAT = "<8sIIQQ"
+HEADER_SIZE = 64
+# digest, offset, length, reserved
+ENTRY_FORMAT = "<16sQII"
+ENTRY_SIZE = 32
+HEAD_OFFSET = struct.calcsize("<8sIIQ")
+EMPTY_DIGEST = bytes(16)
+
+
+class SharedHotCache:
+    """基于 mmap 的跨进程热音频缓存"""
+
+    def __init__(
+        self,
+        path: str,
+        arena_size: int,
+        index_slots: int = 65536,
+        ways: int = 4,
+        max_entry_size: int = 512 * 1024,
+    ):
+        """
+        打开（必要时创建）共享缓存文件
+
+        Args:
+            path: 共享文件路径（建议位于 /dev/shm）
+            arena_size: 数据区大小（字节）
+            index_slots: 索引槽数量（会向上取整为 ways 的倍数）
+            ways: 组相联路数
+            max_entry_size: 单个条目的最大字节数，超过的文件不进入热缓存
+        """
+        self.path = Path(path)
+        self.max_entry_size = max_entry_size
+        self.hits = 0
+        self.misses = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._thread_lock = threading.Lock()
+        self._lock_fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+        index_slots = max(ways, (index_slots + ways - 1) // ways * ways)
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            total_size = HEADER_SIZE + index_slots * ENTRY_SIZE + arena_size
+            existing = os.fstat(self._fd).st_size
+            header = os.pread(self._fd, HEADER_SIZE, 0) if existing >= HEADER_SIZE else b""
+            if header[:len(MAGIC)] != MAGIC:
+                # 新文件：初始化头部，索引和数据区保持全 0
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, total_size)
+                os.pwrite(self._fd, struct.pack(HEADER_FORMAT, MAGIC, index_slots, ways, arena_size, 0), 0)
+            else:
+                # 已被其他 worker 创建：沿用文件中的几何参数
+                _, file_slots, file_ways, file_arena, _ = struct.unpack_from(HEADER_FORMAT, header)
+                if (file_slots, file_ways, file_arena) != (index_slots, ways, arena_size):
+                    app_logger.warning(
+                        f"共享缓存参数与现有文件不一致，沿用文件参数 - "
+                        f"slots: {file_slots}, ways: {file_ways}, arena: {file_arena}"
+                    )
+                index_slots, ways, arena_size = file_slots, file_ways, file_arena
+                total_size = HEADER_SIZE + index_slots * ENTRY_SIZE + arena_size
+            self._map = mmap.mmap(self._fd, total_size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+        self.index_slots = index_slots
+        self.ways = ways
+        self.buckets = index_slots // ways
+        self.arena_size = arena_size
+        self._arena_start = HEADER_SIZE + index_slots * ENTRY_SIZE
+
+    @classmethod
+    def from_settings(cls) -> "SharedHotCache":
+        """根据应用配置创建实例"""
+        return cls(
+            path=settings.shared_cache_path,
+            arena_size=settings.shared_cache_size_mb * 1024 * 1024,
+            index_slots=settings.shared_cache_index_slots,
+            max_entry_size=settings.shared_cache_max_entry_kb * 1024,
+        )
+
+    @contextmanager
+    def _locked(self, operation: int) -> Iterator[None]:
+        """持有进程内线程锁和跨进程文件锁（operation 为 fcntl.LOCK_SH 或 fcntl.LOCK_EX）"""
+        with self._thread_lock:
+            fcntl.flock(self._lock_fd, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _head(self) -> int:
+        return struct.unpack_from("<Q", self._map, HEAD_OFFSET)[0]
+
+    def _bucket_offset(self, digest: bytes) -> int:
+        bucket = int.from_bytes(digest[:8], "little") % self.buckets
+        return HEADER_SIZE + bucket * self.ways * ENTRY_SIZE
+
+    def _is_live(self, offset: int, length: int, head: int) -> bool:
+        return offset >= head - self.arena_size and offset + length <= head
+
+    def _find(self, digest: bytes, head: int) -> Optional[tuple[int, int]]:
+        base = self._bucket_offset(digest)
+        for way in range(self.ways):
+            entry_digest, offset, length, _ = struct.unpack_from(ENTRY_FORMAT, self._map, base + way * ENTRY_SIZE)
+            if entry_digest == digest and self._is_live(offset, length, head):
+                return offset, length
+        return None
+
+    def get(self, cache_key: str) -> Optional[bytes]:
+        """
+        读取热缓存条目
+
+        Args:
+            cache_key: 缓存键（32 位十六进制 MD5）
+
+        Returns:
+            音频数据；未命中返回 None
+        """
+        digest = bytes.fromhex(cache_key)
+        with self._locked(fcntl.LOCK_SH):
+            found = self._find(digest, self._head())
+            if found is None:
+                self.misses += 1
+                return None
+            offset, length = found
+            start = self._arena_start + offset % self.arena_size
+            data = self._map[start:start + length]
+        self.hits += 1
+        return data
+
+    def contains(self, cache_key: str) -> bool:
+        """检查热缓存中是否存在有效条目"""
+        digest = bytes.fromhex(cache_key)
+        with self._locked(fcntl.LOCK_SH):
+            return self._find(digest, self._head()) is not None
+
+    def remaining_fraction(self, cache_key: str) -> Optional[float]:
+        """
+        条目距离被覆盖还剩多少（占数据区大小的比例）
+
+        Returns:
+            0~1，越小越快被淘汰；不存在时返回 None
+        """
+        digest = bytes.fromhex(cache_key)
+        with self._locked(fcntl.LOCK_SH):
+            head = self._head()
+            found = self._find(digest, head)
+        if found is None:
+            return None
+        return (found[0] - (head - self.arena_size)) / self.arena_size
+
+    def put(self, cache_key: str, data: bytes, refresh: bool = False) -> bool:
+        """
+        写入热缓存条目（已存在时不重复写入）
+
+        Args:
+            cache_key: 缓存键
+            data: 音频数据
+            refresh: 已存在时重新写入到 head（延后淘汰）
+
+        Returns:
+            是否写入
+        """
+        length = len(data)
+        if length == 0 or length > self.max_entry_size or length > self.arena_size // 4:
+            return False
+
+        digest = bytes.fromhex(cache_key)
+        with self._locked(fcntl.LOCK_EX):
+            head = self._head()
+            if not refresh and self._find(digest, head) is not None:
+                return False
+
+            # 条目不跨越数据区末尾：放不下时跳到数据区开头
+            physical = head % self.arena_size
+            if physical + length > self.arena_size:
+                head += self.arena_size - physical
+                physical = 0
+            start = self._arena_start + physical
+            self._map[start:start + length] = data
+            offset = head
+            head += length
+
+            # 选择替换的槽位：优先同一缓存键的旧槽（refresh），其次空槽或已失效的槽，否则替换最旧的条目
+            base = self._bucket_offset(digest)
+            victim = base
+            victim_offset = None
+            slots = [base + way * ENTRY_SIZE for way in range(self.ways)]
+            if refresh:
+                slots.sort(key=lambda slot: self._map[slot:slot + 16] != digest)
+            for slot in slots:
+                entry_digest, entry_offset, entry_length, _ = struct.unpack_from(ENTRY_FORMAT, self._map, slot)
+                if entry_digest == digest:
+                    victim = slot
+                    break
+                if entry_digest == EMPTY_DIGEST or not self._is_live(entry_offset, entry_length, head):
+                    victim = slot
+                    break
+                if victim_offset is None or entry_offset < victim_offset:
+                    victim, victim_offset = slot, entry_offset
+            struct.pack_into(ENTRY_FORMAT, self._map, victim, digest, offset, length, 0)
+            struct.pack_into("<Q", self._map, HEAD_OFFSET, head)
+            return True
+
+    def discard(self, cache_key: str) -> bool:
+        """
+        删除热缓存条目（只清除索引槽，数据区空间随环形写入回收）
+
+        Returns:
+            是否存在并已删除
+        """
+        digest = bytes.fromhex(cache_key)
+        with self._locked(fcntl.LOCK_EX):
+            base = self._bucket_offset(digest)
+            for way in range(self.ways):
+                slot = base + way * ENTRY_SIZE
+                if self._map[slot:slot + 16] == digest:
+                    struct.pack_into(ENTRY_FORMAT, self._map, slot, EMPTY_DIGEST, 0, 0, 0)
+                    return True
+            return False
+
+    def stats(self) -> dict:
+        """统计信息（条目数为全局值，命中/未命中为本进程值）"""
+        with self._locked(fcntl.LOCK_SH):
+            head = self._head()
+            entries = 0
+            live_bytes = 0
+            for slot in range(self.index_slots):
+                entry_digest, offset, length, _ = struct.unpack_from(
+                    ENTRY_FORMAT, self._map, HEADER_SIZE + slot * ENTRY_SIZE
+                )
+                if entry_digest != EMPTY_DIGEST and self._is_live(offset, length, head):
+                    entries += 1
+                    live_bytes += length
+        return {
+            "path": str(self.path),
+            "arena_size": self.arena_size,
+            "index_slots": self.index_slots,
+            "entries": entries,
+            "live_bytes": live_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def close(self) -> None:
+        """关闭映射和文件描述符"""
+        self._map.close()
+        os.close(self._fd)
+        os.close(self._lock_fd)
+
+
+_hot_cache: Optional[SharedHotCache] = None
+_hot_cache_init_lock = threading.Lock()
+
+
+def get_hot_cache() -> Optional[SharedHotCache]:
+    """
+    获取本进程的共享热缓存实例（首次调用时映射，未启用时返回 None）
+
+    延迟到首次使用时才映射，保证 fork 出的每个 worker 各自持有文件描述符。
+    """
+    global _hot_cache
+    if not settings.shared_cache_enabled:
+        return None
+    if _hot_cache is not None:
+        return _hot_cache
+    with _hot_cache_init_lock:
+        if _hot_cache is not None:
+            return _hot_cache
+        try:
+            _hot_cache = SharedHotCache.from_settings()
+            app_logger.info(
+                f"共享热缓存已映射: {_hot_cache.path} "
+                f"({_hot_cache.arena_size // (1024 * 1024)}MB, {_hot_cache.index_slots} 槽)"
+            )
+        except OSError as e:
+            app_logger.error(f"共享热缓存初始化失败，已禁用: {str(e)}")
+            settings.shared_cache_enabled = False
+            return None
+    return _hot_cache
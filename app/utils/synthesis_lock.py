@@ -0,0 +1,115 @@
+"""
+跨进程合成租约
+多个 worker 同时收到同一个未缓存的文本时，只让一个 worker 调用上游合成，
+其余 worker 等待缓存文件出现。
+
+租约是 cache_dir/.locks/<cache_key>.lock 上的 fcntl 排它锁：
+- 持有者进程崩溃时内核自动释放锁，等待者随即接手，不会留下僵死租约；
+- 释放时先删除锁文件再解锁，获取后校验文件 inode，避免删除与获取交错导致两个持有者；
+- 等待超过 synthesis_lease_timeout（持有者卡死）时放弃等待，自行合成。
+"""
+import asyncio
+import fcntl
+import os
+import time
+from pathlib import Path
+from typing import Optional
+from app.config import settings
+from app.utils.logger import app_logger
+
+
+LOCK_DIR_NAME = ".locks"
+
+
+class SynthesisLease:
+    """已获取的合成租约"""
+
+    def __init__(self, cache_key: str, path: Path, fd: int):
+        self.cache_key = cache_key
+        self.path = path
+        self._fd = fd
+
+    def release(self) -> None:
+        """释放租约（删除锁文件并解锁）"""
+        if self._fd < 0:
+            return
+        try:
+            self.path.unlink(missing_ok=True)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = -1
+
+
+def get_lock_path(cache_key: str) -> Path:
+    """获取缓存键对应的锁文件路径"""
+    lock_dir = Path(settings.cache_dir) / LOCK_DIR_NAME
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    return lock_dir / f"{cache_key}.lock"
+
+
+def try_acquire_lease(cache_key: str) -> Optional[SynthesisLease]:
+    """
+    尝试获取租约（不阻塞）
+
+    Returns:
+        获取成功返回租约，否则返回 None
+    """
+    path = get_lock_path(cache_key)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+
+    # 获取锁期间文件可能已被上一个持有者删除，此时锁住的是孤立 inode，需要重试
+    try:
+        current = os.stat(path)
+    except FileNotFoundError:
+        current = None
+    opened = os.fstat(fd)
+    if current is None or (current.st_ino, current.st_dev) != (opened.st_ino, opened.st_dev):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+        return None
+
+    os.ftruncate(fd, 0)
+    os.write(fd, f"{os.getpid()} {time.time():.3f}\n".encode())
+    return SynthesisLease(cache_key, path, fd)
+
+
+async def acquire_synthesis_lease(cache_key: str, cache_path: Path) -> Optional[SynthesisLease]:
+    """
+    获取合成租约，拿不到时等待持有者写出缓存文件
+
+    Args:
+        cache_key: 缓存键
+        cache_path: 缓存文件路径（出现即表示其他 worker 已完成合成）
+
+    Returns:
+        获取成功返回租约；缓存文件已出现或等待超时返回 None（调用方应先检查缓存）
+    """
+    deadline = time.monotonic() + settings.synthesis_lease_timeout
+    waited = False
+    while True:
+        lease = try_acquire_lease(cache_key)
+        if lease is not None:
+            if waited:
+                app_logger.info(f"[性能追踪] 获得合成租约（等待后） - cache_key: {cache_key}")
+            return lease
+
+        if cache_path.exists():
+            app_logger.info(f"[性能追踪] 其他 worker 已完成合成 - cache_key: {cache_key}")
+            return None
+
+        if time.monotonic() >= deadline:
+            app_logger.warning(
+                f"等待合成租约超时（{settings.synthesis_lease_timeout}s），自行合成 - cache_key: {cache_key}"
+            )
+            return None
+
+        if not waited:
+            app_logger.info(f"[性能追踪] 其他 worker 正在合成，等待缓存 - cache_key: {cache_key}")
+            waited = True
+        await asyncio.sleep(settings.synthesis_lease_poll_interval)
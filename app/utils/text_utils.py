@@ -0,0 +1,125 @@
+"""
+文本工具类
+处理文本分段等操作
+"""
+import re
+
+
+# 句末标点（中文、俄语/西文），分段优先在这些位置断开
+SENTENCE_END_PATTERN = re.compile(r"(?<=[。！？!?…；;\n])|(?<=\.)(?=\s)")
+# 句内可断开的位置（逗号、顿号、冒号、空白）
+CLAUSE_BREAK_PATTERN = re.compile(r"(?<=[，,、：:])|(?<=\s)")
+
+
+def _split_by(pattern: re.Pattern, text: str) -> list[str]:
+    """按正则位置切分，保留分隔符"""
+    return [part for part in pattern.split(text) if part]
+
+
+def _pack(parts: list[str], max_chars: int) -> list[str]:
+    """把较短的片段合并成不超过 max_chars 的块"""
+    chunks: list[str] = []
+    current = ""
+    for part in parts:
+        if current and len(current) + len(part) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += part
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_text(text: str, max_chars: int = 500) -> list[str]:
+    """
+    将长文本切分为不超过 max_chars 的段落，优先在句末断开，其次在逗号/空白处断开
+
+    Args:
+        text: 原始文本
+        max_chars: 每段最大字符数
+
+    Returns:
+        分段列表（去除首尾空白，不含空段）
+    """
+    if len(text) <= max_chars:
+        return [text.strip()] if text.strip() else []
+
+    parts: list[str] = []
+    for sentence in _split_by(SENTENCE_END_PATTERN, text):
+        if len(sentence) <= max_chars:
+            parts.append(sentence)
+            continue
+        for clause in _split_by(CLAUSE_BREAK_PATTERN, sentence):
+            # 没有可断开位置的超长片段只能硬切
+            while len(clause) > max_chars:
+                parts.append(clause[:max_chars])
+                clause = clause[max_chars:]
+            parts.append(clause)
+
+    return [chunk.strip() for chunk in _pack(parts, max_chars) if chunk.strip()]
+
+
+def split_text_progressive(text: str, first_max_chars: int, max_chars: int = 500) -> list[str]:
+    """
+    切分长文本，第一段不超过 first_max_chars（尽快合成出第一段，用于边合成边播放），其余段不超过 max_chars
+
+    Args:
+        text: 原始文本
+        first_max_chars: 第一段最大字符数
+        max_chars: 其余各段最大字符数
+
+    Returns:
+        分段列表（去除首尾空白，不含空段）
+    """
+    if len(text) <= max_chars or first_max_chars <= 0 or first_max_chars >= max_chars:
+        return split_text(text, max_chars)
+    head = split_text(text, first_max_chars)
+    if not head:
+        return []
+    first = head[0]
+    rest = text[text.find(first) + len(first):]
+    return [first] + split_text(rest, max_chars)
+
+
+# 汉字（扩展 A 区、基本区、兼容汉字）与西里尔字母（基本区、补充区）
+_HAN_CHARS = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_CYRILLIC_CHARS = "\u0400-\u04ff\u0500-\u052f"
+HAN_PATTERN = re.compile(f"[{_HAN_CHARS}]")
+CYRILLIC_PATTERN = re.compile(f"[{_CYRILLIC_CHARS}]")
+SCRIPT_RUN_PATTERN = re.compile(f"(?P<zh>[{_HAN_CHARS}]+)|(?P<ru>[{_CYRILLIC_CHARS}]+)")
+
+
+def is_mixed_script(text: str) -> bool:
+    """文本是否同时包含汉字和西里尔字母"""
+    return HAN_PATTERN.search(text) is not None and CYRILLIC_PATTERN.search(text) is not None
+
+
+def split_scripts(text: str) -> list[tuple[str, str]]:
+    """
+    将中俄混合文本切分为汉字段和西里尔字母段
+
+    标点、空白、数字和拉丁字母不单独成段，归入前一段（开头的归入第一段），
+    因此各段按顺序拼接后与原文完全一致。
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        [(语言, 文本段), ...]，语言为 "zh" 或 "ru"；文本中没有汉字和西里尔字母时返回空列表
+    """
+    runs: list[list[str]] = []
+    last_end = 0
+    for match in SCRIPT_RUN_PATTERN.finditer(text):
+        language = match.lastgroup
+        between = text[last_end:match.start()]
+        if not runs:
+            runs.append([language, between + match.group()])
+        elif runs[-1][0] == language:
+            runs[-1][1] += between + match.group()
+        else:
+            runs[-1][1] += between
+            runs.append([language, match.group()])
+        last_end = match.end()
+    if runs:
+        runs[-1][1] += text[last_end:]
+    return [(language, segment) for language, segment in runs]
@@ -0,0 +1,261 @@
+"""
+请求追踪
+为每个请求记录各阶段耗时（缓存查找、排队、上游首包、上游合成、缓存写入、读取），
+通过 Server-Timing 响应头返回给客户端，并传递 X-Request-ID。
+按采样率把 span 以 OpenTelemetry（OTLP/JSON）兼容格式导出到本地文件或收集器。
+
+使用方式:
+    with span("cache_lookup"):
+        ...
+    record_span("upstream_ttfb", start_ns, end_ns)
+
+不在请求上下文中（例如后台任务）调用时 span 不做任何记录。
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+from app.config import settings
+from app.utils.logger import app_logger
+
+
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+@dataclass
+class Span:
+    """单个阶段"""
+
+    name: str
+    start_ns: int
+    end_ns: int
+    span_id: str = field(default_factory=lambda: os.urandom(8).hex())
+    attributes: dict = field(default_factory=dict)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1_000_000
+
+
+@dataclass
+class RequestTrace:
+    """单个请求的追踪数据"""
+
+    request_id: str
+    trace_id: str
+    sampled: bool
+    name: str
+    parent_span_id: Optional[str] = None
+    span_id: str = field(default_factory=lambda: os.urandom(8).hex())
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    status_code: Optional[int] = None
+    spans: list[Span] = field(default_factory=list)
+
+    def server_timing(self) -> str:
+        """生成 Server-Timing 头（同名阶段累加）"""
+        totals: dict[str, float] = {}
+        for item in self.spans:
+            totals[item.name] = totals.get(item.name, 0.0) + item.duration_ms
+        return ", ".join(f"{name};dur={duration:.3f}" for name, duration in totals.items())
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    """获取当前请求的追踪数据"""
+    return _current_trace.get()
+
+
+def record_span(name: str, start_ns: int, end_ns: int, **attributes) -> None:
+    """记录一个已结束的阶段（时间为 time.time_ns()）"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.spans.append(Span(name, start_ns, end_ns, attributes=attributes))
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[None]:
+    """记录代码块的耗时"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start_ns = time.time_ns()
+    try:
+        yield
+    finally:
+        trace.spans.append(Span(name, start_ns, time.time_ns(), attributes=attributes))
+
+
+def _otlp_attributes(attributes: dict) -> list[dict]:
+    result = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        result.append({"key": key, "value": typed})
+    return result
+
+
+def to_otlp(traces: list[RequestTrace]) -> dict:
+    """转换为 OTLP/JSON 格式（ExportTraceServiceRequest）"""
+    spans = []
+    for trace in traces:
+        spans.append({
+            "traceId": trace.trace_id,
+            "spanId": trace.span_id,
+            "parentSpanId": trace.parent_span_id or "",
+            "name": trace.name,
+            "kind": 2,  # SPAN_KIND_SERVER
+            "startTimeUnixNano": str(trace.start_ns),
+            "endTimeUnixNano": str(trace.end_ns or time.time_ns()),
+            "attributes": _otlp_attributes({
+                "http.response.status_code": trace.status_code or 0,
+                "request.id": trace.request_id,
+            }),
+        })
+        for item in trace.spans:
+            spans.append({
+                "traceId": trace.trace_id,
+                "spanId": item.span_id,
+                "parentSpanId": trace.span_id,
+                "name": item.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(item.start_ns),
+                "endTimeUnixNano": str(item.end_ns),
+                "attributes": _otlp_attributes(item.attributes),
+            })
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({
+                "service.name": settings.app_name,
+                "service.version": settings.app_version,
+                "process.pid": os.getpid(),
+            })},
+            "scopeSpans": [{"scope": {"name": "app.utils.tracing"}, "spans": spans}],
+        }]
+    }
+
+
+class SpanExporter:
+    """批量导出采样的追踪数据（写入本地 JSON Lines 文件，或 POST 到 OTLP/HTTP 收集器）"""
+
+    def __init__(self):
+        self._buffer: list[RequestTrace] = []
+        self._flushing: Optional[asyncio.Task] = None
+        self.exported = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(settings.tracing_export_path or settings.tracing_collector_url)
+
+    def export(self, trace: RequestTrace) -> None:
+        """加入待导出缓冲区，攒够一批后在后台导出"""
+        self._buffer.append(trace)
+        if len(self._buffer) >= settings.tracing_batch_size and self._flushing is None:
+            self._flushing = asyncio.create_task(self.flush())
+
+    async def flush(self) -> None:
+        """导出缓冲区中的全部数据"""
+        try:
+            while self._buffer:
+                batch, self._buffer = self._buffer, []
+                payload = to_otlp(batch)
+                try:
+                    if settings.tracing_export_path:
+                        await asyncio.to_thread(self._write_file, payload)
+                    if settings.tracing_collector_url:
+                        await self._post(payload)
+                    self.exported += len(batch)
+                except Exception as e:
+                    self.failed += len(batch)
+                    app_logger.warning(f"导出追踪数据失败: {str(e)}")
+        finally:
+            self._flushing = None
+
+    @staticmethod
+    def _write_file(payload: dict) -> None:
+        with open(settings.tracing_export_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+
+    @staticmethod
+    async def _post(payload: dict) -> None:
+        import aiohttp
+
+        timeout = aiohttp.ClientTimeout(total=5)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.post(settings.tracing_collector_url, json=payload) as response:
+                if response.status >= 300:
+                    raise RuntimeError(f"收集器返回 {response.status}")
+
+
+# 全局导出器实例
+span_exporter = SpanExporter()
+
+
+class TracingMiddleware:
+    """
+    追踪中间件（纯 ASGI）
+    建立请求追踪上下文，在响应头中加入 X-Request-ID 和 Server-Timing，响应结束后按采样率导出
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")[:128] or uuid.uuid4().hex
+
+        # 沿用上游传入的 W3C traceparent，否则新建追踪并按采样率采样
+        trace_id, parent_span_id, sampled = None, None, None
+        match = TRACEPARENT_PATTERN.match(headers.get(b"traceparent", b"").decode("latin-1"))
+        if match:
+            trace_id, parent_span_id = match.group(1), match.group(2)
+            sampled = int(match.group(3), 16) & 1 == 1
+        if sampled is None:
+            sampled = span_exporter.enabled and random.random() < settings.tracing_sample_rate
+
+        trace = RequestTrace(
+            request_id=request_id,
+            trace_id=trace_id or uuid.uuid4().hex,
+            parent_span_id=parent_span_id,
+            sampled=sampled and span_exporter.enabled,
+            name=f"{scope['method']} {scope['path']}",
+        )
+        token = _current_trace.set(trace)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                trace.status_code = message["status"]
+                extra = [(b"x-request-id", request_id.encode("latin-1"))]
+                if settings.server_timing_enabled and trace.spans:
+                    extra.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = {**message, "headers": list(message.get("headers", [])) + extra}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            trace.end_ns = time.time_ns()
+            _current_trace.reset(token)
+            if trace.sampled:
+                span_exporter.export(trace)
@@ -0,0 +1,224 @@
+"""
+词表音频归档
+把大量不会变化的短音频（词典单词）打包为一个文件：按缓存键排序的索引 + 连续存放的 MP3 数据。
+服务启动时只读映射（mmap），命中时二分查找索引并直接切片返回，每次请求没有 open/read 系统调用；
+多个 worker 映射同一文件，共享同一份页缓存。未命中时回退到普通缓存目录。
+
+文件布局:
+    头部（32 字节）: magic(8) | version(4) | count(4) | index_offset(8) | data_offset(8)
+    索引（count * 32 字节，按 digest 升序）: digest(16) | offset(8) | length(4) | crc32(4)
+    数据区: 各条音频首尾相接，offset 相对数据区起点
+"""
+import mmap
+import os
+import shutil
+import struct
+import zlib
+from bisect import bisect_left
+from pathlib import Path
+from typing import Iterable, Optional
+from app.config import settings
+from app.utils.logger import app_logger
+
+
+ARCHIVE_MAGIC = b"TTSVOC01"
+ARCHIVE_VERSION = 1
+HEADER_FORMAT = "<8sIIQQ"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+ENTRY_FORMAT = "<16sQII"
+ENTRY_SIZE = struct.calcsize(ENTRY_FORMAT)
+
+
+class _DigestView:
+    """把索引中的 digest 列暴露为序列，供 bisect 二分查找"""
+
+    def __init__(self, archive_map: mmap.mmap, index_offset: int, count: int):
+        self._map = archive_map
+        self._offset = index_offset
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> bytes:
+        start = self._offset + i * ENTRY_SIZE
+        return self._map[start:start + 16]
+
+
+class VocabArchive:
+    """只读映射的词表音频归档"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: 归档文件路径
+
+        Raises:
+            ValueError: 文件格式不正确
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, count, index_offset, data_offset = struct.unpack_from(HEADER_FORMAT, self._map, 0)
+            if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION:
+                raise ValueError(f"不是有效的词表归档: {path}")
+            if index_offset + count * ENTRY_SIZE > data_offset or data_offset > len(self._map):
+                raise ValueError(f"词表归档已损坏: {path}")
+        except (ValueError, struct.error):
+            self._map.close()
+            raise
+        self.count = count
+        self._index_offset = index_offset
+        self._data_offset = data_offset
+        self._digests = _DigestView(self._map, index_offset, count)
+        self.hits = 0
+        self.misses = 0
+
+    def _find(self, cache_key: str) -> Optional[tuple[int, int, int]]:
+        try:
+            digest = bytes.fromhex(cache_key)
+        except ValueError:
+            return None
+        i = bisect_left(self._digests, digest)
+        if i == self.count or self._digests[i] != digest:
+            return None
+        _, offset, length, crc = struct.unpack_from(ENTRY_FORMAT, self._map, self._index_offset + i * ENTRY_SIZE)
+        return self._data_offset + offset, length, crc
+
+    def contains(self, cache_key: str) -> bool:
+        """归档中是否有该缓存键"""
+        return self._find(cache_key) is not None
+
+    def get(self, cache_key: str) -> Optional[bytes]:
+        """
+        读取音频数据
+
+        Args:
+            cache_key: 缓存键（32 位十六进制 MD5）
+
+        Returns:
+            音频数据；不在归档中时返回 None
+        """
+        found = self._find(cache_key)
+        if found is None:
+            self.misses += 1
+            return None
+        start, length, _ = found
+        self.hits += 1
+        return self._map[start:start + length]
+
+    def verify(self) -> int:
+        """
+        校验所有条目的 CRC32
+
+        Returns:
+            校验失败的条目数
+        """
+        failed = 0
+        for i in range(self.count):
+            _, offset, length, crc = struct.unpack_from(ENTRY_FORMAT, self._map, self._index_offset + i * ENTRY_SIZE)
+            start = self._data_offset + offset
+            if zlib.crc32(self._map[start:start + length]) != crc:
+                failed += 1
+        return failed
+
+    def stats(self) -> dict:
+        """归档统计"""
+        return {
+            "path": self.path,
+            "entries": self.count,
+            "size_bytes": len(self._map),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def close(self) -> None:
+        """关闭映射"""
+        self._map.close()
+
+
+def build_archive(output_path: Path, entries: Iterable[tuple[str, Path]]) -> dict:
+    """
+    从缓存文件构建词表归档（先写临时文件再原子替换，运行中的 worker 继续使用旧映射）
+
+    Args:
+        output_path: 归档输出路径
+        entries: (缓存键, 音频文件路径) 序列
+
+    Returns:
+        构建结果（条目数、数据大小、跳过的文件数）
+    """
+    items: list[tuple[bytes, Path]] = []
+    skipped = 0
+    for cache_key, file_path in entries:
+        try:
+            items.append((bytes.fromhex(cache_key), file_path))
+        except ValueError:
+            skipped += 1
+    items.sort()
+
+    # 数据先写入临时数据文件，确定实际条目数后再写头部和索引，最后拼接数据
+    temp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.tmp")
+    blob_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.blob")
+    index: list[bytes] = []
+    data_size = 0
+    previous: Optional[bytes] = None
+    try:
+        with open(blob_path, "wb+") as blob:
+            for digest, file_path in items:
+                if digest == previous:
+                    continue
+                try:
+                    with open(file_path, "rb") as source:
+                        data = source.read()
+                except FileNotFoundError:
+                    skipped += 1
+                    continue
+                if not data:
+                    skipped += 1
+                    continue
+                index.append(struct.pack(ENTRY_FORMAT, digest, data_size, len(data), zlib.crc32(data)))
+                blob.write(data)
+                data_size += len(data)
+                previous = digest
+
+            index_offset = HEADER_SIZE
+            data_offset = index_offset + len(index) * ENTRY_SIZE
+            blob.seek(0)
+            with open(temp_path, "wb") as f:
+                f.write(struct.pack(HEADER_FORMAT, ARCHIVE_MAGIC, ARCHIVE_VERSION, len(index),
+                                    index_offset, data_offset))
+                f.write(b"".join(index))
+                shutil.copyfileobj(blob, f, 1024 * 1024)
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_path, output_path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    finally:
+        blob_path.unlink(missing_ok=True)
+
+    return {"entries": len(index), "data_bytes": data_size, "skipped": skipped}
+
+
+_vocab_archive: Optional[VocabArchive] = None
+
+
+def get_vocab_archive() -> Optional[VocabArchive]:
+    """
+    获取词表归档实例（首次调用时映射，未配置或加载失败时返回 None）
+    """
+    global _vocab_archive
+    if not settings.vocab_archive_path:
+        return None
+    if _vocab_archive is None:
+        try:
+            _vocab_archive = VocabArchive(settings.vocab_archive_path)
+            app_logger.info(f"词表归档已映射: {settings.vocab_archive_path} ({_vocab_archive.count} 条)")
+        except (OSError, ValueError) as e:
+            app_logger.error(f"词表归档加载失败，已禁用: {str(e)}")
+            settings.vocab_archive_path = None
+            return None
+    return _vocab_archive
@@ -0,0 +1,413 @@
+"""
+热路径微基准测试
+覆盖缓存键生成、缓存检查、缓存路径、text_to_speech 缓存命中分支、
+generate_speech 的 base64 分支，以及各路由在 ASGI 层的缓存命中请求开销。
+serialize.* 对比 JSON 响应的两种序列化方式：*.model 为 response_model 校验 + 标准 JSONResponse，
+*.fast 为直接序列化 / 预渲染字节。
+
+每项基准报告中位数耗时（纳秒/次）和单次调用的峰值内存分配（tracemalloc）。
+与保存的基线（bench_baseline.json）比较，超过阈值即返回非零退出码。
+同一台机器上整体运行速度可能在几秒内相差一倍（CPU 频率、其他负载），绝对耗时无法直接与基线比较：
+- 每项基准之前先测量一个固定的参考负载（哈希、字典、JSON 序列化），以两者的耗时比值与基线比较，
+  抵消机器整体变快或变慢
+- 整套基准重复运行 --repeat 遍，取各遍比值的中位数和最小值；只有两者都超过阈值才判为回归
+  （真实的回归会同时抬高两者，偶发的负载波动通常只影响中位数）
+
+用法:
+    python bench_hot_path.py                    # 运行并与基线比较
+    python bench_hot_path.py --save-baseline    # 运行并保存为新基线
+    python bench_hot_path.py --filter asgi      # 只运行名称包含 asgi 的基准
+    python bench_hot_path.py --repeat 5         # 整套基准重复 5 遍（默认 3 遍）
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Optional, Union
+import fake_edge_tts
+from app.config import settings
+from app.utils import app_logger
+
+
+DEFAULT_BASELINE = Path(__file__).parent / "bench_baseline.json"
+
+# 默认回归阈值：中位数耗时或内存分配超过基线的百分比
+DEFAULT_MEDIAN_THRESHOLD_PCT = 30.0
+DEFAULT_ALLOC_THRESHOLD_PCT = 20.0
+# 绝对容差，避免极小数值上的测量噪声被判为回归
+MEDIAN_SLACK_NS = 200
+ALLOC_SLACK_BYTES = 256
+
+# 参考负载的计时轮数（每项基准之前测量一次）
+REFERENCE_ROUNDS = 5
+
+TEXT = "В университете студенты занимаются учением."
+VOICE = "ru-RU-SvetlanaNeural"
+
+
+@dataclass
+class Benchmark:
+    """单项基准"""
+
+    name: str
+    func: Callable[[], Union[None, Awaitable[None]]]
+    is_async: bool = False
+
+
+@dataclass
+class BenchResult:
+    """单项基准结果"""
+
+    name: str
+    median_ns: float
+    min_ns: float
+    alloc_bytes: int
+    rounds: int
+    iterations: int
+    # 与参考负载的耗时比值（中位数、最小值）
+    relative_median: float = 0.0
+    relative_min: float = 0.0
+
+
+def _calibrate(run_batch: Callable[[int], float], min_round_ns: int) -> int:
+    """确定每轮迭代次数，使每轮耗时不少于 min_round_ns"""
+    iterations = 1
+    while True:
+        elapsed = run_batch(iterations)
+        if elapsed >= min_round_ns or iterations >= 1_000_000:
+            return iterations
+        iterations *= 2 if elapsed * 4 >= min_round_ns else 10
+
+
+def run_benchmark(
+    bench: Benchmark,
+    loop: asyncio.AbstractEventLoop,
+    rounds: int,
+    min_round_ns: int,
+) -> BenchResult:
+    """运行一项基准：先校准迭代次数，再多轮计时，最后单独测量内存分配"""
+    func = bench.func
+
+    if bench.is_async:
+        async def batch(n: int) -> float:
+            start = time.perf_counter_ns()
+            for _ in range(n):
+                await func()
+            return time.perf_counter_ns() - start
+
+        def run_batch(n: int) -> float:
+            return loop.run_until_complete(batch(n))
+
+        async def measure_alloc() -> int:
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            await func()
+            _, peak = tracemalloc.get_traced_memory()
+            return peak - baseline
+    else:
+        def run_batch(n: int) -> float:
+            start = time.perf_counter_ns()
+            for _ in range(n):
+                func()
+            return time.perf_counter_ns() - start
+
+        async def measure_alloc() -> int:
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+            return peak - baseline
+
+    run_batch(1)  # 预热
+    iterations = _calibrate(run_batch, min_round_ns)
+    samples = [run_batch(iterations) / iterations for _ in range(rounds)]
+
+    tracemalloc.start()
+    try:
+        allocs = [loop.run_until_complete(measure_alloc()) for _ in range(5)]
+    finally:
+        tracemalloc.stop()
+
+    return BenchResult(
+        name=bench.name,
+        median_ns=statistics.median(samples),
+        min_ns=min(samples),
+        alloc_bytes=int(statistics.median(allocs)),
+        rounds=rounds,
+        iterations=iterations,
+    )
+
+
+def _reference_workload() -> None:
+    """参考负载：与热路径相近的纯 Python 操作（哈希、字符串格式化、字典、JSON 序列化）"""
+    data = {}
+    for i in range(50):
+        key = hashlib.md5(f"{TEXT}|{VOICE}|{i}".encode("utf-8")).hexdigest()
+        data[key] = {"index": i, "prefix": key[:8]}
+    json.dumps(data)
+
+
+REFERENCE = Benchmark("reference", _reference_workload)
+
+
+def merge_runs(runs: list[BenchResult]) -> BenchResult:
+    """合并同一基准多遍运行的结果（取各遍的中位数和最小值）"""
+    return BenchResult(
+        name=runs[0].name,
+        median_ns=statistics.median(r.median_ns for r in runs),
+        min_ns=min(r.min_ns for r in runs),
+        alloc_bytes=int(statistics.median(r.alloc_bytes for r in runs)),
+        rounds=sum(r.rounds for r in runs),
+        iterations=runs[0].iterations,
+        relative_median=statistics.median(r.relative_median for r in runs),
+        relative_min=min(r.relative_min for r in runs),
+    )
+
+
+def build_benchmarks(loop: asyncio.AbstractEventLoop) -> list[Benchmark]:
+    """准备缓存命中场景并构建基准列表"""
+    from app.main import app
+    from app.models import TTSRequest
+    from app.utils import generate_cache_key, check_cache_exists, get_cache_path
+    from app.controllers.tts_controller import tts_service, generate_speech
+
+    prefix = settings.api_prefix
+    body = {"text": TEXT, "voice": VOICE}
+
+    # 先走一次替身上游，把测试文本写入缓存
+    filename, _, actual_rate, _ = loop.run_until_complete(
+        tts_service.text_to_speech(text=TEXT, voice=VOICE)
+    )
+    cache_key = generate_cache_key(
+        text=TEXT, voice=VOICE, rate=actual_rate,
+        volume=settings.default_volume, pitch=settings.default_pitch
+    )
+    missing_key = "0" * 32
+    base64_request = TTSRequest(text=TEXT, voice=VOICE, return_audio=True)
+
+    from starlette.requests import Request
+
+    async def receive_nothing():
+        # 客户端始终不断开
+        await asyncio.Event().wait()
+
+    http_request = Request({"type": "http", "method": "POST", "headers": []}, receive_nothing)
+
+    # 序列化对比：response_model 校验 + JSONResponse（FastAPI 默认路径）与直接序列化
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+    from app.models import BaseResponse, TTSResponse, VoiceListResponse
+    from app.utils.json_utils import FastJSONResponse, dumps
+
+    response_field = create_model_field(name="response", type_=BaseResponse, mode="serialization")
+    voices = loop.run_until_complete(tts_service.get_voices(locale="zh-CN"))
+    voice_list = VoiceListResponse(total=len(voices), voices=voices)
+    voices_body = dumps({"code": 200, "message": "获取语音列表成功", "data": voice_list.model_dump()})
+    tts_response = TTSResponse(
+        audio_url=f"{settings.base_url}{prefix}/tts/download/{filename}",
+        text=TEXT, voice=VOICE, actual_rate=actual_rate
+    )
+
+    def serialize_model(data):
+        async def call():
+            content = await serialize_response(
+                field=response_field,
+                response_content=BaseResponse(code=200, message="ok", data=data)
+            )
+            JSONResponse(content=content)
+        return call
+
+    async def text_to_speech_hit():
+        await tts_service.text_to_speech(text=TEXT, voice=VOICE)
+
+    async def generate_base64():
+        await generate_speech(base64_request, http_request)
+
+    def asgi(method: str, path: str, json_body: Optional[dict] = None):
+        async def call():
+            status_code, _, _ = await fake_edge_tts.asgi_request(app, method, path, json_body)
+            if status_code != 200:
+                raise RuntimeError(f"{method} {path} 返回 {status_code}")
+        return call
+
+    return [
+        Benchmark("generate_cache_key", lambda: generate_cache_key(
+            text=TEXT, voice=VOICE, rate=actual_rate,
+            volume=settings.default_volume, pitch=settings.default_pitch
+        )),
+        Benchmark("check_cache_exists.hit", lambda: check_cache_exists(cache_key, ".mp3")),
+        Benchmark("check_cache_exists.miss", lambda: check_cache_exists(missing_key, ".mp3")),
+        Benchmark("get_cache_path", lambda: get_cache_path(cache_key, ".mp3")),
+        Benchmark("text_to_speech.cache_hit", text_to_speech_hit, is_async=True),
+        Benchmark("generate_speech.base64", generate_base64, is_async=True),
+        Benchmark("asgi.generate", asgi("POST", f"{prefix}/tts/generate", body), is_async=True),
+        Benchmark("asgi.generate_base64", asgi(
+            "POST", f"{prefix}/tts/generate", {**body, "return_audio": True}
+        ), is_async=True),
+        Benchmark("asgi.generate_stream", asgi("POST", f"{prefix}/tts/generate-stream", body), is_async=True),
+        Benchmark("asgi.download", asgi("GET", f"{prefix}/tts/download/{filename}"), is_async=True),
+        Benchmark("asgi.voices", asgi("GET", f"{prefix}/tts/voices?locale=ru-RU"), is_async=True),
+        Benchmark("serialize.voices.model", serialize_model(
+            VoiceListResponse(total=len(voices), voices=voices)
+        ), is_async=True),
+        Benchmark("serialize.voices.fast", lambda: FastJSONResponse(content=voices_body)),
+        Benchmark("serialize.generate.model", serialize_model(tts_response), is_async=True),
+        Benchmark("serialize.generate.fast", lambda: FastJSONResponse(content={
+            "code": 200, "message": "ok", "data": tts_response.model_dump()
+        })),
+    ]
+
+
+def compare(
+    results: list[BenchResult],
+    baseline: dict,
+    median_threshold_pct: float,
+    alloc_threshold_pct: float,
+) -> list[str]:
+    """与基线比较，返回回归描述列表"""
+    regressions = []
+    entries = baseline.get("benchmarks", {})
+    for result in results:
+        base = entries.get(result.name)
+        if not base:
+            continue
+        alloc_limit = base["alloc_bytes"] * (1 + alloc_threshold_pct / 100) + ALLOC_SLACK_BYTES
+        if "relative_median" in base:
+            # 与参考负载的比值比较（抵消机器整体速度的变化）
+            factor = 1 + median_threshold_pct / 100
+            if result.relative_median > base["relative_median"] * factor and \
+                    result.relative_min > base["relative_min"] * factor:
+                regressions.append(
+                    f"{result.name}: 相对参考负载 中位数 {result.relative_median:.4g} > 基线 {base['relative_median']:.4g}, "
+                    f"最小 {result.relative_min:.4g} > 基线 {base['relative_min']:.4g} (+{median_threshold_pct:.0f}%)"
+                )
+        elif result.median_ns > base["median_ns"] * (1 + median_threshold_pct / 100) + MEDIAN_SLACK_NS:
+            regressions.append(
+                f"{result.name}: 中位数 {result.median_ns:.0f}ns > 基线 {base['median_ns']:.0f}ns "
+                f"(+{median_threshold_pct:.0f}%)"
+            )
+        if result.alloc_bytes > alloc_limit:
+            regressions.append(
+                f"{result.name}: 内存分配 {result.alloc_bytes}B > 基线 {base['alloc_bytes']}B "
+                f"(+{alloc_threshold_pct:.0f}%)"
+            )
+    return regressions
+
+
+def format_table(results: list[BenchResult], baseline: dict) -> str:
+    """格式化结果表"""
+    entries = baseline.get("benchmarks", {})
+    lines = [f"{'基准':<28}{'中位数(µs)':>12}{'最小(µs)':>12}{'分配(B)':>10}{'相对基线':>10}"]
+    for result in results:
+        base = entries.get(result.name)
+        delta = "-"
+        if base and "relative_median" in base:
+            delta = f"{(result.relative_median / base['relative_median'] - 1) * 100:+.1f}%"
+        elif base:
+            delta = f"{(result.median_ns / base['median_ns'] - 1) * 100:+.1f}%"
+        lines.append(
+            f"{result.name:<28}{result.median_ns / 1000:>12.3f}{result.min_ns / 1000:>12.3f}"
+            f"{result.alloc_bytes:>10}{delta:>10}"
+        )
+    return "\n".join(lines)
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="热路径微基准测试")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="基线文件")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--filter", default="", help="只运行名称包含该字符串的基准")
+    parser.add_argument("--rounds", type=int, default=15, help="计时轮数")
+    parser.add_argument("--repeat", type=int, default=3, help="整套基准重复运行的遍数")
+    parser.add_argument("--min-round-ms", type=float, default=20.0, help="每轮最短耗时（毫秒）")
+    parser.add_argument("--median-threshold", type=float, default=None, help="中位数回归阈值（%%）")
+    parser.add_argument("--alloc-threshold", type=float, default=None, help="内存分配回归阈值（%%）")
+    parser.add_argument("--json", dest="json_output", help="结果 JSON 输出文件")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """主函数"""
+    args = parse_args(argv)
+
+    app_logger.remove()
+    app_logger.add(sys.stderr, level="WARNING")
+    fake_edge_tts.install(fake_edge_tts.FakeBackendConfig(latency_base_ms=0, latency_per_char_ms=0, seed=0))
+
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    thresholds = baseline.get("thresholds", {})
+    median_threshold = args.median_threshold or thresholds.get("median_pct", DEFAULT_MEDIAN_THRESHOLD_PCT)
+    alloc_threshold = args.alloc_threshold or thresholds.get("alloc_pct", DEFAULT_ALLOC_THRESHOLD_PCT)
+
+    loop = asyncio.new_event_loop()
+    with tempfile.TemporaryDirectory(prefix="tts-bench-") as workdir:
+        settings.output_dir = f"{workdir}/output"
+        settings.cache_dir = f"{workdir}/cache"
+        settings.enable_cache = True
+
+        benchmarks = [b for b in build_benchmarks(loop) if args.filter in b.name]
+        runs: dict[str, list[BenchResult]] = {bench.name: [] for bench in benchmarks}
+        repeat = max(1, args.repeat)
+        for run in range(repeat):
+            for bench in benchmarks:
+                min_round_ns = int(args.min_round_ms * 1_000_000)
+                reference = run_benchmark(REFERENCE, loop, REFERENCE_ROUNDS, min_round_ns)
+                result = run_benchmark(bench, loop, args.rounds, min_round_ns)
+                result.relative_median = result.median_ns / reference.median_ns
+                result.relative_min = result.min_ns / reference.min_ns
+                runs[bench.name].append(result)
+            print(f"  第 {run + 1}/{repeat} 遍完成", file=sys.stderr)
+    loop.close()
+    results = [merge_runs(runs[bench.name]) for bench in benchmarks]
+
+    print(format_table(results, baseline))
+
+    report = {
+        "thresholds": {"median_pct": median_threshold, "alloc_pct": alloc_threshold},
+        "python": sys.version.split()[0],
+        "benchmarks": {
+            r.name: {
+                "median_ns": round(r.median_ns, 1),
+                "min_ns": round(r.min_ns, 1),
+                "alloc_bytes": r.alloc_bytes,
+                "relative_median": float(f"{r.relative_median:.6g}"),
+                "relative_min": float(f"{r.relative_min:.6g}"),
+                "iterations": r.iterations,
+                "rounds": r.rounds,
+            }
+            for r in results
+        },
+    }
+    if args.json_output:
+        Path(args.json_output).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+    if args.save_baseline:
+        merged = {**baseline.get("benchmarks", {}), **report["benchmarks"]}
+        report["benchmarks"] = dict(sorted(merged.items()))
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"\n基线已保存: {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, median_threshold, alloc_threshold)
+    if regressions:
+        print("\n性能回归:")
+        for line in regressions:
+            print(f"  ✗ {line}")
+        return 1
+    print("\n✓ 未发现性能回归" if baseline else "\n(没有基线，跳过比较)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
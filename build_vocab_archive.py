@@ -0,0 +1,94 @@
+"""
+词表音频归档构建工具
+把缓存目录中的短音频打包为一个归档文件，服务通过 VOCAB_ARCHIVE_PATH 加载。
+
+用法:
+    python build_vocab_archive.py --output vocab.pack                    # 打包缓存目录中不超过 64KB 的音频
+    python build_vocab_archive.py --output vocab.pack --keys words.txt   # 只打包列出的缓存键
+    python build_vocab_archive.py --output vocab.pack --remove-sources   # 打包后删除已归档的缓存文件
+
+归档替换是原子的；运行中的 worker 继续使用旧映射，重启后加载新归档。
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+from app.config import settings
+from app.utils.vocab_archive import VocabArchive, build_archive
+
+
+CACHE_FILENAME_PATTERN = re.compile(r"^([0-9a-f]{32})\.mp3$")
+
+
+def collect_entries(cache_dir: Path, keys: Optional[set[str]], max_entry_bytes: int) -> list[tuple[str, Path]]:
+    """从缓存目录收集要打包的条目"""
+    entries = []
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            match = CACHE_FILENAME_PATTERN.match(entry.name)
+            if match is None or not entry.is_file(follow_symlinks=False):
+                continue
+            cache_key = match.group(1)
+            if keys is not None and cache_key not in keys:
+                continue
+            if max_entry_bytes and entry.stat(follow_symlinks=False).st_size > max_entry_bytes:
+                continue
+            entries.append((cache_key, Path(entry.path)))
+    return entries
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="构建词表音频归档")
+    parser.add_argument("--output", type=Path, required=True, help="归档输出路径")
+    parser.add_argument("--cache-dir", type=Path, default=Path(settings.cache_dir), help="缓存目录")
+    parser.add_argument("--keys", type=Path, help="只打包该文件中列出的缓存键（每行一个，可带 .mp3 后缀）")
+    parser.add_argument("--max-entry-kb", type=int, default=64, help="超过该大小的音频不打包（0 表示不限制）")
+    parser.add_argument("--remove-sources", action="store_true", help="打包并校验后删除已归档的缓存文件")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """主函数"""
+    args = parse_args(argv)
+
+    keys = None
+    if args.keys:
+        keys = {
+            line.strip().removesuffix(".mp3")
+            for line in args.keys.read_text(encoding="utf-8").splitlines()
+            if line.strip()
+        }
+
+    started = time.perf_counter()
+    entries = collect_entries(args.cache_dir, keys, args.max_entry_kb * 1024)
+    result = build_archive(args.output, entries)
+    elapsed = time.perf_counter() - started
+    print(
+        f"已打包 {result['entries']} 条音频（{result['data_bytes'] / (1024 * 1024):.2f}MB，"
+        f"跳过 {result['skipped']} 条）-> {args.output}，耗时 {elapsed:.2f}s"
+    )
+
+    archive = VocabArchive(str(args.output))
+    try:
+        failed = archive.verify()
+        if failed:
+            print(f"归档校验失败: {failed} 条 CRC 不一致", file=sys.stderr)
+            return 1
+        if args.remove_sources:
+            removed = 0
+            for cache_key, file_path in entries:
+                if archive.contains(cache_key):
+                    file_path.unlink(missing_ok=True)
+                    removed += 1
+            print(f"已删除 {removed} 个已归档的缓存文件")
+    finally:
+        archive.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
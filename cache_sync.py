@@ -0,0 +1,199 @@
+"""
+缓存导出 / 导入 / 增量同步工具
+节点可以是本地缓存目录，也可以是运行中的服务（http:// 或 https:// 地址，需要与服务一致的 CACHE_SYNC_TOKEN）。
+
+用法:
+    python cache_sync.py export ./cache --output cache.tar
+    python cache_sync.py import ./cache-b --input cache.tar
+    python cache_sync.py sync ./cache-a ./cache-b                          # 两个本地目录
+    python cache_sync.py sync http://10.0.0.1:5005 http://10.0.0.2:5005 --token $CACHE_SYNC_TOKEN
+    python cache_sync.py sync http://10.0.0.1:5005 ./cache --both-ways --token ...
+
+sync 先比较两边的缓存键清单，只传输目标缺少的条目；--both-ways 时再反向同步一次。
+"""
+import argparse
+import io
+import json
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import IO, Iterable, Iterator, Optional
+from app.config import settings
+from app.utils.cache_transfer import iter_export, import_archive, list_cache_entries
+
+
+CHUNK_SIZE = 256 * 1024
+
+
+class IterReader(io.RawIOBase):
+    """把数据块迭代器包装为只读文件对象（供 tarfile 顺序读取）"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+class DirectoryNode:
+    """本地缓存目录"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.name = str(self.path)
+
+    def manifest(self) -> set[str]:
+        return set(list_cache_entries(self.path))
+
+    def export(self, keys: Optional[list[str]]) -> Iterator[bytes]:
+        return iter_export(self.path, keys)
+
+    def import_stream(self, chunks: Iterable[bytes], overwrite: bool) -> dict:
+        return import_archive(io.BufferedReader(IterReader(chunks), CHUNK_SIZE), self.path, overwrite)
+
+
+class HttpNode:
+    """运行中的服务节点（通过 /tts/cache 接口同步）"""
+
+    def __init__(self, base_url: str, token: Optional[str], api_prefix: str, timeout: float):
+        self.base_url = f"{base_url.rstrip('/')}{api_prefix}/tts/cache"
+        self.name = base_url
+        self.token = token or ""
+        self.timeout = timeout
+
+    def _request(self, path: str, data=None, content_type: Optional[str] = None) -> IO[bytes]:
+        request = urllib.request.Request(f"{self.base_url}{path}", data=data, method="POST" if data is not None else "GET")
+        request.add_header("X-Cache-Sync-Token", self.token)
+        if content_type:
+            request.add_header("Content-Type", content_type)
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def manifest(self) -> set[str]:
+        with self._request("/manifest") as response:
+            return set(json.load(response)["data"]["keys"])
+
+    def export(self, keys: Optional[list[str]]) -> Iterator[bytes]:
+        if keys is None:
+            response = self._request("/export")
+        else:
+            response = self._request("/export", json.dumps({"keys": keys}).encode("utf-8"), "application/json")
+        with response:
+            while True:
+                chunk = response.read(CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+    def import_stream(self, chunks: Iterable[bytes], overwrite: bool) -> dict:
+        # 数据为迭代器时 urllib 使用分块传输编码，无需先在本地缓存整个归档
+        path = "/import?overwrite=true" if overwrite else "/import"
+        with self._request(path, iter(chunks), "application/x-tar") as response:
+            return json.load(response)["data"]
+
+
+def open_node(spec: str, args: argparse.Namespace):
+    """根据参数创建节点（URL 为服务节点，否则为本地目录）"""
+    if spec.startswith(("http://", "https://")):
+        return HttpNode(spec, args.token, args.api_prefix, args.timeout)
+    return DirectoryNode(spec)
+
+
+def sync(source, target, overwrite: bool, dry_run: bool) -> dict:
+    """把 source 有而 target 没有的条目传输到 target"""
+    started = time.perf_counter()
+    source_keys = source.manifest()
+    target_keys = target.manifest()
+    missing = sorted(source_keys - target_keys)
+    result = {
+        "source": source.name,
+        "target": target.name,
+        "source_count": len(source_keys),
+        "target_count": len(target_keys),
+        "missing": len(missing),
+    }
+    if missing and not dry_run:
+        result.update(target.import_stream(source.export(missing), overwrite))
+    result["duration_seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="缓存导出 / 导入 / 增量同步")
+    parser.add_argument("--token", default=settings.cache_sync_token, help="服务节点的 CACHE_SYNC_TOKEN")
+    parser.add_argument("--api-prefix", default=settings.api_prefix, help="服务节点的 API 前缀")
+    parser.add_argument("--timeout", type=float, default=300.0, help="HTTP 请求超时（秒）")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="导出缓存为 tar 流")
+    export_parser.add_argument("source", help="缓存目录或服务地址")
+    export_parser.add_argument("--output", default="-", help="输出文件（- 表示标准输出）")
+    export_parser.add_argument("--keys", type=Path, help="只导出该文件中列出的缓存键（每行一个）")
+
+    import_parser = commands.add_parser("import", help="导入 tar 流")
+    import_parser.add_argument("target", help="缓存目录或服务地址")
+    import_parser.add_argument("--input", default="-", help="输入文件（- 表示标准输入）")
+    import_parser.add_argument("--overwrite", action="store_true", help="覆盖已存在的条目")
+
+    sync_parser = commands.add_parser("sync", help="增量同步：只传输目标缺少的条目")
+    sync_parser.add_argument("source", help="源缓存目录或服务地址")
+    sync_parser.add_argument("target", help="目标缓存目录或服务地址")
+    sync_parser.add_argument("--both-ways", action="store_true", help="同步后再反向同步一次")
+    sync_parser.add_argument("--dry-run", action="store_true", help="只比较清单，不传输")
+    sync_parser.add_argument("--overwrite", action="store_true", help="覆盖已存在的条目")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """主函数"""
+    args = parse_args(argv)
+
+    if args.command == "export":
+        source = open_node(args.source, args)
+        keys = None
+        if args.keys:
+            keys = [line.strip() for line in args.keys.read_text(encoding="utf-8").splitlines() if line.strip()]
+        output = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+        try:
+            for chunk in source.export(keys):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+        return 0
+
+    if args.command == "import":
+        target = open_node(args.target, args)
+        stream = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+        try:
+            chunks = iter(lambda: stream.read(CHUNK_SIZE), b"")
+            result = target.import_stream(chunks, args.overwrite)
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+        print(json.dumps(result, ensure_ascii=False))
+        return 0
+
+    source = open_node(args.source, args)
+    target = open_node(args.target, args)
+    print(json.dumps(sync(source, target, args.overwrite, args.dry_run), ensure_ascii=False))
+    if args.both_ways:
+        print(json.dumps(sync(target, source, args.overwrite, args.dry_run), ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
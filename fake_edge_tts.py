@@ -0,0 +1,443 @@
+"""
+edge-tts 替身后端
+在不访问微软服务的情况下模拟 edge_tts 的接口（Communicate / list_voices），
+用于离线压测和基准测试。延迟和音频大小按可配置的分布随机生成，
+输出的是合法的 MPEG-2 Layer III 帧（24kHz / 48kbps / 单声道，与 Edge 一致）。
+"""
+import asyncio
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+import edge_tts  # type: ignore[reportMissingImports]
+
+
+# MPEG-2 Layer III, 无 CRC, 48kbps, 24kHz, 单声道
+FRAME_HEADER = bytes([0xFF, 0xF3, 0x64, 0xC4])
+FRAME_SIZE = 144  # 72 * 48000 / 24000
+FRAME_DURATION_MS = 24.0  # 576 采样 / 24000Hz
+SIDE_INFO_SIZE = 9
+
+
+@dataclass
+class FakeBackendConfig:
+    """替身后端配置"""
+
+    # 延迟分布：中位数 = latency_base_ms + latency_per_char_ms * 文本长度，按对数正态分布抖动
+    latency_base_ms: float = 300.0
+    latency_per_char_ms: float = 5.0
+    latency_sigma: float = 0.3
+    # 首包时间占总延迟的比例
+    ttfb_ratio: float = 0.4
+    # 音频大小分布：每个字符的音频时长，同样按对数正态分布抖动
+    audio_ms_per_char: float = 80.0
+    audio_sigma: float = 0.2
+    # 首尾静音时长（Edge 语音首尾都带静音）
+    silence_head_ms: float = 100.0
+    silence_tail_ms: float = 200.0
+    # 失败概率（模拟上游偶发错误）
+    error_rate: float = 0.0
+    seed: Optional[int] = None
+
+
+@dataclass
+class FakeBackendStats:
+    """替身后端调用统计"""
+
+    synth_calls: int = 0
+    synth_errors: int = 0
+    synth_cancelled: int = 0
+    list_voices_calls: int = 0
+    upstream_seconds: float = 0.0
+    bytes_generated: int = 0
+    active: int = 0
+    max_active: int = 0
+    texts: list[str] = field(default_factory=list)
+
+
+FAKE_VOICES = [
+    {"Name": "Microsoft Server Speech Text to Speech Voice (zh-CN, XiaoxiaoNeural)",
+     "ShortName": "zh-CN-XiaoxiaoNeural", "Gender": "Female", "Locale": "zh-CN",
+     "FriendlyName": "Microsoft Xiaoxiao Online (Natural) - Chinese (Mainland)"},
+    {"Name": "Microsoft Server Speech Text to Speech Voice (zh-CN, YunxiNeural)",
+     "ShortName": "zh-CN-YunxiNeural", "Gender": "Male", "Locale": "zh-CN",
+     "FriendlyName": "Microsoft Yunxi Online (Natural) - Chinese (Mainland)"},
+    {"Name": "Microsoft Server Speech Text to Speech Voice (zh-TW, HsiaoChenNeural)",
+     "ShortName": "zh-TW-HsiaoChenNeural", "Gender": "Female", "Locale": "zh-TW",
+     "FriendlyName": "Microsoft HsiaoChen Online (Natural) - Chinese (Taiwan)"},
+    {"Name": "Microsoft Server Speech Text to Speech Voice (ru-RU, SvetlanaNeural)",
+     "ShortName": "ru-RU-SvetlanaNeural", "Gender": "Female", "Locale": "ru-RU",
+     "FriendlyName": "Microsoft Svetlana Online (Natural) - Russian (Russia)"},
+    {"Name": "Microsoft Server Speech Text to Speech Voice (ru-RU, DmitryNeural)",
+     "ShortName": "ru-RU-DmitryNeural", "Gender": "Male", "Locale": "ru-RU",
+     "FriendlyName": "Microsoft Dmitry Online (Natural) - Russian (Russia)"},
+    {"Name": "Microsoft Server Speech Text to Speech Voice (en-US, EmmaMultilingualNeural)",
+     "ShortName": "en-US-EmmaMultilingualNeural", "Gender": "Female", "Locale": "en-US",
+     "FriendlyName": "Microsoft Emma Online (Natural) - English (United States)"},
+]
+
+
+def make_frame(voiced: bool, rng: random.Random) -> bytes:
+    """
+    生成一个 MP3 帧
+
+    静音帧的边信息全为 0（part2_3_length = 0），解码后就是静音；
+    有声帧填充随机主数据，并在边信息里写入非零的 part2_3_length / big_values / global_gain。
+    """
+    if not voiced:
+        return FRAME_HEADER + bytes(FRAME_SIZE - len(FRAME_HEADER))
+
+    main_data_len = FRAME_SIZE - len(FRAME_HEADER) - SIDE_INFO_SIZE
+    part2_3_length = main_data_len * 8
+    big_values = rng.randint(40, 200)
+    global_gain = rng.randint(140, 180)
+    # main_data_begin(8) private(1) part2_3_length(12) big_values(9) global_gain(8)，其余位为 0
+    bits = (part2_3_length << 17) | (big_values << 8) | global_gain
+    bits <<= 72 - 8 - 1 - 29
+    side_info = bits.to_bytes(SIDE_INFO_SIZE, "big")
+    return FRAME_HEADER + side_info + rng.randbytes(main_data_len)
+
+
+def make_audio(duration_ms: float, config: FakeBackendConfig, rng: random.Random) -> bytes:
+    """生成指定时长的音频（首尾带静音帧）"""
+    head = max(0, round(config.silence_head_ms / FRAME_DURATION_MS))
+    tail = max(0, round(config.silence_tail_ms / FRAME_DURATION_MS))
+    voiced = max(1, round(duration_ms / FRAME_DURATION_MS))
+    silent_frame = make_frame(False, rng)
+    return (
+        silent_frame * head
+        + b"".join(make_frame(True, rng) for _ in range(voiced))
+        + silent_frame * tail
+    )
+
+
+class FakeBackend:
+    """替身后端，持有配置、随机数和统计"""
+
+    def __init__(self, config: Optional[FakeBackendConfig] = None):
+        self.config = config or FakeBackendConfig()
+        self.rng = random.Random(self.config.seed)
+        self.stats = FakeBackendStats()
+
+    def sample_latency(self, text: str) -> float:
+        """采样一次合成的总延迟（秒）"""
+        median_ms = self.config.latency_base_ms + self.config.latency_per_char_ms * len(text)
+        return median_ms * math.exp(self.rng.gauss(0, self.config.latency_sigma)) / 1000
+
+    def sample_audio(self, text: str) -> bytes:
+        """采样一段音频"""
+        median_ms = self.config.audio_ms_per_char * len(text)
+        duration_ms = median_ms * math.exp(self.rng.gauss(0, self.config.audio_sigma))
+        return make_audio(duration_ms, self.config, self.rng)
+
+    def communicate_class(self):
+        """生成绑定到本后端的 Communicate 替身类"""
+        backend = self
+
+        class FakeCommunicate:
+            """edge_tts.Communicate 替身"""
+
+            def __init__(self, text: str, voice: str = "", *, rate: str = "+0%",
+                         volume: str = "+0%", pitch: str = "+0Hz", **kwargs):
+                self.text = text
+                self.voice = voice
+                self.rate = rate
+                self.volume = volume
+                self.pitch = pitch
+                self._stream_called = False
+
+            async def stream(self):
+                if self._stream_called:
+                    raise RuntimeError("stream can only be called once.")
+                self._stream_called = True
+
+                stats = backend.stats
+                stats.synth_calls += 1
+                stats.texts.append(self.text)
+                stats.active += 1
+                stats.max_active = max(stats.max_active, stats.active)
+                started = time.perf_counter()
+                try:
+                    latency = backend.sample_latency(self.text)
+                    audio = backend.sample_audio(self.text)
+                    if backend.rng.random() < backend.config.error_rate:
+                        await asyncio.sleep(latency * backend.config.ttfb_ratio)
+                        stats.synth_errors += 1
+                        raise edge_tts.exceptions.NoAudioReceived("fake backend: injected failure")
+
+                    # 首包到达后，剩余音频按帧组均匀到达
+                    await asyncio.sleep(latency * backend.config.ttfb_ratio)
+                    chunk_size = FRAME_SIZE * 16
+                    chunks = [audio[i:i + chunk_size] for i in range(0, len(audio), chunk_size)]
+                    gap = latency * (1 - backend.config.ttfb_ratio) / max(1, len(chunks) - 1)
+                    for index, chunk in enumerate(chunks):
+                        if index:
+                            await asyncio.sleep(gap)
+                        stats.bytes_generated += len(chunk)
+                        yield {"type": "audio", "data": chunk}
+                except asyncio.CancelledError:
+                    stats.synth_cancelled += 1
+                    raise
+                finally:
+                    stats.active -= 1
+                    stats.upstream_seconds += time.perf_counter() - started
+
+            async def save(self, audio_fname, metadata_fname=None) -> None:
+                with open(audio_fname, "wb") as audio:
+                    async for message in self.stream():
+                        if message["type"] == "audio":
+                            audio.write(message["data"])
+
+        return FakeCommunicate
+
+    async def list_voices(self, *, connector=None, proxy=None) -> list[dict]:
+        """edge_tts.list_voices 替身"""
+        self.stats.list_voices_calls += 1
+        await asyncio.sleep(self.config.latency_base_ms / 1000)
+        return [dict(voice) for voice in FAKE_VOICES]
+
+
+def install(config: Optional[FakeBackendConfig] = None) -> FakeBackend:
+    """
+    用替身替换 edge_tts 模块上的 Communicate 和 list_voices
+
+    服务层通过 edge_tts.Communicate / edge_tts.list_voices 属性访问上游，
+    所以替换模块属性即可，不需要改动应用代码。
+
+    Returns:
+        替身后端实例（可读取 stats）
+    """
+    backend = FakeBackend(config)
+    if not hasattr(edge_tts, "_real_communicate"):
+        edge_tts._real_communicate = edge_tts.Communicate
+        edge_tts._real_list_voices = edge_tts.list_voices
+    edge_tts.Communicate = backend.communicate_class()
+    edge_tts.list_voices = backend.list_voices
+    return backend
+
+
+def uninstall() -> None:
+    """恢复真实的 edge_tts 接口"""
+    if hasattr(edge_tts, "_real_communicate"):
+        edge_tts.Communicate = edge_tts._real_communicate
+        edge_tts.list_voices = edge_tts._real_list_voices
+
+
+async def asgi_request(
+    app,
+    method: str,
+    path: str,
+    json_body: Optional[dict] = None,
+    headers: Optional[dict] = None,
+) -> tuple[int, dict, bytes]:
+    """
+    直接调用 ASGI 应用（不经过网络和服务器），用于基准测试和本地测试
+
+    Returns:
+        (状态码, 响应头, 响应体) 元组
+    """
+    import json
+    from urllib.parse import urlsplit
+
+    body = json.dumps(json_body).encode("utf-8") if json_body is not None else b""
+    raw_headers = [(b"host", b"testserver")]
+    if json_body is not None:
+        raw_headers.append((b"content-type", b"application/json"))
+        raw_headers.append((b"content-length", str(len(body)).encode()))
+    for name, value in (headers or {}).items():
+        raw_headers.append((name.lower().encode(), value.encode()))
+
+    parts = urlsplit(path)
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": parts.path,
+        "raw_path": parts.path.encode(),
+        "query_string": parts.query.encode(),
+        "root_path": "",
+        "headers": raw_headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+
+    request_sent = False
+    response_done = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    status_code = 0
+    response_headers: dict = {}
+    chunks: list[bytes] = []
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+            for name, value in message.get("headers", []):
+                response_headers[name.decode("latin-1").lower()] = value.decode("latin-1")
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                response_done.set()
+
+    await app(scope, receive, send)
+    return status_code, response_headers, b"".join(chunks)
+
+
+class AccelRedirectStandIn:
+    """
+    nginx X-Accel-Redirect 的替身（ASGI 包装），用于没有 nginx 时在本地验证：
+    应用返回 X-Accel-Redirect 时丢弃应用的响应体，按 internal location 映射读取文件发送，
+    与 nginx 一样保留 Content-Type、Content-Disposition、Cache-Control、ETag 等响应头
+    """
+
+    # nginx 保留的上游响应头，以及 nginx.conf.example 中用 add_header 转发的自定义头
+    PASS_HEADERS = {
+        b"content-type", b"content-disposition", b"cache-control", b"expires", b"etag", b"set-cookie",
+        b"x-audio-filename", b"x-actual-rate", b"x-cache",
+    }
+
+    def __init__(self, app, locations: dict[str, str]):
+        """
+        Args:
+            app: ASGI 应用
+            locations: internal location 前缀 -> 本地目录（对应 nginx 的 alias）
+        """
+        self.app = app
+        self.locations = locations
+        self.redirects = 0
+        self.bytes_sent = 0
+
+    def _resolve(self, uri: str) -> Optional[str]:
+        import os
+
+        for prefix, directory in self.locations.items():
+            if uri.startswith(prefix):
+                name = uri[len(prefix):].lstrip("/")
+                if "/" in name or name in ("", ".", ".."):
+                    return None
+                return os.path.join(directory, name)
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[dict] = None
+
+        async def intercept(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers", []))
+                if b"x-accel-redirect" in headers:
+                    start = message
+                    return
+                await send(message)
+            elif start is None:
+                await send(message)
+            elif not message.get("more_body", False):
+                await self._serve(start, send)
+
+        await self.app(scope, receive, intercept)
+
+    async def _serve(self, start: dict, send) -> None:
+        headers = dict(start.get("headers", []))
+        path = self._resolve(headers[b"x-accel-redirect"].decode("latin-1"))
+        try:
+            if path is None:
+                raise FileNotFoundError
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            await send({"type": "http.response.start", "status": 404, "headers": [(b"content-length", b"0")]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        self.redirects += 1
+        self.bytes_sent += len(data)
+        out = [(name, value) for name, value in start.get("headers", []) if name in self.PASS_HEADERS]
+        out.append((b"content-length", str(len(data)).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": out})
+        await send({"type": "http.response.body", "body": data})
+
+
+class FakePeerNode:
+    """
+    对等节点的替身（本地 aiohttp 服务），用于验证节点间缓存的超时和不可用标记：
+    响应 GET .../tts/download/<cache_key>.mp3 和 PUT .../tts/cache/entry/<cache_key>，
+    可配置响应头之前的延迟和数据分块发送的间隔
+    """
+
+    def __init__(self, header_delay: float = 0.0, chunk_delay: float = 0.0, chunk_size: int = 4096):
+        """
+        Args:
+            header_delay: 发送响应头之前的延迟（秒）
+            chunk_delay: 响应体每个数据块之间的延迟（秒）
+            chunk_size: 响应体数据块大小
+        """
+        self.header_delay = header_delay
+        self.chunk_delay = chunk_delay
+        self.chunk_size = chunk_size
+        self.entries: dict[str, bytes] = {}
+        self.requests = 0
+        self.url = ""
+        self._runner = None
+
+    async def start(self) -> str:
+        """在随机端口启动，返回节点地址"""
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get("/{prefix:.*}/tts/download/{name}", self._download)
+        app.router.add_put("/{prefix:.*}/tts/cache/entry/{key}", self._put)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _download(self, request):
+        from aiohttp import web
+
+        self.requests += 1
+        await asyncio.sleep(self.header_delay)
+        data = self.entries.get(request.match_info["name"].removesuffix(".mp3"))
+        if data is None:
+            return web.Response(status=404)
+        response = web.StreamResponse(headers={"Content-Type": "audio/mpeg", "Content-Length": str(len(data))})
+        try:
+            await response.prepare(request)
+            for offset in range(0, len(data), self.chunk_size):
+                if offset:
+                    await asyncio.sleep(self.chunk_delay)
+                await response.write(data[offset:offset + self.chunk_size])
+            await response.write_eof()
+        except ConnectionResetError:
+            # 请求方已超时断开
+            pass
+        return response
+
+    async def _put(self, request):
+        from aiohttp import web
+
+        self.requests += 1
+        self.entries[request.match_info["key"]] = await request.read()
+        return web.json_response({"code": 200})
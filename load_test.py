@@ -0,0 +1,257 @@
+"""
+离线压测脚本
+在本进程内启动 FastAPI 应用，上游替换为 edge-tts 替身后端（fake_edge_tts），
+用 asyncio 负载生成器按 Zipf 分布发送请求，输出机器可读的 JSON 报告：
+吞吐、p50/p95/p99 延迟、TTFB、缓存命中率。
+
+用法:
+    python load_test.py --requests 2000 --concurrency 50 --vocab 500 --zipf-s 1.1
+    python load_test.py --route generate-stream --latency-ms 800 --output bench_output.txt
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import sys
+import tempfile
+import time
+from typing import Optional
+import aiohttp
+import uvicorn
+import fake_edge_tts
+from app.config import settings
+from app.utils import app_logger
+
+
+RUSSIAN_LETTERS = "абвгдежзийклмнопрстуфхцчшщыэюя"
+CHINESE_CHARS = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处队南给色光门即保治北造百规热领七海口东导器压志世金增争济阶油思术极交受联什认六共权收证改清己美再采转更单风切打白教速花带安场身车例真务具万每目至达走积示议声报斗完类八离华名确才科张信马节话米整空元况今集温传土许步群广石记需段研界拉林律叫且究观越织装影算低持音众书布复容儿须际商非验连断深难近矿千周委素技备半办青省列习响约支般史感劳便团往酸历市克何除消构府称太准精值号率族维划选标写存候毛亲快效斯院查江型眼王按格养易置派层片始却专状育厂京识适属圆包火住调满县局照参红细引听该铁价严"
+
+
+def free_port() -> int:
+    """获取一个空闲端口"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def build_vocabulary(size: int, sentence_ratio: float, rng: random.Random) -> list[dict]:
+    """
+    生成测试词表（中俄单词 + 少量句子）
+
+    Returns:
+        请求体列表，按 Zipf 排名排列（越靠前越热）
+    """
+    vocabulary = []
+    for index in range(size):
+        is_russian = index % 2 == 0
+        is_sentence = rng.random() < sentence_ratio
+        if is_russian:
+            words = [
+                "".join(rng.choice(RUSSIAN_LETTERS) for _ in range(rng.randint(4, 12)))
+                for _ in range(rng.randint(6, 14) if is_sentence else 1)
+            ]
+            text = " ".join(words) + ("." if is_sentence else "")
+            voice = "ru-RU-SvetlanaNeural"
+        else:
+            length = rng.randint(12, 40) if is_sentence else rng.randint(1, 4)
+            text = "".join(rng.choice(CHINESE_CHARS) for _ in range(length))
+            voice = "zh-CN-XiaoxiaoNeural"
+        vocabulary.append({"text": f"{text}{index}" if not is_sentence else text, "voice": voice})
+    return vocabulary
+
+
+def zipf_weights(size: int, s: float) -> list[float]:
+    """Zipf 分布的累积权重"""
+    cumulative = []
+    total = 0.0
+    for rank in range(1, size + 1):
+        total += 1.0 / (rank ** s)
+        cumulative.append(total)
+    return cumulative
+
+
+def percentile(values: list[float], p: float) -> Optional[float]:
+    """线性插值百分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(values: list[float]) -> dict:
+    """延迟统计（毫秒）"""
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(max(values), 3),
+    }
+
+
+async def run_load(args: argparse.Namespace, base_url: str, backend: fake_edge_tts.FakeBackend) -> dict:
+    """运行负载生成器并汇总结果"""
+    rng = random.Random(args.seed)
+    vocabulary = build_vocabulary(args.vocab, args.sentence_ratio, rng)
+    cumulative = zipf_weights(len(vocabulary), args.zipf_s)
+    routes = ["generate", "generate-stream"] if args.route == "mixed" else [args.route]
+
+    latencies: list[float] = []
+    ttfbs: list[float] = []
+    status_counts: dict[str, int] = {}
+    bytes_received = 0
+    remaining = args.requests
+
+    async def worker(session: aiohttp.ClientSession):
+        nonlocal remaining, bytes_received
+        while remaining > 0:
+            remaining -= 1
+            body = rng.choices(vocabulary, cum_weights=cumulative, k=1)[0]
+            route = rng.choice(routes)
+            url = f"{base_url}{settings.api_prefix}/tts/{route}"
+            start = time.perf_counter()
+            try:
+                async with session.post(url, json=body) as response:
+                    first = await response.content.readany()
+                    ttfb = (time.perf_counter() - start) * 1000
+                    size = len(first)
+                    async for chunk in response.content.iter_any():
+                        size += len(chunk)
+                    elapsed = (time.perf_counter() - start) * 1000
+                    status = str(response.status)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = type(e).__name__
+                elapsed = ttfb = None
+                size = 0
+            status_counts[status] = status_counts.get(status, 0) + 1
+            if status == "200":
+                latencies.append(elapsed)
+                ttfbs.append(ttfb)
+                bytes_received += size
+
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    started = time.perf_counter()
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        await asyncio.gather(*(worker(session) for _ in range(args.concurrency)))
+    duration = time.perf_counter() - started
+
+    ok = len(latencies)
+    upstream_calls = backend.stats.synth_calls
+    return {
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "route": args.route,
+            "vocab": args.vocab,
+            "zipf_s": args.zipf_s,
+            "sentence_ratio": args.sentence_ratio,
+            "latency_ms": args.latency_ms,
+            "latency_per_char_ms": args.latency_per_char_ms,
+            "latency_sigma": args.latency_sigma,
+            "seed": args.seed,
+        },
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(ok / duration, 3) if duration else None,
+        "status": status_counts,
+        "errors": args.requests - ok,
+        "latency_ms": summarize(latencies),
+        "ttfb_ms": summarize(ttfbs),
+        "bytes_received": bytes_received,
+        "cache_hit_ratio": round(1 - upstream_calls / ok, 4) if ok else None,
+        "upstream": {
+            "calls": upstream_calls,
+            "errors": backend.stats.synth_errors,
+            "max_concurrency": backend.stats.max_active,
+            "seconds": round(backend.stats.upstream_seconds, 3),
+        },
+    }
+
+
+async def main_async(args: argparse.Namespace) -> dict:
+    """启动应用（替身上游）并执行压测"""
+    backend = fake_edge_tts.install(fake_edge_tts.FakeBackendConfig(
+        latency_base_ms=args.latency_ms,
+        latency_per_char_ms=args.latency_per_char_ms,
+        latency_sigma=args.latency_sigma,
+        audio_ms_per_char=args.audio_ms_per_char,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    ))
+
+    with tempfile.TemporaryDirectory(prefix="tts-load-") as workdir:
+        settings.output_dir = f"{workdir}/output"
+        settings.cache_dir = f"{workdir}/cache"
+        settings.enable_cache = not args.no_cache
+
+        from app.main import app
+
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(
+            app, host="127.0.0.1", port=port, log_level="warning", access_log=False
+        ))
+        server_task = asyncio.create_task(server.serve())
+        while not server.started:
+            if server_task.done():
+                server_task.result()
+            await asyncio.sleep(0.05)
+        # 与负载均衡器一样，等待 /ready 就绪后再发送流量
+        from app.services import warmup
+        while not warmup.ready:
+            await asyncio.sleep(0.05)
+
+        try:
+            return await run_load(args, f"http://127.0.0.1:{port}", backend)
+        finally:
+            server.should_exit = True
+            await server_task
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="离线压测（edge-tts 替身后端）")
+    parser.add_argument("--requests", type=int, default=1000, help="请求总数")
+    parser.add_argument("--concurrency", type=int, default=20, help="并发数")
+    parser.add_argument("--route", choices=["generate", "generate-stream", "mixed"], default="generate-stream")
+    parser.add_argument("--vocab", type=int, default=300, help="词表大小（不同文本数）")
+    parser.add_argument("--zipf-s", type=float, default=1.1, help="Zipf 分布参数 s")
+    parser.add_argument("--sentence-ratio", type=float, default=0.1, help="句子在词表中的比例")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="上游基础延迟中位数（毫秒）")
+    parser.add_argument("--latency-per-char-ms", type=float, default=5.0, help="上游每字符附加延迟（毫秒）")
+    parser.add_argument("--latency-sigma", type=float, default=0.3, help="上游延迟对数正态 sigma")
+    parser.add_argument("--audio-ms-per-char", type=float, default=80.0, help="每字符音频时长（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="上游失败概率")
+    parser.add_argument("--no-cache", action="store_true", help="关闭缓存")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单个请求超时（秒）")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--log-level", default="WARNING", help="应用日志级别")
+    parser.add_argument("--output", help="报告输出文件（默认只打印到标准输出）")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """主函数"""
+    args = parse_args(argv)
+
+    # 压测时日志只输出到标准错误，避免日志 I/O 干扰结果
+    app_logger.remove()
+    app_logger.add(sys.stderr, level=args.log_level)
+
+    report = asyncio.run(main_async(args))
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    return 0 if report["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
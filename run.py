@@ -1,15 +1,239 @@
 """
 应用启动脚本
+DEBUG=true 时单进程启动，代码变化时自动重载；否则由主进程管理 WORKERS 个 worker 进程：
+- REUSE_PORT=true 时每个 worker 用 SO_REUSEPORT 各自监听同一端口，由内核分配连接；否则主进程监听后共享给 worker
+- 事件循环和 HTTP 解析器默认为 auto：安装了 uvloop / httptools（uvicorn[standard]）时使用
+- worker 处理 WORKER_MAX_REQUESTS 个请求后退出，主进程启动新的 worker 替换
+- 收到 SIGHUP 时先启动新 worker（重新加载代码），新 worker 全部开始监听后旧 worker 停止接受连接，
+  等待进行中的请求和合成完成后退出；新 worker 启动失败时保留旧 worker
+- 收到 SIGTERM / SIGINT 时所有 worker 同样排空后退出
 """
+import multiprocessing
+import random
+import signal
+import socket
+import sys
+import time
+from typing import Optional
 import uvicorn
 from app.config import settings
+from app.utils.logger import app_logger
 
-if __name__ == "__main__":
-    uvicorn.run(
+
+# worker 启动后在该时间内异常退出时，延迟后再重启（避免端口占用等错误导致频繁重启）
+WORKER_MIN_UPTIME_SECONDS = 5.0
+WORKER_RESTART_DELAY_SECONDS = 1.0
+# worker 排空超时后再等待的时间（秒），之后强制结束
+WORKER_KILL_MARGIN_SECONDS = 10.0
+SUPERVISOR_POLL_SECONDS = 0.5
+
+_spawn = multiprocessing.get_context("spawn")
+
+
+def bind_socket(reuse_port: bool) -> socket.socket:
+    """
+    监听 settings.host:settings.port
+
+    Args:
+        reuse_port: 设置 SO_REUSEPORT（多个进程各自监听同一端口）
+    """
+    family = socket.AF_INET6 if ":" in settings.host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((settings.host, settings.port))
+    sock.listen(settings.server_backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class _WorkerServer(uvicorn.Server):
+    """开始监听后通知主进程的 uvicorn Server"""
+
+    def __init__(self, config: uvicorn.Config, ready):
+        super().__init__(config)
+        self._ready = ready
+
+    async def startup(self, sockets: Optional[list[socket.socket]] = None) -> None:
+        await super().startup(sockets=sockets)
+        if not self.should_exit:
+            self._ready.set()
+
+
+def _serve_worker(sock: Optional[socket.socket], max_requests: Optional[int], ready) -> None:
+    """worker 进程入口（sock 为 None 时自行用 SO_REUSEPORT 监听）"""
+    if sock is None:
+        sock = bind_socket(reuse_port=True)
+    config = uvicorn.Config(
         "app.main:app",
-        host=settings.host,
-        port=settings.port,
-        reload=settings.debug,
+        loop=settings.server_loop,
+        http=settings.server_http,
+        backlog=settings.server_backlog,
+        limit_max_requests=max_requests,
+        timeout_graceful_shutdown=settings.graceful_timeout_seconds,
         log_level="info"
     )
+    server = _WorkerServer(config, ready)
+    server.run(sockets=[sock])
+    if not server.started:
+        sys.exit(3)
+
+
+class _Worker:
+    """主进程中的 worker 记录"""
+
+    def __init__(self, sock: Optional[socket.socket]):
+        max_requests = None
+        if settings.worker_max_requests > 0:
+            max_requests = settings.worker_max_requests + random.randint(0, max(0, settings.worker_max_requests_jitter))
+        self.ready = _spawn.Event()
+        self.process = _spawn.Process(target=_serve_worker, args=(sock, max_requests, self.ready))
+        self.process.start()
+        self.started_at = time.monotonic()
+        # 排空截止时间（monotonic），未开始排空时为 None
+        self.kill_at: Optional[float] = None
+
+    def drain(self) -> None:
+        """停止接受连接，等待进行中的请求和合成完成后退出"""
+        if self.kill_at is None:
+            self.kill_at = time.monotonic() + (
+                settings.graceful_timeout_seconds + settings.synthesis_drain_seconds + WORKER_KILL_MARGIN_SECONDS
+            )
+            if self.process.is_alive():
+                self.process.terminate()
+
 
+class Supervisor:
+    """worker 进程管理（重启退出的 worker、SIGHUP 滚动重载、SIGTERM 排空退出）"""
+
+    def __init__(self):
+        self.reuse_port = settings.reuse_port and hasattr(socket, "SO_REUSEPORT")
+        if settings.reuse_port and not self.reuse_port:
+            app_logger.warning("当前平台不支持 SO_REUSEPORT，改为主进程监听后共享给 worker")
+        # 共享给 worker 的监听 socket（SO_REUSEPORT 时由各 worker 自行监听）
+        self._sock = None if self.reuse_port else bind_socket(reuse_port=False)
+        self.workers: list[_Worker] = []
+        # 重载时正在启动的新 worker 及其开始监听的截止时间
+        self._pending: list[_Worker] = []
+        self._pending_deadline = 0.0
+        self._draining: list[_Worker] = []
+        self._stop_signal: Optional[int] = None
+        self._reload_requested = False
+
+    def _handle_stop(self, signum, frame) -> None:
+        self._stop_signal = signum
+
+    def _handle_reload(self, signum, frame) -> None:
+        self._reload_requested = True
+
+    def run(self) -> None:
+        """启动 worker 并运行到收到 SIGTERM / SIGINT"""
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+
+        app_logger.info(
+            f"启动 {settings.workers} 个 worker - 监听: {settings.host}:{settings.port}, "
+            f"{'SO_REUSEPORT' if self.reuse_port else '共享监听 socket'}, "
+            f"loop: {settings.server_loop}, http: {settings.server_http}, "
+            f"最大请求数: {settings.worker_max_requests or '不限'}"
+        )
+        self.workers = [_Worker(self._sock) for _ in range(max(1, settings.workers))]
+        while self._stop_signal is None:
+            if self._reload_requested:
+                self._reload_requested = False
+                self._start_reload()
+            self._check_reload()
+            self._check_workers()
+            self._check_draining()
+            time.sleep(SUPERVISOR_POLL_SECONDS)
+
+        app_logger.info(f"收到信号 {signal.Signals(self._stop_signal).name}，等待 worker 完成进行中的请求...")
+        self._shutdown()
+
+    def _start_reload(self) -> None:
+        if self._pending:
+            app_logger.warning("上一次重载尚未完成，忽略本次 SIGHUP")
+            return
+        app_logger.info(f"重载：启动 {len(self.workers)} 个新 worker")
+        self._pending = [_Worker(self._sock) for _ in self.workers]
+        self._pending_deadline = time.monotonic() + settings.worker_start_timeout_seconds
+
+    def _check_reload(self) -> None:
+        """新 worker 全部开始监听后排空旧 worker；启动失败或超时时放弃重载"""
+        if not self._pending:
+            return
+        if all(worker.ready.is_set() for worker in self._pending):
+            for worker in self.workers:
+                worker.drain()
+            self._draining.extend(self.workers)
+            self.workers = self._pending
+            self._pending = []
+            app_logger.info("重载完成，旧 worker 正在排空")
+        elif time.monotonic() >= self._pending_deadline or any(
+            not worker.process.is_alive() for worker in self._pending
+        ):
+            app_logger.error("重载失败：新 worker 未能开始监听，继续使用旧 worker")
+            for worker in self._pending:
+                worker.drain()
+            self._draining.extend(self._pending)
+            self._pending = []
+
+    def _check_workers(self) -> None:
+        """替换已退出的 worker（达到最大请求数或异常退出）"""
+        for index, worker in enumerate(self.workers):
+            if worker.process.is_alive():
+                continue
+            worker.process.join()
+            exitcode = worker.process.exitcode
+            if exitcode == 0:
+                app_logger.info(f"worker {worker.process.pid} 已达到最大请求数，启动新 worker")
+            else:
+                app_logger.error(f"worker {worker.process.pid} 异常退出（exitcode: {exitcode}），启动新 worker")
+                if time.monotonic() - worker.started_at < WORKER_MIN_UPTIME_SECONDS:
+                    time.sleep(WORKER_RESTART_DELAY_SECONDS)
+            self.workers[index] = _Worker(self._sock)
+
+    def _check_draining(self) -> None:
+        """回收已退出的旧 worker，排空超时的强制结束"""
+        now = time.monotonic()
+        for worker in list(self._draining):
+            if not worker.process.is_alive():
+                worker.process.join()
+                self._draining.remove(worker)
+            elif now >= worker.kill_at:
+                app_logger.warning(f"worker {worker.process.pid} 排空超时，强制结束")
+                worker.process.kill()
+
+    def _shutdown(self) -> None:
+        workers = self.workers + self._pending + self._draining
+        for worker in workers:
+            worker.drain()
+        for worker in workers:
+            worker.process.join(max(0.0, worker.kill_at - time.monotonic()))
+            if worker.process.is_alive():
+                app_logger.warning(f"worker {worker.process.pid} 排空超时，强制结束")
+                worker.process.kill()
+                worker.process.join()
+        if self._sock is not None:
+            self._sock.close()
+        app_logger.info("所有 worker 已退出")
+
+
+def main() -> None:
+    """按配置启动服务"""
+    if settings.debug:
+        uvicorn.run(
+            "app.main:app",
+            host=settings.host,
+            port=settings.port,
+            reload=True,
+            log_level="info"
+        )
+        return
+    Supervisor().run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+节点间缓存测试
+验证一致性哈希环的归属，以及向归属节点请求时的超时和不可用标记（不依赖网络，对等节点为本地替身）
+"""
+import asyncio
+import random
+import tempfile
+from collections import Counter
+from app.config import settings
+from app.services.peer_cache import HashRing, PeerCache
+from app.utils import generate_cache_key
+from fake_edge_tts import FakeBackendConfig, FakePeerNode, make_audio
+
+
+SELF_URL = "http://127.0.0.1:1"
+
+
+def test_ring_ownership():
+    """测试归属分布和节点变化时移动的缓存键"""
+    print("=" * 60)
+    print("测试: 一致性哈希环归属")
+    print("=" * 60)
+
+    nodes = ["http://10.0.0.1:5005", "http://10.0.0.2:5005", "http://10.0.0.3:5005"]
+    keys = [generate_cache_key(f"词{i}", "zh-CN-XiaoxiaoNeural", "+0%", "+0%", "+0Hz") for i in range(10000)]
+    ring = HashRing(nodes, settings.peer_virtual_nodes)
+    owners = {key: ring.owner(key) for key in keys}
+    shares = Counter(owners.values())
+    print(f"归属分布: {dict(shares)}")
+    assert set(shares) == set(nodes)
+    assert all(2000 < count < 4700 for count in shares.values())
+
+    # 节点顺序不影响归属
+    assert all(HashRing(list(reversed(nodes)), settings.peer_virtual_nodes).owner(key) == owners[key] for key in keys[:500])
+
+    # 移除一个节点：只有原本归属该节点的缓存键移动
+    smaller = HashRing(nodes[:2], settings.peer_virtual_nodes)
+    moved = [key for key in keys if smaller.owner(key) != owners[key]]
+    assert all(owners[key] == nodes[2] for key in moved)
+    print(f"移除节点后移动: {len(moved)} 个（均来自被移除的节点）")
+    print("✓ 通过\n")
+
+
+def _owned_key(peer_cache: PeerCache, owner: str) -> str:
+    while True:
+        key = generate_cache_key(str(random.random()), "zh-CN-XiaoxiaoNeural", "+0%", "+0%", "+0Hz")
+        if peer_cache.ring.owner(key) == owner:
+            return key
+
+
+async def _fetch_case(name: str, peer: FakePeerNode, audio: bytes, expect_hit: bool, expect_down: bool) -> PeerCache:
+    print(f"\n{name}")
+    print("-" * 60)
+    url = await peer.start()
+    settings.peer_nodes = [SELF_URL, url]
+    peer_cache = PeerCache()
+    try:
+        key = _owned_key(peer_cache, url)
+        peer.entries[key] = audio
+        path = await peer_cache.fetch(key)
+        stats = peer_cache.stats()
+        print(f"命中: {path is not None}, 不可用节点: {stats['down']}, 数据接收失败: {stats['slow_bodies']}")
+        assert (path is not None) == expect_hit
+        assert (url in stats["down"]) == expect_down
+        if expect_hit:
+            assert path.read_bytes() == audio
+        if expect_down:
+            # 标记为不可用后不再请求该节点
+            requests = peer.requests
+            assert await peer_cache.fetch(_owned_key(peer_cache, url)) is None
+            assert peer.requests == requests and peer_cache.skipped_down == 1
+        print("✓ 通过")
+        return peer_cache
+    finally:
+        await peer_cache.close()
+        await peer.stop()
+
+
+async def _peer_fetch_timeouts():
+
+    audio = make_audio(20000, FakeBackendConfig(), random.Random(1))
+    print(f"音频大小: {len(audio) / 1024:.0f}KB, 响应头超时: {settings.peer_timeout_seconds}s, "
+          f"数据预算: {settings.peer_body_timeout_seconds}s")
+
+    await _fetch_case("正常节点", FakePeerNode(), audio, expect_hit=True, expect_down=False)
+
+    # 每个数据块间隔小于响应头超时，总传输时间超过响应头超时但在数据预算内
+    slow = FakePeerNode(chunk_delay=settings.peer_timeout_seconds * 0.6, chunk_size=len(audio) // 6)
+    await _fetch_case("数据传输慢（预算内）", slow, audio, expect_hit=True, expect_down=False)
+
+    body_timeout = settings.peer_body_timeout_seconds
+    settings.peer_body_timeout_seconds = settings.peer_timeout_seconds
+    try:
+        slow = FakePeerNode(chunk_delay=settings.peer_timeout_seconds * 0.6, chunk_size=len(audio) // 6)
+        await _fetch_case("数据传输超过预算", slow, audio, expect_hit=False, expect_down=False)
+    finally:
+        settings.peer_body_timeout_seconds = body_timeout
+
+    hung = FakePeerNode(header_delay=settings.peer_timeout_seconds * 3)
+    await _fetch_case("响应头超时", hung, audio, expect_hit=False, expect_down=True)
+    print()
+
+
+def test_peer_fetch_timeouts():
+    """测试连接 / 响应头超时标记节点不可用，数据传输慢不标记"""
+    print("=" * 60)
+    print("测试: 节点缓存请求超时")
+    print("=" * 60)
+
+    saved = (settings.cache_dir, settings.output_dir, settings.enable_cache, settings.peer_self_url, settings.peer_nodes)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        settings.cache_dir = f"{temp_dir}/cache"
+        settings.output_dir = f"{temp_dir}/output"
+        settings.enable_cache = True
+        settings.peer_self_url = SELF_URL
+        try:
+            asyncio.run(_peer_fetch_timeouts())
+        finally:
+            (settings.cache_dir, settings.output_dir, settings.enable_cache,
+             settings.peer_self_url, settings.peer_nodes) = saved
+
+
+def main():
+    """主函数"""
+    test_ring_ownership()
+    test_peer_fetch_timeouts()
+
+    print("=" * 60)
+    print("测试完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
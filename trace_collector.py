@@ -0,0 +1,64 @@
+"""
+本地追踪收集器（OTLP/HTTP JSON 替身）
+接收服务导出的追踪数据，写入 JSON Lines 文件并在终端打印每个请求的阶段耗时，
+用于在没有 OpenTelemetry Collector 的环境中查看采样的追踪。
+
+用法:
+    python trace_collector.py --port 4318 --output traces.jsonl
+    TRACING_COLLECTOR_URL=http://127.0.0.1:4318/v1/traces TRACING_SAMPLE_RATE=0.1 python run.py
+"""
+import argparse
+import json
+from aiohttp import web
+
+
+def summarize(payload: dict) -> list[str]:
+    """把一批 OTLP 数据整理为每个请求一行的摘要"""
+    spans = [
+        item
+        for resource in payload.get("resourceSpans", [])
+        for scope in resource.get("scopeSpans", [])
+        for item in scope.get("spans", [])
+    ]
+    children: dict[str, list[dict]] = {}
+    for item in spans:
+        children.setdefault(item.get("parentSpanId", ""), []).append(item)
+
+    lines = []
+    for item in spans:
+        if item.get("kind") != 2:
+            continue
+        total = (int(item["endTimeUnixNano"]) - int(item["startTimeUnixNano"])) / 1e6
+        stages = ", ".join(
+            f"{child['name']}={(int(child['endTimeUnixNano']) - int(child['startTimeUnixNano'])) / 1e6:.1f}ms"
+            for child in children.get(item["spanId"], [])
+        )
+        lines.append(f"{item['traceId']} {item['name']} {total:.1f}ms [{stages}]")
+    return lines
+
+
+def create_app(output: str) -> web.Application:
+    async def receive_traces(request: web.Request) -> web.Response:
+        payload = await request.json()
+        with open(output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+        for line in summarize(payload):
+            print(line, flush=True)
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_post("/v1/traces", receive_traces)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本地 OTLP/HTTP JSON 追踪收集器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--output", default="traces.jsonl", help="追踪数据输出文件（JSON Lines）")
+    args = parser.parse_args()
+    web.run_app(create_app(args.output), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()